@@ -0,0 +1,47 @@
+# batched_commutation_benchmark.py
+#
+# Compares checking the commutation of neighbouring gates of a parametric
+# circuit one pair at a time with CommutationChecker.commute_nodes against
+# checking them together with CommutationChecker.commute_nodes_batch. Every
+# rotation has a distinct angle, so every pair needs a matrix check.
+#
+# Usage: python3 batched_commutation_benchmark.py [<num_qubits> [<num_layers>]]
+import sys
+from time import perf_counter
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.converters import circuit_to_dag
+from ucc.transpiler_passes import CommutationChecker
+
+num_qubits = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+num_layers = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+rng = np.random.default_rng(1)
+circuit = QuantumCircuit(num_qubits)
+for layer in range(num_layers):
+    for qubit in range(num_qubits):
+        circuit.u(*rng.uniform(0, 2 * np.pi, size=3), qubit)
+    for qubit in range(layer % 2, num_qubits - 1, 2):
+        circuit.crz(rng.uniform(0, 2 * np.pi), qubit, qubit + 1)
+dag = circuit_to_dag(circuit)
+
+node_pairs = []
+for wire in dag.qubits:
+    nodes = list(dag.nodes_on_wire(wire, only_ops=True))
+    node_pairs.extend(zip(nodes[1:], nodes))
+
+checker = CommutationChecker()
+start = perf_counter()
+sequential = [checker.commute_nodes(first, second) for first, second in node_pairs]
+sequential_time = perf_counter() - start
+
+checker = CommutationChecker()
+start = perf_counter()
+batched = checker.commute_nodes_batch(node_pairs)
+batched_time = perf_counter() - start
+
+assert batched == sequential
+print(f"{len(node_pairs)} pairs, {sum(batched)} commuting")
+print(f"one at a time: {sequential_time:.3f} s, {1e6 * sequential_time / len(node_pairs):.1f} us per pair")
+print(f"batched:       {batched_time:.3f} s, {1e6 * batched_time / len(node_pairs):.1f} us per pair")
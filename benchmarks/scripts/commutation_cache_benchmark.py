@@ -0,0 +1,82 @@
+# commutation_cache_benchmark.py
+#
+# Measures the hit rate of the commutation checkers on the benchpress QAOA and
+# Heisenberg circuits over repeated runs, with a cold checker per run (as when
+# every commutation analysis built its own checker) and with the checker
+# shared by all passes and runs. Runs both ucc.compile and a commutative
+# cancellation pass that checks missing pairs via matrix multiplication, the
+# configuration in which the cache is filled.
+#
+# Usage: python3 commutation_cache_benchmark.py [<repeats>]
+import os
+import sys
+from time import perf_counter
+
+from qiskit import qasm2
+from qiskit.transpiler import PassManager
+from ucc import compile as ucc_compile
+from ucc.transpiler_passes import CommutativeCancellation
+from ucc.transpiler_passes.commutation_analysis import shared_commutation_checkers
+from ucc.transpilers.ucc_defaults import UCCDefault1
+
+repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+QASM_FOLDER = os.path.join(os.path.dirname(__file__), "..", "qasm_circuits", "qasm2", "benchpress")
+CIRCUITS = [
+    "qaoa_barabasi_albert_N100_3reps_basis_rz_rx_ry_cx",
+    "square_heisenberg_N100_basis_rz_rx_ry_cx",
+]
+
+
+def cache_stats():
+    totals = {"library_hits": 0, "analytic_hits": 0, "cache_hits": 0, "misses": 0}
+    for checker in shared_commutation_checkers():
+        for name, count in checker.cache_stats().items():
+            if name in totals:
+                totals[name] += count
+    return totals
+
+
+def clear_caches():
+    for checker in shared_commutation_checkers():
+        checker.clear_cached_commutations()
+
+
+def hit_rate(before, after):
+    counts = {name: after[name] - before[name] for name in after}
+    lookups = sum(counts.values())
+    return 1 - counts["misses"] / lookups if lookups else float("nan")
+
+
+transpiler = UCCDefault1()
+matrix_cancellation = PassManager(
+    CommutativeCancellation(
+        standard_gates=transpiler.target_basis,
+        special_commutations=transpiler.special_commutations,
+        check_matrix=True,
+    )
+)
+runners = {
+    "compile": lambda circuit: ucc_compile(circuit, cache=False),
+    "matrix_cancellation": matrix_cancellation.run,
+}
+
+for name in CIRCUITS:
+    circuit = qasm2.load(
+        os.path.join(QASM_FOLDER, f"{name}.qasm"),
+        custom_instructions=qasm2.LEGACY_CUSTOM_INSTRUCTIONS,
+    )
+    for runner_name, runner in runners.items():
+        for shared in (False, True):
+            clear_caches()
+            for run in range(repeats):
+                if not shared:
+                    clear_caches()
+                before = cache_stats()
+                start = perf_counter()
+                runner(circuit)
+                elapsed = perf_counter() - start
+                print(
+                    f"{name} {runner_name} {'shared' if shared else 'cold'} run {run}: "
+                    f"hit rate {hit_rate(before, cache_stats()):.3f}, {elapsed:.2f} s"
+                )
@@ -0,0 +1,62 @@
+# commutation_memory_benchmark.py
+#
+# Measures the memory of the commutation sets built by CommutationAnalysis,
+# and the peak memory and time of CommutativeCancellation, on random circuits
+# of increasing size in the ucc target basis.
+#
+# Usage: python3 commutation_memory_benchmark.py [<num_qubits> [<num_gates> ...]]
+import sys
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.converters import circuit_to_dag
+from ucc.transpiler_passes import CommutationAnalysis, CommutativeCancellation
+
+num_qubits = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+sizes = [int(size) for size in sys.argv[2:]] or [10**4, 10**5, 10**6]
+basis = ["rz", "rx", "ry", "h", "cx"]
+
+
+def random_basis_circuit(num_qubits, num_gates, seed=12345):
+    """Returns a circuit of `num_gates` random gates of the ucc target basis."""
+    rng = np.random.default_rng(seed)
+    circuit = QuantumCircuit(num_qubits)
+    for gate, angle in zip(rng.integers(0, 5, num_gates), rng.uniform(0, np.pi, num_gates)):
+        if gate == 4:
+            control, target = rng.choice(num_qubits, 2, replace=False)
+            circuit.cx(int(control), int(target))
+        elif gate == 3:
+            circuit.h(int(rng.integers(num_qubits)))
+        else:
+            getattr(circuit, basis[gate])(angle, int(rng.integers(num_qubits)))
+    return circuit
+
+
+print(f"{'gates':>9} {'sets [MB]':>10} {'analysis peak [MB]':>19} {'cancellation peak [MB]':>23} {'time [s]':>9}")
+for num_gates in sizes:
+    dag = circuit_to_dag(random_basis_circuit(num_qubits, num_gates))
+    analysis = CommutationAnalysis(standard_gates=basis)
+
+    tracemalloc.start()
+    start = perf_counter()
+    analysis.run(dag)
+    elapsed = perf_counter() - start
+    # Memory still held by the sets once the analysis returned
+    retained, analysis_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    cancellation = CommutativeCancellation(standard_gates=basis)
+    cancellation.property_set = analysis.property_set
+    tracemalloc.start()
+    start = perf_counter()
+    cancellation.run(dag)
+    elapsed += perf_counter() - start
+    cancellation_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(
+        f"{num_gates:>9} {retained / 1e6:>10.1f} {analysis_peak / 1e6:>19.1f} "
+        f"{cancellation_peak / 1e6:>23.1f} {elapsed:>9.2f}"
+    )
@@ -0,0 +1,52 @@
+# commutation_set_scaling_benchmark.py
+#
+# Times CommutationAnalysis on QAOA-like cost layers of rzz and rz gates on a
+# few qubits, whose gates all commute and so form one commutation set per
+# qubit, for increasing block sizes. Reports the time per gate and the
+# number of pairwise commutation lookups, which grow linearly with the
+# block size when sets are extended through their Pauli signature and
+# quadratically when every new gate is checked against the whole set.
+#
+# Usage: python3 commutation_set_scaling_benchmark.py [<num_qubits>]
+import sys
+from time import perf_counter
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.converters import circuit_to_dag
+from ucc.transpiler_passes import CommutationAnalysis
+
+num_qubits = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+BLOCK_SIZES = [100, 200, 400, 800, 1600, 3200]
+
+
+def cost_layer(num_qubits, num_gates, rng):
+    """Returns `num_gates` rzz and rz gates with random angles on random qubits."""
+    circuit = QuantumCircuit(num_qubits)
+    for _ in range(num_gates):
+        if rng.random() < 0.75:
+            first, second = rng.choice(num_qubits, size=2, replace=False)
+            circuit.rzz(rng.uniform(0, 2 * np.pi), int(first), int(second))
+        else:
+            circuit.rz(rng.uniform(0, 2 * np.pi), int(rng.integers(num_qubits)))
+    return circuit
+
+
+def lookups(checker):
+    stats = checker.cache_stats()
+    return stats["library_hits"] + stats["analytic_hits"] + stats["cache_hits"] + stats["misses"]
+
+
+rng = np.random.default_rng(1)
+analysis = CommutationAnalysis()
+print("block size  time (s)  us per gate  lookups")
+for block_size in BLOCK_SIZES:
+    dag = circuit_to_dag(cost_layer(num_qubits, block_size, rng))
+    before = lookups(analysis.comm_checker)
+    start = perf_counter()
+    analysis.run(dag)
+    elapsed = perf_counter() - start
+    print(
+        f"{block_size:10d}  {elapsed:8.3f}  {1e6 * elapsed / block_size:11.1f}  "
+        f"{lookups(analysis.comm_checker) - before:7d}"
+    )
@@ -0,0 +1,45 @@
+# conversion_benchmark.py
+#
+# Measures the time ucc.compile spends translating OpenQASM circuits to and
+# from Qiskit, comparing the qBraid conversion graph to the native QASM path.
+import sys
+from time import perf_counter
+
+from qbraid.transpiler import transpile as translate
+from ucc import compile as ucc_compile
+from ucc.compile import _from_qiskit, _to_qiskit
+
+if len(sys.argv) < 2:
+    print("Usage: python3 conversion_benchmark.py <qasm_file> [<qasm_file> ...]")
+    sys.exit(1)
+
+
+def best_time(function, repeats=5):
+    """Returns the fastest of `repeats` runs of `function`, in seconds."""
+    timings = []
+    for _ in range(repeats):
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+
+print(f"{'circuit':<45} {'format':<6} {'qbraid [s]':>11} {'native [s]':>11} {'compile [s]':>12}")
+for qasm_file in sys.argv[1:]:
+    with open(qasm_file, "r") as file:
+        qasm_string = file.read()
+    circuit_name = qasm_file.split("/")[-1].split(".qasm")[0]
+    return_format = "qasm3" if "OPENQASM 3" in qasm_string else "qasm2"
+
+    qiskit_circuit = _to_qiskit(qasm_string)
+    qbraid_time = best_time(
+        lambda: translate(translate(qasm_string, "qiskit"), return_format)
+    )
+    native_time = best_time(
+        lambda: _from_qiskit(_to_qiskit(qasm_string), return_format)
+    )
+    compile_time = best_time(lambda: ucc_compile(qasm_string), repeats=1)
+    print(
+        f"{circuit_name:<45} {return_format:<6} {qbraid_time:>11.4f} "
+        f"{native_time:>11.4f} {compile_time:>12.4f}"
+    )
@@ -0,0 +1,64 @@
+# dag_compile_benchmark.py
+#
+# Compares ucc.compile on a Qiskit circuit with ucc.compile_dag on the same
+# circuit as a DAG. Counts the conversions between circuits and DAGs made by
+# each call, and measures its time and peak traced memory.
+#
+# Usage: python3 dag_compile_benchmark.py <qasm_file> [<qasm_file> ...]
+import cProfile
+import pstats
+import sys
+import tracemalloc
+from time import perf_counter
+
+from qiskit import qasm2
+from qiskit.converters import circuit_to_dag
+from ucc import compile as ucc_compile
+from ucc import compile_dag
+
+if len(sys.argv) < 2:
+    print("Usage: python3 dag_compile_benchmark.py <qasm_file> [<qasm_file> ...]")
+    sys.exit(1)
+
+CONVERTERS = ("circuit_to_dag", "dag_to_circuit")
+
+
+def count_conversions(function):
+    """Returns the number of calls of the circuit/DAG converters in `function`."""
+    profile = cProfile.Profile()
+    profile.runcall(function)
+    stats = pstats.Stats(profile).stats
+    return sum(
+        calls[1] for (_, _, name), calls in stats.items() if name in CONVERTERS
+    )
+
+
+def measure(function):
+    """Returns the time in seconds and the peak traced memory in bytes of `function`."""
+    start = perf_counter()
+    function()
+    elapsed = perf_counter() - start
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+print(f"{'circuit':<45} {'entry':<12} {'conversions':>11} {'time [s]':>9} {'peak [MB]':>10}")
+for qasm_file in sys.argv[1:]:
+    circuit = qasm2.load(qasm_file, custom_instructions=qasm2.LEGACY_CUSTOM_INSTRUCTIONS)
+    line = [(qubit, qubit + 1) for qubit in range(circuit.num_qubits - 1)]
+    # The passes modify the DAG in place, so every call gets a fresh one
+    dags = iter([circuit_to_dag(circuit) for _ in range(4)])
+    ucc_compile(circuit, target_device=line)
+
+    entries = {
+        "compile": lambda: ucc_compile(circuit, target_device=line),
+        "compile_dag": lambda: compile_dag(next(dags), target_device=line),
+    }
+    circuit_name = qasm_file.split("/")[-1]
+    for entry, function in entries.items():
+        conversions = count_conversions(function)
+        elapsed, peak = measure(function)
+        print(f"{circuit_name:<45} {entry:<12} {conversions:>11} {elapsed:>9.3f} {peak / 1e6:>10.2f}")
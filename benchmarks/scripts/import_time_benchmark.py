@@ -0,0 +1,57 @@
+# import_time_benchmark.py
+#
+# Tracks the startup cost of `import ucc` as reported by
+# `python -X importtime -c "import ucc"`, run in fresh interpreters.
+import subprocess
+import sys
+from statistics import median
+
+from common import save_results
+
+# Number of fresh interpreters to start, and where the results are saved
+repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+results_folder = sys.argv[2] if len(sys.argv) > 2 else "../results"
+
+# Frontends that should only be imported when one of their circuits is compiled
+LAZY_MODULES = ("qbraid", "cirq", "pytket")
+
+
+def import_times():
+    """Returns the cumulative import time of every module imported by
+    `import ucc`, in seconds, keyed by module name."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import ucc"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        times[module.strip()] = int(cumulative) / 1e6
+    return times
+
+
+runs = [import_times() for _ in range(repeats)]
+total = median(run["ucc"] for run in runs)
+print(f"import ucc: {total:.3f} s (median of {repeats} runs)")
+
+print("Slowest top-level imports:")
+top_level = {
+    module: time for module, time in runs[-1].items() if "." not in module and module != "ucc"
+}
+for module, time in sorted(top_level.items(), key=lambda item: -item[1])[:10]:
+    print(f"  {module:<30} {time:.3f} s")
+
+eager = [module for module in LAZY_MODULES if module in runs[-1]]
+if eager:
+    print(f"Imported eagerly: {', '.join(eager)}")
+
+save_results(
+    [{"compiler": "ucc", "import_time": total, "eager_modules": " ".join(eager)}],
+    benchmark_name="import_time",
+    folder=results_folder,
+    append=True,
+)
@@ -0,0 +1,54 @@
+# incremental_compile_benchmark.py
+#
+# Builds a circuit layer by layer on a line of qubits and, after each layer,
+# compares the time of compiling only the new layer with a
+# ucc.CompilationSession against compiling the whole circuit again with
+# ucc.compile. Also reports the 2-qubit gate counts of both results.
+#
+# Usage: python3 incremental_compile_benchmark.py [<num_qubits> [<num_layers>]]
+import sys
+from time import perf_counter
+
+import numpy as np
+from qiskit import QuantumCircuit
+from ucc import CompilationSession
+from ucc import compile as ucc_compile
+
+num_qubits = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+num_layers = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+
+def random_layer(num_qubits, rng):
+    """Returns a layer of random rotations and CNOTs between random qubits."""
+    layer = QuantumCircuit(num_qubits)
+    for qubit in range(num_qubits):
+        layer.ry(rng.uniform(0, 2 * np.pi), qubit)
+    qubits = rng.permutation(num_qubits)
+    for control, target in zip(qubits[::2], qubits[1::2]):
+        layer.cx(int(control), int(target))
+    return layer
+
+
+rng = np.random.default_rng(1)
+line = [(qubit, qubit + 1) for qubit in range(num_qubits - 1)]
+circuit = random_layer(num_qubits, rng)
+session = CompilationSession(target_device=line)
+session.compile(circuit)
+
+print("layer  incremental (s)  full (s)  incremental 2q  full 2q")
+for index in range(1, num_layers + 1):
+    layer = random_layer(num_qubits, rng)
+    circuit.compose(layer, inplace=True)
+
+    start = perf_counter()
+    incremental = session.append(layer)
+    incremental_time = perf_counter() - start
+
+    start = perf_counter()
+    full = ucc_compile(circuit, target_device=line)
+    full_time = perf_counter() - start
+
+    print(
+        f"{index:5d}  {incremental_time:15.3f}  {full_time:8.3f}  "
+        f"{incremental.num_nonlocal_gates():14d}  {full.num_nonlocal_gates():7d}"
+    )
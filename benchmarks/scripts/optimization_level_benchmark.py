@@ -0,0 +1,52 @@
+# optimization_level_benchmark.py
+#
+# Compares compile time and output quality of the ucc optimization levels
+# (UCCDefault0 to UCCDefault3) on the given QASM files, with all-to-all
+# connectivity and on a line of qubits.
+#
+# Usage: python3 optimization_level_benchmark.py <results_folder> <qasm_file> [<qasm_file> ...]
+import sys
+from time import perf_counter
+
+from qiskit import qasm2
+from common import save_results
+from ucc import compile as ucc_compile
+from ucc.transpilers.ucc_defaults import OPTIMIZATION_LEVELS
+
+if len(sys.argv) < 3:
+    print("Usage: python3 optimization_level_benchmark.py <results_folder> <qasm_file> [<qasm_file> ...]")
+    sys.exit(1)
+
+results_folder = sys.argv[1]
+qasm_files = sys.argv[2:]
+
+results_log = []
+for qasm_file in qasm_files:
+    circuit_name = qasm_file.split("/")[-1].split("_N")[0]
+    circuit = qasm2.load(qasm_file, custom_instructions=qasm2.LEGACY_CUSTOM_INSTRUCTIONS)
+    line = [(qubit, qubit + 1) for qubit in range(circuit.num_qubits - 1)]
+    for device_name, target_device in [("all_to_all", None), ("line", line)]:
+        for level in range(len(OPTIMIZATION_LEVELS)):
+            start = perf_counter()
+            compiled_circuit = ucc_compile(
+                circuit, target_device=target_device, optimization_level=level
+            )
+            log_entry = {
+                "compiler": "ucc",
+                "circuit_name": circuit_name,
+                "device": device_name,
+                "optimization_level": level,
+                "compile_time": perf_counter() - start,
+                "raw_multiq_gates": circuit.num_nonlocal_gates(),
+                "compiled_multiq_gates": compiled_circuit.num_nonlocal_gates(),
+                "compiled_depth": compiled_circuit.depth(),
+            }
+            print(
+                f"{circuit_name} {device_name} level {level}: "
+                f"{log_entry['compile_time']:.2f} s, "
+                f"{log_entry['compiled_multiq_gates']} multi-qubit gates, "
+                f"depth {log_entry['compiled_depth']}"
+            )
+            results_log.append(log_entry)
+
+save_results(results_log, benchmark_name="optimization_levels", folder=results_folder, append=True)
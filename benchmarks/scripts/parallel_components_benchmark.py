@@ -0,0 +1,67 @@
+# parallel_components_benchmark.py
+#
+# Times the local optimization passes of UCCDefault1 on circuits made of
+# independent blocks of qubits, with an increasing number of worker processes
+# (parallel_workers) optimizing the blocks. Each configuration is run once
+# before it is timed, so that building the pipeline and starting the worker
+# pool, which are reused between compilations, are not counted.
+#
+# Usage: python3 parallel_components_benchmark.py <results_folder> [<num_blocks> [<block_size> [<max_workers>]]]
+import os
+import sys
+from time import perf_counter
+
+from qiskit import QuantumCircuit, transpile
+from qiskit.circuit.random import random_circuit
+from common import save_results
+from ucc.transpilers.ucc_defaults import UCCDefault1
+
+if len(sys.argv) < 2:
+    print(
+        "Usage: python3 parallel_components_benchmark.py <results_folder> "
+        "[<num_blocks> [<block_size> [<max_workers>]]]"
+    )
+    sys.exit(1)
+
+results_folder = sys.argv[1]
+num_blocks = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+block_size = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+max_workers = int(sys.argv[4]) if len(sys.argv) > 4 else (os.cpu_count() or 1)
+
+block = transpile(
+    random_circuit(block_size, 80, max_operands=2, seed=12345),
+    basis_gates=["cx", "rz", "rx", "ry", "h"],
+    optimization_level=0,
+)
+circuit = QuantumCircuit(num_blocks * block_size)
+for index in range(num_blocks):
+    circuit.compose(
+        block, qubits=range(index * block_size, (index + 1) * block_size), inplace=True
+    )
+
+workers = [1]
+while workers[-1] * 2 <= max_workers:
+    workers.append(workers[-1] * 2)
+
+results_log = []
+for num_workers in workers:
+    transpiler = UCCDefault1(parallel_workers=num_workers)
+    transpiler.run(circuit)
+    start = perf_counter()
+    compiled_circuit = transpiler.run(circuit)
+    log_entry = {
+        "compiler": "ucc",
+        "circuit_name": f"blocks_{num_blocks}x{block_size}",
+        "parallel_workers": num_workers,
+        "raw_size": circuit.size(),
+        "compile_time": perf_counter() - start,
+        "compiled_multiq_gates": compiled_circuit.num_nonlocal_gates(),
+        "compiled_depth": compiled_circuit.depth(),
+    }
+    print(
+        f"{num_workers} workers: {log_entry['compile_time']:.2f} s, "
+        f"{log_entry['compiled_multiq_gates']} multi-qubit gates"
+    )
+    results_log.append(log_entry)
+
+save_results(results_log, benchmark_name="parallel_components", folder=results_folder, append=True)
@@ -0,0 +1,39 @@
+# windowed_benchmark.py
+#
+# Compares peak memory and compile time of ucc.compile on deep Trotter circuits
+# with and without windowed compilation.
+import sys
+import tracemalloc
+from time import perf_counter
+
+from qiskit import QuantumCircuit
+from ucc import compile as ucc_compile
+
+# Number of qubits, Trotter steps to try and layers per window
+num_qubits = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+step_counts = [int(steps) for steps in sys.argv[2].split(",")] if len(sys.argv) > 2 else [50, 100, 200]
+window_size = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+
+def trotter_circuit(num_qubits, steps):
+    """First order Trotterization of a transverse field Ising chain."""
+    circuit = QuantumCircuit(num_qubits)
+    for _ in range(steps):
+        for qubit in range(num_qubits - 1):
+            circuit.rzz(0.1, qubit, qubit + 1)
+        for qubit in range(num_qubits):
+            circuit.rx(0.2, qubit)
+    return circuit
+
+
+print(f"{'steps':>6} {'gates':>8} {'window':>7} {'time [s]':>9} {'peak [MB]':>10}")
+for steps in step_counts:
+    circuit = trotter_circuit(num_qubits, steps)
+    for window in [None, window_size]:
+        tracemalloc.start()
+        start = perf_counter()
+        ucc_compile(circuit, window_size=window)
+        elapsed = perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        print(f"{steps:>6} {len(circuit.data):>8} {str(window):>7} {elapsed:>9.2f} {peak:>10.1f}")
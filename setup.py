@@ -23,6 +23,7 @@ setup(
     long_description_content_type="text/markdown",
     url="https://github.com/unitaryfund/ucc",  # Repository URL
     packages=find_packages(),  # Automatically find and include all packages in the project
+    package_data={"ucc.transpiler_passes": ["commutation_library.bin"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
@@ -1,3 +1,16 @@
-from .compile import compile, supported_circuit_formats
+from .compile import compile, compile_dag, compile_many
+from .cache import CompilationCache
+from .report import CompileReport, PassReport
+from .async_compile import AsyncCompiler, compile_async
+from .session import CompilationSession
 
-from ucc._version import __version__
\ No newline at end of file
+from ucc._version import __version__
+
+
+def __getattr__(name):
+    # Built on first use, see ucc.compile.__getattr__
+    if name == "supported_circuit_formats":
+        from .compile import supported_circuit_formats
+
+        return supported_circuit_formats
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,334 @@
+"""Command line interface of ucc.
+
+``ucc compile`` compiles a single OpenQASM file. ``ucc serve`` starts a
+long-lived compilation daemon that reads newline-delimited JSON requests from
+stdin or a local socket, so each request skips interpreter startup, imports and
+pipeline construction.
+
+A request is a JSON object on a single line::
+
+    {"id": 1, "qasm": "OPENQASM 2.0; ...", "device": "heavy_hex"}
+
+where ``device`` is optional and is either the name of a device loaded with
+``--device NAME=FILE`` or a list of connections between qubits. An optional
+``return_format``, ``"qasm2"`` or ``"qasm3"``, selects the output format,
+which defaults to the format of the input. Each request is answered by a line ``{"id": 1, "qasm": "..."}``, or
+``{"id": 1, "error": "..."}`` if it could not be compiled. Answers are written
+as compilations finish, so they may arrive out of order.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .compile import compile, compile_many
+
+# Compiled once per device at startup to build the pipelines and fill the
+# caches of the passes before the first request arrives.
+_WARM_UP_QASM = """OPENQASM 2.0;
+include "qelib1.inc";
+qreg q[3];
+h q[0];
+cx q[0],q[1];
+t q[1];
+cx q[1],q[2];
+rz(0.5) q[2];
+cx q[0],q[2];
+"""
+
+
+# Formats of the compiled circuit that can be written as text
+_TEXT_FORMATS = ("original", "qasm2", "qasm3")
+
+
+def main(argv=None):
+    """Runs the ``ucc`` command with the arguments `argv`, returning the exit code."""
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "compile":
+        return _run_compile(args)
+    if args.command == "serve":
+        return _run_serve(args)
+    parser.print_help()
+    return 1
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(prog="ucc", description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command")
+
+    compile_parser = subparsers.add_parser("compile", help="Compile an OpenQASM file.")
+    compile_parser.add_argument("input", help="OpenQASM 2 or 3 file to compile.")
+    compile_parser.add_argument(
+        "-o", "--output", help="File to write the compiled circuit to. Defaults to stdout."
+    )
+    compile_parser.add_argument(
+        "--device",
+        help="JSON file with the list of connections between the qubits of the "
+        "target device. Defaults to all-to-all connectivity.",
+    )
+    compile_parser.add_argument(
+        "--return-format",
+        default="original",
+        choices=_TEXT_FORMATS,
+        help="Format of the compiled circuit, qasm2 or qasm3. Defaults to the "
+        "format of the input.",
+    )
+    compile_parser.add_argument(
+        "-O",
+        "--optimization-level",
+        type=int,
+        default=1,
+        choices=range(4),
+        help="Optimization level from 0 (translation and routing only) to 3 "
+        "(most thorough). Defaults to 1.",
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Compile newline-delimited JSON requests in a long-lived process."
+    )
+    serve_parser.add_argument(
+        "--socket",
+        help="Path of a Unix socket to listen on. Defaults to reading stdin and "
+        "writing stdout.",
+    )
+    serve_parser.add_argument(
+        "--device",
+        action="append",
+        default=[],
+        metavar="NAME=FILE",
+        help="Load the device NAME from the JSON coupling list in FILE and warm "
+        "up its pipeline. Can be given several times.",
+    )
+    serve_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes compiling a batch. Defaults to compiling "
+        "in the server process.",
+    )
+    serve_parser.add_argument(
+        "--max-batch",
+        type=int,
+        default=64,
+        help="Maximum number of requests compiled as one batch.",
+    )
+    serve_parser.add_argument(
+        "--batch-window",
+        type=float,
+        default=0.005,
+        help="Seconds to wait for more requests before compiling a batch.",
+    )
+    return parser
+
+
+def _load_device(path):
+    """Reads a coupling list from a JSON file, either a list of connections or
+    an object with a ``coupling_map`` entry."""
+    with open(path, "r") as f:
+        device = json.load(f)
+    if isinstance(device, dict):
+        device = device["coupling_map"]
+    return [tuple(edge) for edge in device]
+
+
+def _run_compile(args):
+    with open(args.input, "r") as f:
+        circuit = f.read()
+    target_device = _load_device(args.device) if args.device else None
+    compiled_circuit = compile(
+        circuit,
+        return_format=args.return_format,
+        target_device=target_device,
+        optimization_level=args.optimization_level,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(compiled_circuit)
+    else:
+        sys.stdout.write(compiled_circuit)
+    return 0
+
+
+def _run_serve(args):
+    devices = {}
+    for device in args.device:
+        name, _, path = device.partition("=")
+        if not path:
+            raise SystemExit(f"Invalid --device {device!r}, expected NAME=FILE.")
+        devices[name] = _load_device(path)
+    server = _CompileServer(devices, args.workers, args.max_batch, args.batch_window)
+    asyncio.run(server.serve(args.socket))
+    return 0
+
+
+class _CompileServer:
+    """Collects concurrent requests into batches and compiles them with warm
+    pipelines."""
+
+    def __init__(self, devices, workers, max_batch, batch_window):
+        self.devices = devices
+        self.workers = workers
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        # Pipelines are cached per thread, so every compilation of the server
+        # process runs on the same thread as the warm-up.
+        self._compile_thread = ThreadPoolExecutor(max_workers=1)
+        self._queue = None
+
+    async def serve(self, socket_path=None):
+        self._queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._compile_thread, self._warm_up)
+        batcher = asyncio.create_task(self._batch_requests())
+        try:
+            if socket_path is None:
+                await self._serve_stdin()
+            else:
+                await self._serve_socket(socket_path)
+            # Answer every request received before the input was closed
+            await self._queue.join()
+        finally:
+            batcher.cancel()
+            self._compile_thread.shutdown(wait=False)
+
+    def _warm_up(self):
+        # With several workers, this starts the pool of compile_many, which is
+        # sized by the number of workers only and so serves every batch
+        # afterwards. With one, the pipelines of the compile thread are warmed.
+        for coupling_list in [None, *self.devices.values()]:
+            self._compile_batch([_WARM_UP_QASM] * self.workers, "original", coupling_list)
+
+    async def _serve_stdin(self):
+        # Reading in a thread works for pipes, files and terminals alike
+        loop = asyncio.get_running_loop()
+        lines = asyncio.Queue()
+
+        def read_stdin():
+            for line in sys.stdin.buffer:
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            loop.call_soon_threadsafe(lines.put_nowait, None)
+
+        threading.Thread(target=read_stdin, daemon=True).start()
+        await self._handle_stream(_iterate_queue(lines), _StdoutWriter())
+
+    async def _serve_socket(self, socket_path):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(
+            self._handle_stream, path=socket_path, limit=2**30
+        )
+        print(f"ucc serving on {socket_path}", file=sys.stderr, flush=True)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_stream(self, reader, writer):
+        pending = set()
+        async for line in reader:
+            if not line.strip():
+                continue
+            task = asyncio.create_task(self._answer(line, writer))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending)
+        writer.close()
+
+    async def _answer(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            device = request.get("device")
+            if isinstance(device, str):
+                if device not in self.devices:
+                    raise ValueError(f"Unknown device {device!r}.")
+                device = self.devices[device]
+            elif device is not None:
+                device = [tuple(edge) for edge in device]
+            return_format = request.get("return_format", "original")
+            if return_format not in _TEXT_FORMATS:
+                raise ValueError(
+                    f"Unsupported return_format {return_format!r}, expected one of {_TEXT_FORMATS}."
+                )
+            result = asyncio.get_running_loop().create_future()
+            self._queue.put_nowait((request["qasm"], return_format, device, result))
+            response = {"id": request_id, "qasm": await result}
+        except Exception as error:
+            response = {"id": request_id, "error": f"{type(error).__name__}: {error}"}
+        writer.write((json.dumps(response) + "\n").encode())
+        await writer.drain()
+
+    async def _batch_requests(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # compile_many takes a single target device and format per call
+            groups = {}
+            for request in batch:
+                circuit, return_format, device, result = request
+                key = (return_format, None if device is None else tuple(device))
+                groups.setdefault(key, []).append(request)
+            for (return_format, device), requests in groups.items():
+                circuits = [circuit for circuit, _, _, _ in requests]
+                try:
+                    outputs = await loop.run_in_executor(
+                        self._compile_thread,
+                        self._compile_batch,
+                        circuits,
+                        return_format,
+                        None if device is None else list(device),
+                    )
+                except Exception as error:
+                    # E.g. a broken worker pool, the batcher must keep serving
+                    outputs = [error] * len(requests)
+                try:
+                    for (_, _, _, result), output in zip(requests, outputs):
+                        if result.done():
+                            pass
+                        elif isinstance(output, Exception):
+                            result.set_exception(output)
+                        else:
+                            result.set_result(output)
+                finally:
+                    for _ in requests:
+                        self._queue.task_done()
+
+    def _compile_batch(self, circuits, return_format, coupling_list):
+        return compile_many(
+            circuits,
+            return_format=return_format,
+            target_device=coupling_list,
+            max_workers=self.workers,
+        )
+
+
+async def _iterate_queue(queue):
+    """Yields the items put into `queue` until None is put."""
+    while (item := await queue.get()) is not None:
+        yield item
+
+
+class _StdoutWriter:
+    """The subset of :class:`asyncio.StreamWriter` used by the server, for stdout."""
+
+    def write(self, data):
+        sys.stdout.buffer.write(data)
+
+    async def drain(self):
+        sys.stdout.buffer.flush()
+
+    def close(self):
+        sys.stdout.buffer.flush()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Compilation from asyncio code without blocking the event loop."""
+
+import asyncio
+import functools
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .compile import _compile
+
+
+class CompilationCancelledError(Exception):
+    """Raised inside a compilation to stop it between two passes."""
+
+
+class AsyncCompiler:
+    """Runs :func:`ucc.compile` on an executor and awaits the result.
+
+    At most ``max_in_flight`` compilations are submitted to the executor at a
+    time. Further calls wait for a slot, so callers are slowed down instead of
+    queueing unbounded work. When the awaiting task is cancelled or its timeout
+    expires, the compilation is stopped after the pass that is currently
+    running. Its slot is freed once it has stopped.
+
+    Args:
+        executor (concurrent.futures.Executor): Executor running the
+            compilations. Defaults to a thread pool with ``max_in_flight``
+            threads owned by this compiler. With a process pool, cancellation
+            does not stop a compilation: it runs to completion in the worker,
+            holding its slot, and its result is discarded.
+        max_in_flight (int): Maximum number of compilations submitted to the
+            executor at a time. Defaults to the number of CPUs.
+        timeout (float): Default timeout of each compilation in seconds. None
+            means no timeout.
+    """
+
+    def __init__(self, executor=None, max_in_flight=None, timeout=None):
+        if max_in_flight is None:
+            max_in_flight = os.cpu_count() or 1
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1.")
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="ucc-compile"
+        )
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def compile(
+        self,
+        circuit,
+        return_format="original",
+        target_device=None,
+        cache=None,
+        timeout=None,
+        **options,
+    ):
+        """Compiles `circuit` on the executor, see :func:`ucc.compile`.
+
+        Args:
+            circuit (object): The quantum circuit to be compiled.
+            return_format (str): Same as in :func:`ucc.compile`.
+            target_device: Same as in :func:`ucc.compile`.
+            cache (bool or CompilationCache): Same as in :func:`ucc.compile`.
+            timeout (float): Timeout in seconds, overriding the default of the
+                compiler.
+            options: Further arguments of :func:`ucc.compile`, such as
+                ``time_budget`` or ``return_report``.
+
+        Returns:
+            object: The compiled circuit in the specified format, or a tuple of
+            the compiled circuit and its report if ``return_report`` is True.
+
+        Raises:
+            TimeoutError: If the compilation did not finish within `timeout`.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        return_report = options.pop("return_report", False)
+        loop = asyncio.get_running_loop()
+        await self._semaphore.acquire()
+        cancelled = threading.Event()
+        # The event can not be shared with other processes
+        callback = None
+        if not isinstance(self.executor, ProcessPoolExecutor):
+            callback = functools.partial(_raise_if_cancelled, cancelled)
+        try:
+            job = self.executor.submit(
+                _compile,
+                circuit,
+                return_format,
+                target_device,
+                cache,
+                callback=callback,
+                collect_passes=return_report,
+                **options,
+            )
+        except BaseException:
+            self._semaphore.release()
+            raise
+        # The slot is freed once the job is done, not when the caller stops
+        # waiting for it, so abandoned compilations still count as in flight
+        job.add_done_callback(functools.partial(_release_slot, loop, self._semaphore))
+        try:
+            result, report = await asyncio.wait_for(asyncio.wrap_future(job), timeout)
+            return (result, report) if return_report else result
+        except BaseException:
+            # Covers both cancellation of the awaiting task and the timeout
+            cancelled.set()
+            raise
+
+    def shutdown(self, wait=True):
+        """Shuts down the executor if it was created by this compiler."""
+        if self._owns_executor:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _release_slot(loop, semaphore, job):
+    """Done callback of a job, run in the executor's thread."""
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        # The event loop is closed
+        pass
+
+
+def _raise_if_cancelled(cancelled, **kwargs):
+    """Pass callback stopping the compilation once `cancelled` is set."""
+    if cancelled.is_set():
+        raise CompilationCancelledError("Compilation was cancelled.")
+
+
+# Semaphores can not be shared between event loops, so each loop gets its own
+# default compiler.
+_default_compilers = weakref.WeakKeyDictionary()
+
+
+async def compile_async(
+    circuit,
+    return_format="original",
+    target_device=None,
+    cache=None,
+    timeout=None,
+    **options,
+):
+    """Compiles `circuit` without blocking the event loop.
+
+    Same as :func:`ucc.compile`, but the compilation runs on the thread pool of
+    a default :class:`AsyncCompiler` of the running event loop. Use an
+    ``AsyncCompiler`` directly to configure the executor or the number of
+    compilations in flight.
+
+    Args:
+        circuit (object): The quantum circuit to be compiled.
+        return_format (str): Same as in :func:`ucc.compile`.
+        target_device: Same as in :func:`ucc.compile`.
+        cache (bool or CompilationCache): Same as in :func:`ucc.compile`.
+        timeout (float): Timeout in seconds. None means no timeout.
+        options: Further arguments of :func:`ucc.compile`, such as
+            ``time_budget`` or ``return_report``.
+
+    Returns:
+        object: The compiled circuit in the specified format, or a tuple of the
+        compiled circuit and its report if ``return_report`` is True.
+
+    Raises:
+        TimeoutError: If the compilation did not finish within `timeout`.
+    """
+    loop = asyncio.get_running_loop()
+    compiler = _default_compilers.get(loop)
+    if compiler is None:
+        compiler = _default_compilers[loop] = AsyncCompiler()
+    return await compiler.compile(
+        circuit,
+        return_format=return_format,
+        target_device=target_device,
+        cache=cache,
+        timeout=timeout,
+        **options,
+    )
@@ -0,0 +1,337 @@
+"""Content-addressed cache for compiled circuits."""
+
+import copy
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.circuit import ClassicalRegister, Clbit, ParameterExpression
+
+from ._version import __version__
+from .transpilers.ucc_defaults import TIERS
+
+
+class CompilationCache:
+    """Two-tier cache of compilation results, keyed by a hash of everything
+    that determines the output of :func:`ucc.compile`.
+
+    The key combines a canonical hash of the input circuit, the requested
+    return format, the coupling list of the target device, the configuration
+    of the transpiler and ``ucc.__version__``. Results are kept in an
+    in-memory LRU tier and, if a ``directory`` is given, in an on-disk tier
+    that survives the process and is shared between processes.
+
+    Args:
+        max_entries (int): Maximum number of results kept in memory.
+        directory (str): Directory of the on-disk tier. If None, only the
+            in-memory tier is used.
+        max_disk_bytes (int): Size cap of the on-disk tier. The least recently
+            used files are removed once it is exceeded.
+    """
+
+    def __init__(self, max_entries=1024, directory=None, max_disk_bytes=2**30):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, circuit, return_format, coupling_list, transpiler, options=None):
+        """Returns the cache key of compiling `circuit` with `transpiler`.
+
+        `options` holds any further arguments of :func:`ucc.compile` that change
+        the result.
+        """
+        digest = hashlib.sha256()
+        digest.update(f"ucc={__version__}\0format={return_format}\0".encode())
+        digest.update(repr(sorted((options or {}).items())).encode())
+        digest.update(repr(_coupling_key(coupling_list)).encode())
+        digest.update(b"\0")
+        time_budget = (options or {}).get("time_budget")
+        digest.update(repr(_transpiler_key(transpiler, coupling_list, time_budget)).encode())
+        digest.update(b"\0")
+        _update_with_circuit(digest, circuit)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Returns a copy of the cached result for `key`, or None on a miss."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return _copy_result(value)
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._store_memory(key, value)
+        return _copy_result(value)
+
+    def put(self, key, value):
+        """Stores a compilation result under `key` in every tier."""
+        with self._lock:
+            self._store_memory(key, _copy_result(value))
+        self._write_disk(key, value)
+
+    def clear(self):
+        """Removes every entry from both tiers and resets the counters."""
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.misses = self.disk_hits = 0
+        for path in self._disk_files():
+            _remove_quietly(path)
+
+    def stats(self):
+        """Returns the hit and miss counters and the size of each tier."""
+        with self._lock:
+            hits, misses, disk_hits = self.hits, self.misses, self.disk_hits
+            memory_entries = len(self._memory)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "disk_hits": disk_hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": memory_entries,
+            "disk_bytes": sum(os.path.getsize(path) for path in self._disk_files()),
+        }
+
+    def __len__(self):
+        return len(self._memory)
+
+    def _store_memory(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _disk_files(self):
+        if self.directory is None:
+            return []
+        return [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".pkl")
+        ]
+
+    def _read_disk(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        # Mark the file as recently used for the size-cap eviction
+        os.utime(path)
+        return value
+
+    def _write_disk(self, key, value):
+        if self.directory is None:
+            return
+        try:
+            data = pickle.dumps(value)
+        except Exception:
+            # Not every frontend's circuits can be pickled, keep them in memory only
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        self._evict_disk()
+
+    def _evict_disk(self):
+        files = []
+        for path in self._disk_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            _remove_quietly(path)
+            total -= size
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache():
+    """Returns the process-wide cache used by ``ucc.compile(..., cache=True)``."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = CompilationCache()
+    return _default_cache
+
+
+def _coupling_key(coupling_list):
+    if coupling_list is None:
+        return None
+    return tuple(tuple(edge) for edge in coupling_list)
+
+
+def _transpiler_key(transpiler, coupling_list=None, time_budget=None):
+    """Summarizes the configuration of a transpiler such as ``UCCDefault1``
+    compiling for the device with `coupling_list`: the passes of its pipeline
+    and, if a `time_budget` selects the effort tier, the settings of every
+    tier and the estimates the tier is selected with."""
+    pipeline = transpiler.pipeline(coupling_list)
+    passes = _task_names(pipeline.pass_manager.to_flow_controller().tasks)
+    key = (type(transpiler).__name__, transpiler.target_basis, passes)
+    if time_budget is not None and coupling_list is not None:
+        tiers = tuple((tier, _canonical(transpiler.tier_knobs(tier))) for tier in TIERS)
+        key += (tiers, _canonical(transpiler.tier_seconds_per_2q_gate))
+    return key
+
+
+def _task_names(tasks):
+    """Returns the names and settings of the passes in `tasks`, nested like
+    their flow controllers."""
+    names = []
+    for task in tasks:
+        if hasattr(task, "tasks"):
+            names.append((type(task).__name__, _task_names(task.tasks)))
+        else:
+            names.append(
+                (task.name(), _pass_settings(task), _task_names(getattr(task, "requires", [])))
+            )
+    return names
+
+
+# Pass attributes set by the pass manager rather than by the constructor, and
+# the hash of the constructor arguments, which changes between processes
+_PASS_STATE = ("property_set", "requires", "preserves", "_hash")
+
+
+def _pass_settings(task):
+    """Returns the attributes of a pass, which hold its constructor arguments,
+    in a form whose repr is the same in every process, like the arguments
+    compared by ``BasePass.__eq__``."""
+    return tuple(
+        (name, _canonical(value))
+        for name, value in sorted(vars(task).items())
+        # Memoized results grow as the pass runs
+        if name not in _PASS_STATE and "cache" not in name
+    )
+
+
+def _canonical(value):
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_canonical(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted((_canonical(item) for item in value), key=repr))
+    if isinstance(value, dict):
+        return tuple(
+            sorted(((_canonical(k), _canonical(v)) for k, v in value.items()), key=repr)
+        )
+    if isinstance(value, type):
+        return value.__qualname__
+    if isinstance(value, np.ndarray):
+        return (value.shape, hashlib.sha256(value.tobytes()).hexdigest())
+    # Objects such as commutation checkers or decomposers are identified by
+    # their type, their repr usually holds an address
+    return type(value).__qualname__
+
+
+def _update_with_circuit(digest, circuit):
+    """Feeds a canonical serialization of `circuit` to `digest`."""
+    if isinstance(circuit, str):
+        digest.update(b"str\0")
+        digest.update(circuit.encode())
+        return
+    if not isinstance(circuit, QuantumCircuit):
+        from qbraid.transpiler import transpile
+
+        circuit = transpile(circuit, "qiskit")
+    digest.update(b"qiskit\0")
+    _update_with_quantum_circuit(digest, circuit)
+
+
+def _update_with_quantum_circuit(digest, circuit):
+    qubit_indices = {bit: index for index, bit in enumerate(circuit.qubits)}
+    clbit_indices = {bit: index for index, bit in enumerate(circuit.clbits)}
+    digest.update(
+        f"{circuit.num_qubits}\0{circuit.num_clbits}\0{circuit.global_phase!r}\0".encode()
+    )
+    # Register names and sizes appear in the output, e.g. in QASM
+    for registers in (circuit.qregs, circuit.cregs):
+        digest.update(repr([(register.name, register.size) for register in registers]).encode())
+        digest.update(b"\0")
+    for instruction in circuit.data:
+        operation = instruction.operation
+        digest.update(operation.name.encode())
+        digest.update(repr([qubit_indices[q] for q in instruction.qubits]).encode())
+        digest.update(repr([clbit_indices[c] for c in instruction.clbits]).encode())
+        for param in instruction.params:
+            if isinstance(param, np.ndarray):
+                digest.update(param.tobytes())
+            elif isinstance(param, QuantumCircuit):
+                # Blocks of control flow operations, whose repr holds their address
+                digest.update(b"block\0")
+                _update_with_quantum_circuit(digest, param)
+            elif isinstance(param, ParameterExpression):
+                # Parameters with the same name are still different parameters
+                digest.update(repr(param).encode())
+                digest.update(repr(sorted(str(p.uuid) for p in param.parameters)).encode())
+            else:
+                digest.update(repr(param).encode())
+        for attribute in ("_condition", "target"):
+            value = getattr(operation, attribute, None)
+            if value is not None:
+                digest.update(repr(_classical_key(value, circuit, clbit_indices)).encode())
+        digest.update(b"\0")
+
+
+def _classical_key(value, circuit, clbit_indices):
+    """Returns the clbits and registers in a condition or switch target by
+    their position in `circuit`, rather than by their repr."""
+    if isinstance(value, tuple):
+        return tuple(_classical_key(item, circuit, clbit_indices) for item in value)
+    if isinstance(value, Clbit):
+        return ("clbit", clbit_indices.get(value))
+    if isinstance(value, ClassicalRegister):
+        return ("creg", value.name, [clbit_indices.get(bit) for bit in value])
+    return value
+
+
+def _copy_result(value):
+    """Copies a cached result so callers can not mutate the cache."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, QuantumCircuit):
+        return value.copy()
+    return copy.deepcopy(value)
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1,9 +1,23 @@
+import atexit
+import contextlib
+import cProfile
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from qiskit import QuantumCircuit, qasm2, qasm3
+from qiskit.dagcircuit import DAGCircuit
 from qiskit.providers import BackendV2
 from qiskit.transpiler import CouplingMap
-from qbraid.programs.alias_manager import get_program_type_alias
-from qbraid.transpiler import ConversionGraph
-from qbraid.transpiler import transpile
-from .transpilers.ucc_defaults import UCCDefault1
+from .transpilers.ucc_defaults import OPTIMIZATION_LEVELS
+from .cache import default_cache
+from .report import CompileReport, PassReport
 
 
 import sys
@@ -21,13 +35,31 @@ if current_major != REQUIRED_MAJOR or not (MINOR_VERSION_MIN <= current_minor <=
     warnings.warn(
         f"Warning: This package is designed for Python {REQUIRED_MAJOR}.{MINOR_VERSION_MIN}-{REQUIRED_MAJOR}.{MINOR_VERSION_MAX}. "
         f"You are using Python) {current_major}.{current_minor}.")
-supported_circuit_formats = ConversionGraph().nodes()
+
+
+def __getattr__(name):
+    # qBraid and the frontends it registers take seconds to import, so the
+    # conversion graph is only built when it is first asked for.
+    if name == "supported_circuit_formats":
+        from qbraid.transpiler import ConversionGraph
+
+        global supported_circuit_formats
+        supported_circuit_formats = ConversionGraph().nodes()
+        return supported_circuit_formats
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def compile(
     circuit,
     return_format="original",
     target_device=None,
+    cache=None,
+    window_size=None,
+    time_budget=None,
+    return_report=False,
+    optimization_level=1,
+    profile=None,
+    profile_dir=None,
 ):
     """Compiles the provided quantum `circuit` by translating it to a Qiskit
     circuit, transpiling it, and returning the optimized circuit in the
@@ -38,23 +70,588 @@ def compile(
         return_format (str): The format in which your circuit will be returned.
             e.g., "TKET", "OpenQASM2". Check ``ucc.supported_circuit_formats()``.
             Defaults to the format of the input circuit.
+        target_device: Can be a Qiskit backend or Qiskit CouplingMap, or a list of
+            connections between qubits. See :func:`get_backend_connectivity`.
+        cache (bool or CompilationCache): If True, results are looked up in and
+            stored to the process-wide :class:`~ucc.CompilationCache`. A
+            ``CompilationCache`` instance can be given to use it instead.
+            Defaults to no caching.
+        window_size (int): If given, the circuit is compiled in overlapping
+            slices of this many layers, which bounds the memory used for very
+            deep circuits. Only supported without a `target_device` or
+            `time_budget`.
+        time_budget (float): Target compile time in seconds. The effort of the
+            mapping passes is scaled down for circuits that would not fit the
+            budget, and optional optimization stages are skipped once the
+            deadline gets close. The passes needed for a valid result always
+            run, so the budget can be exceeded.
+        return_report (bool): If True, a :class:`~ucc.CompileReport` is
+            returned along with the compiled circuit. It records the time,
+            memory and circuit size after each pass, which traces memory
+            allocations with :mod:`tracemalloc` and slows the compilation down.
+        optimization_level (int): Trade-off between compile time and quality
+            of the compiled circuit, from 0 (translation and routing only) to 3
+            (most thorough). Each level compiles with a preset of
+            :mod:`ucc.transpilers.ucc_defaults`, ``UCCDefault0`` to
+            ``UCCDefault3``. Defaults to ``UCCDefault1``.
+        profile (str): If ``"cprofile"`` or ``"tracemalloc"``, every pass is
+            profiled separately with :mod:`cProfile` or :mod:`tracemalloc`,
+            and the profile of each pass is written to a file, see
+            `profile_dir`. The cache is not used while profiling. Defaults to
+            the ``UCC_PROFILE`` environment variable, or no profiling.
+        profile_dir (str): Directory in which each profiled call creates a
+            subdirectory for its files, reported in
+            :attr:`~ucc.CompileReport.profile_dir`. Defaults to the
+            ``UCC_PROFILE_DIR`` environment variable, or ``ucc_profile``.
+
+    Returns:
+        object: The compiled circuit in the specified format, or a tuple of the
+        compiled circuit and its :class:`~ucc.CompileReport` if
+        `return_report` is True.
+    """
+    result, report = _compile(
+        circuit,
+        return_format,
+        target_device,
+        cache,
+        window_size=window_size,
+        time_budget=time_budget,
+        collect_passes=return_report,
+        optimization_level=optimization_level,
+        profile=profile,
+        profile_dir=profile_dir,
+    )
+    return (result, report) if return_report else result
+
+
+def compile_dag(
+    dag,
+    target_device=None,
+    time_budget=None,
+    return_report=False,
+    optimization_level=1,
+):
+    """Compiles the Qiskit :class:`~qiskit.dagcircuit.DAGCircuit` `dag` and
+    returns the compiled DAG.
+
+    Same as :func:`compile` for a Qiskit circuit, but the DAG is passed to the
+    passes as is, without converting the input to a DAG and the result back
+    to a circuit. Use it when the circuit is built as a DAG or is processed
+    further as a DAG. The passes modify `dag` in place, so it should not be
+    used afterwards.
+
+    Args:
+        dag (DAGCircuit): The circuit to be compiled.
+        target_device: Same as in :func:`compile`.
+        time_budget (float): Same as in :func:`compile`.
+        return_report (bool): Same as in :func:`compile`.
+        optimization_level (int): Same as in :func:`compile`.
 
     Returns:
-        object: The compiled circuit in the specified format.
+        DAGCircuit: The compiled DAG, or a tuple of the compiled DAG and its
+        :class:`~ucc.CompileReport` if `return_report` is True.
     """
+    result, report = _compile(
+        dag,
+        "dag",
+        target_device,
+        time_budget=time_budget,
+        collect_passes=return_report,
+        optimization_level=optimization_level,
+    )
+    return (result, report) if return_report else result
+
+
+# Share of the time budget after which optional stages are skipped, the rest
+# is left for the passes that always run and for format conversion.
+_DEADLINE_FRACTION = 0.8
+
+
+def _compile(
+    circuit,
+    return_format="original",
+    target_device=None,
+    cache=None,
+    callback=None,
+    window_size=None,
+    time_budget=None,
+    collect_passes=False,
+    optimization_level=1,
+    profile=None,
+    profile_dir=None,
+):
+    """Implements :func:`compile`, returning the compiled circuit and its
+    :class:`~ucc.CompileReport`. `callback` is called after every pass, see
+    :meth:`~ucc.transpilers.pipeline.CompilationPipeline.run`. If
+    `collect_passes` is True, the report describes each pass and the
+    commutation cache lookups."""
+    start = time.perf_counter()
+    if profile is None:
+        profile = os.environ.get("UCC_PROFILE") or None
+    if profile is not None and profile not in _PROFILERS:
+        raise ValueError(f"Unknown profile {profile!r}, expected one of {_PROFILERS}.")
+    report = CompileReport(time_budget=time_budget)
     if return_format == "original":
-        return_format = get_program_type_alias(circuit)
+        return_format = _get_program_type_alias(circuit)
+
+    coupling_list = get_backend_connectivity(target_device)
+    if window_size is not None and (coupling_list is not None or time_budget is not None):
+        raise ValueError("Windowed compilation does not support a target_device or time_budget.")
+    transpiler = _default_transpiler(optimization_level)
+
+    if cache is True:
+        cache = default_cache()
+    elif cache is False or profile is not None:
+        cache = None
+    if cache is not None:
+        key = cache.key(
+            circuit,
+            return_format,
+            coupling_list,
+            transpiler,
+            options={"window_size": window_size, "time_budget": time_budget},
+        )
+        cached_result = cache.get(key)
+        if cached_result is not None:
+            report.cache_hit = True
+            report.elapsed = time.perf_counter() - start
+            return cached_result, report
 
     # Translate to Qiskit Circuit object
-    qiskit_circuit = transpile(circuit, "qiskit")
-    compiled_circuit = UCCDefault1().run(
-        qiskit_circuit,
-        coupling_list=get_backend_connectivity(target_device),
-    )
+    qiskit_circuit = _to_qiskit(circuit)
+    deadline = None
+    if time_budget is not None:
+        report.tier = transpiler.select_tier(qiskit_circuit, coupling_list, time_budget)
+        deadline = start + _DEADLINE_FRACTION * time_budget
+    pipeline = transpiler.pipeline(coupling_list, report.tier)
+    with contextlib.ExitStack() as stack:
+        if profile is not None:
+            callback = stack.enter_context(_PassProfiler(profile, profile_dir, callback))
+            report.profile_dir = callback.directory
+        if collect_passes:
+            callback = stack.enter_context(_PassCollector(pipeline, report, callback))
+        if window_size is not None:
+            compiled_circuit = transpiler.run_windowed(
+                qiskit_circuit, window_size, callback=callback
+            )
+        else:
+            compiled_circuit = pipeline.run(
+                qiskit_circuit, callback=callback, deadline=deadline
+            )
+            report.skipped_stages = list(pipeline.property_set["skipped_stages"] or [])
+            report.unchanged_stages = list(pipeline.property_set["unchanged_stages"] or [])
+            report.local_iterations = pipeline.property_set["local_iterations"]
+    if coupling_list is not None:
+        report.knobs = transpiler.tier_knobs(report.tier)
+        report.shortened_stages = transpiler.shortened_stages(report.tier)
 
     # Translate the compiled circuit to the desired format
-    final_result = transpile(compiled_circuit, return_format)
-    return final_result
+    final_result = _from_qiskit(compiled_circuit, return_format)
+    # A result compiled with stages skipped for the deadline is not cached, a
+    # later call could have the time to run them
+    if cache is not None and not report.skipped_stages:
+        cache.put(key, final_result)
+    report.elapsed = time.perf_counter() - start
+    return final_result, report
+
+
+# Number of compilations tracing memory, tracing stops when the last one ends
+_tracing_count = 0
+_tracing_lock = threading.Lock()
+
+
+def _start_tracing():
+    """Starts tracing memory allocations, unless already traced by the caller."""
+    global _tracing_count
+    with _tracing_lock:
+        if _tracing_count == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_count = 1
+        elif _tracing_count:
+            _tracing_count += 1
+
+
+def _stop_tracing():
+    """Stops tracing memory allocations once no compilation needs them."""
+    global _tracing_count
+    with _tracing_lock:
+        if _tracing_count:
+            _tracing_count -= 1
+            if _tracing_count == 0:
+                tracemalloc.stop()
+
+
+class _PassCollector:
+    """Pass manager callback adding a :class:`~ucc.report.PassReport` to
+    `report` after every pass, then calling `callback` if given.
+
+    Used as a context manager around the run of `pipeline`, which traces
+    memory allocations and stores the lookups of the commutation checkers of
+    the pipeline in ``report.commutation_cache``.
+    """
+
+    def __init__(self, pipeline, report, callback=None):
+        self.report = report
+        self.callback = callback
+        self._checkers = []
+        for pass_ in pipeline.passes():
+            checker = getattr(pass_, "comm_checker", None)
+            if checker is not None and all(checker is not c for c in self._checkers):
+                self._checkers.append(checker)
+        self._memory = 0
+        self._stats_before = None
+
+    def __enter__(self):
+        _start_tracing()
+        tracemalloc.reset_peak()
+        self._memory = tracemalloc.get_traced_memory()[0]
+        self._stats_before = self._cache_stats()
+        return self
+
+    def __exit__(self, *exc_info):
+        _stop_tracing()
+        if self._checkers:
+            stats = {
+                name: count - self._stats_before[name]
+                for name, count in self._cache_stats().items()
+            }
+            hits = stats["library_hits"] + stats["analytic_hits"] + stats["cache_hits"]
+            lookups = hits + stats["misses"]
+            stats["hit_rate"] = hits / lookups if lookups else None
+            self.report.commutation_cache = stats
+
+    def _cache_stats(self):
+        totals = {
+            "library_hits": 0,
+            "analytic_hits": 0,
+            "cache_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+        for checker in self._checkers:
+            for name, count in checker.cache_stats().items():
+                totals[name] += count
+        return totals
+
+    def __call__(self, pass_, dag, time, **kwargs):
+        current, peak = tracemalloc.get_traced_memory()
+        self.report.passes.append(
+            PassReport(
+                pass_.name(),
+                time,
+                current - self._memory,
+                peak - self._memory,
+                dag.size(),
+                len(dag.two_qubit_ops()),
+                dag.depth(),
+            )
+        )
+        if self.callback is not None:
+            self.callback(pass_=pass_, dag=dag, time=time, **kwargs)
+        # The measurements above and the callback are not attributed to the
+        # next pass
+        tracemalloc.reset_peak()
+        self._memory = tracemalloc.get_traced_memory()[0]
+
+
+_PROFILERS = ("cprofile", "tracemalloc")
+
+
+class _PassProfiler:
+    """Pass manager callback writing the profile of every pass to a new
+    subdirectory of `directory`, then calling `callback` if given.
+
+    With ``"cprofile"``, each pass gets a ``.pstats`` file of :mod:`cProfile`
+    statistics, to be read with :class:`pstats.Stats`. With ``"tracemalloc"``,
+    it gets a ``.tracemalloc`` snapshot of the memory the pass allocated and
+    still held when it ended, to be read with
+    :meth:`tracemalloc.Snapshot.load`. The profile of a pass covers the time
+    since the previous pass ended, which includes the flow controller
+    deciding to run it. The files are numbered in the order the passes ran.
+
+    Used as a context manager around the run. Traces are cleared after every
+    pass, so memory profiles of concurrent compilations are mixed up.
+    """
+
+    def __init__(self, profile, directory=None, callback=None):
+        directory = directory or os.environ.get("UCC_PROFILE_DIR") or "ucc_profile"
+        os.makedirs(directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix=time.strftime("%Y%m%d-%H%M%S-"), dir=directory)
+        self.profile = profile
+        self.callback = callback
+        self._profiler = None
+        self._count = 0
+
+    def __enter__(self):
+        if self.profile == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            _start_tracing()
+            tracemalloc.clear_traces()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile == "cprofile":
+            self._profiler.disable()
+        else:
+            _stop_tracing()
+
+    def __call__(self, pass_, **kwargs):
+        path = os.path.join(self.directory, f"{self._count:04d}_{pass_.name()}")
+        self._count += 1
+        if self.profile == "cprofile":
+            self._profiler.disable()
+            self._profiler.dump_stats(f"{path}.pstats")
+            self._profiler = cProfile.Profile()
+        else:
+            tracemalloc.take_snapshot().dump(f"{path}.tracemalloc")
+        if self.callback is not None:
+            self.callback(pass_=pass_, **kwargs)
+        # Nothing before this point is attributed to the next pass
+        if self.profile == "cprofile":
+            self._profiler.enable()
+        else:
+            tracemalloc.clear_traces()
+
+
+_QASM_VERSION = re.compile(r"^\s*OPENQASM\s+([23])(?:\.\d+)?\s*;", re.MULTILINE)
+
+
+def _get_program_type_alias(circuit):
+    """Returns the qBraid alias of the format of `circuit`, such as "qasm2".
+
+    Qiskit circuits and OpenQASM strings with a version header are recognized
+    without importing qBraid.
+    """
+    if isinstance(circuit, QuantumCircuit):
+        return "qiskit"
+    if isinstance(circuit, str):
+        match = _QASM_VERSION.search(circuit)
+        if match:
+            return f"qasm{match.group(1)}"
+    from qbraid.programs.alias_manager import get_program_type_alias
+
+    return get_program_type_alias(circuit)
+
+
+def _to_qiskit(circuit):
+    """Translates `circuit` to a Qiskit circuit.
+
+    OpenQASM strings are parsed directly with ``qiskit.qasm2``/``qiskit.qasm3``
+    rather than through the qBraid conversion graph, which has to identify the
+    format and find a conversion path first. Qiskit circuits and DAGs are
+    returned as is, anything else goes through qBraid.
+    """
+    if isinstance(circuit, (QuantumCircuit, DAGCircuit)):
+        return circuit
+    if isinstance(circuit, str):
+        alias = _get_program_type_alias(circuit)
+        if alias == "qasm2":
+            # The same gate definitions as QuantumCircuit.from_qasm_str, used by qBraid
+            return qasm2.loads(
+                circuit, custom_instructions=qasm2.LEGACY_CUSTOM_INSTRUCTIONS
+            )
+        if alias == "qasm3":
+            try:
+                return qasm3.loads(circuit)
+            except qasm3.QASM3ImporterError:
+                # qBraid rewrites some notation the importer does not support
+                pass
+    from qbraid.transpiler import transpile
+
+    return transpile(circuit, "qiskit")
+
+
+def _from_qiskit(circuit, return_format):
+    """Translates the Qiskit `circuit` to `return_format`, emitting OpenQASM
+    directly instead of going through the qBraid conversion graph."""
+    if return_format in ("qiskit", "dag"):
+        return circuit
+    if return_format == "qasm2":
+        return qasm2.dumps(circuit)
+    if return_format == "qasm3":
+        return qasm3.dumps(circuit)
+    from qbraid.transpiler import transpile
+
+    return transpile(circuit, return_format)
+
+
+_thread_state = threading.local()
+
+
+def _default_transpiler(optimization_level=1):
+    """Returns this thread's preset for `optimization_level`, such as
+    ``UCCDefault1``, whose pipelines are reused between calls to
+    :func:`compile`."""
+    if optimization_level not in range(len(OPTIMIZATION_LEVELS)):
+        raise ValueError(
+            f"Unknown optimization_level {optimization_level!r}, expected 0 to "
+            f"{len(OPTIMIZATION_LEVELS) - 1}."
+        )
+    transpilers = getattr(_thread_state, "transpilers", None)
+    if transpilers is None:
+        transpilers = _thread_state.transpilers = {}
+    transpiler = transpilers.get(optimization_level)
+    if transpiler is None:
+        transpiler = transpilers[optimization_level] = OPTIMIZATION_LEVELS[optimization_level]()
+    return transpiler
+
+
+def compile_many(
+    circuits,
+    return_format="original",
+    target_device=None,
+    max_workers=None,
+    optimization_level=1,
+):
+    """Compiles a batch of quantum `circuits` on a pool of worker processes.
+
+    The worker processes are kept alive between calls, so repeated batches do
+    not pay the interpreter startup and import cost again. Results are returned
+    in the same order as the input circuits. A circuit that fails to compile
+    does not fail the batch: its entry holds the raised exception instead.
+
+    Args:
+        circuits (list): The quantum circuits to be compiled.
+        return_format (str): The format in which the circuits will be returned.
+            Same as in :func:`compile`. Defaults to the format of each input circuit.
+        target_device: Same as in :func:`compile`. Applied to every circuit.
+        max_workers (int): Number of worker processes. Defaults to the number of
+            CPUs. With ``max_workers=1`` the batch is compiled in this process.
+        optimization_level (int): Same as in :func:`compile`.
+
+    Returns:
+        list: The compiled circuits, or the exception raised for that circuit.
+    """
+    circuits = list(circuits)
+    coupling_list = get_backend_connectivity(target_device)
+    if coupling_list is not None:
+        # Backends and coupling maps are not cheap to pickle, edge lists are
+        coupling_list = [tuple(edge) for edge in coupling_list]
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers <= 1 or not circuits:
+        return [
+            _compile_or_error(circuit, return_format, coupling_list, optimization_level)
+            for circuit in circuits
+        ]
+
+    # The pool is sized by max_workers rather than by the batch, so that
+    # smaller batches reuse its warm workers. A few chunks per worker keeps
+    # the pool busy without paying the inter-process round trip for every
+    # circuit.
+    chunksize = max(1, math.ceil(len(circuits) / (4 * max_workers)))
+    chunks = [circuits[start : start + chunksize] for start in range(0, len(circuits), chunksize)]
+    executor, futures = _submit_to_executor(
+        max_workers,
+        _compile_chunk,
+        [(chunk, return_format, coupling_list, optimization_level) for chunk in chunks],
+    )
+
+    results = []
+    for chunk, future in zip(chunks, futures):
+        try:
+            results.extend(future.result())
+        except BrokenProcessPool as error:
+            # A worker died, e.g. killed for running out of memory. The pool
+            # is replaced on the next call.
+            _discard_executor(executor)
+            results.extend([error] * len(chunk))
+        except Exception as error:
+            # The results of the chunk could not be sent back, e.g. an
+            # exception or circuit that can not be unpickled
+            results.extend([error] * len(chunk))
+    return results
+
+
+def _compile_chunk(circuits, return_format, coupling_list, optimization_level):
+    return [
+        _compile_or_error(circuit, return_format, coupling_list, optimization_level)
+        for circuit in circuits
+    ]
+
+
+def _compile_or_error(circuit, return_format, coupling_list, optimization_level=1):
+    """Compiles a single circuit of a batch, returning the exception on failure."""
+    try:
+        return compile(
+            circuit,
+            return_format=return_format,
+            target_device=coupling_list,
+            optimization_level=optimization_level,
+        )
+    except Exception as error:
+        return error
+
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def _get_executor(max_workers, reuse_larger=False):
+    """Returns the shared worker pool, (re)creating it if the size changed or
+    it was discarded. With `reuse_larger`, a pool of more than `max_workers`
+    workers is kept. Must be called with ``_executor_lock`` held."""
+    global _executor, _executor_workers
+    if (
+        _executor is None
+        or _executor_workers < max_workers
+        or (_executor_workers > max_workers and not reuse_larger)
+    ):
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker
+        )
+        _executor_workers = max_workers
+    return _executor
+
+
+def _discard_executor(executor):
+    """Drops `executor` after one of its workers died, so that the next call
+    to :func:`_get_executor` starts a new pool."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _submit_to_executor(max_workers, function, arguments, reuse_larger=False):
+    """Submits `function` once per tuple of `arguments` to the shared worker
+    pool and returns the pool with the futures, in the same order. The pool
+    is obtained with :func:`_get_executor`.
+
+    If the pool is already broken, it is replaced and the calls are submitted
+    again to the new one.
+    """
+    for attempt in range(2):
+        with _executor_lock:
+            # Submitted under the lock, so that no other caller swaps the pool
+            # before all calls are queued on it
+            executor = _get_executor(max_workers, reuse_larger)
+            try:
+                return executor, [executor.submit(function, *args) for args in arguments]
+            except BrokenProcessPool:
+                if attempt:
+                    raise
+        _discard_executor(executor)
+
+
+def _init_worker():
+    # Each circuit already has a worker, so the passes must not start pools
+    # of their own, see ParallelComponentOptimization
+    os.environ["QISKIT_IN_PARALLEL"] = "TRUE"
+
+
+@atexit.register
+def _shutdown_executor():
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
 
 
 def get_backend_connectivity(target_device = None) -> str:
@@ -0,0 +1,103 @@
+"""Report of how a circuit was compiled."""
+
+
+class CompileReport:
+    """Describes a call to :func:`ucc.compile`, returned with the compiled
+    circuit when ``return_report=True``.
+
+    Attributes:
+        time_budget (float): The requested time budget in seconds, or None.
+        elapsed (float): Wall time of the call in seconds.
+        cache_hit (bool): Whether the result was taken from the cache.
+        tier (str): Effort tier of the mapping passes, see
+            :meth:`~ucc.transpilers.ucc_defaults.UCCDefault1.tier_knobs`.
+        knobs (dict): Settings of the mapping passes in that tier.
+        shortened_stages (list[str]): Stages that ran with less effort than in
+            the "full" tier.
+        skipped_stages (list[str]): Optional stages skipped because the deadline
+            had passed, in the order they were skipped.
+        unchanged_stages (list[str]): Stages of the local passes skipped because
+            the circuit did not change since they last ran, in the order they
+            were skipped, see :func:`~ucc.transpilers.pipeline.tracked_stage`.
+        local_iterations (int): Number of iterations of the local passes run
+            by a converging loop, see
+            :meth:`~ucc.transpilers.ucc_defaults.UCCDefault1.add_converging_local_passes`.
+            None if the local passes run a fixed number of times.
+        passes (list[PassReport]): One entry per pass run, in the order they
+            ran. Passes run more than once, such as the local passes, have one
+            entry per run.
+        commutation_cache (dict): Lookups of the commutation checkers during
+            the run, with the number of ``"library_hits"``,
+            ``"analytic_hits"``, ``"cache_hits"`` and ``"misses"``, and the
+            ``"hit_rate"`` of all lookups, and the number of cache entries
+            evicted (``"evictions"``). Empty if no commutation analysis ran.
+        profile_dir (str): Directory with the profile of each pass if the
+            call was profiled, see the `profile` argument of
+            :func:`ucc.compile`, otherwise None.
+    """
+
+    def __init__(self, time_budget=None):
+        self.time_budget = time_budget
+        self.elapsed = None
+        self.cache_hit = False
+        self.tier = "full"
+        self.knobs = {}
+        self.shortened_stages = []
+        self.skipped_stages = []
+        self.unchanged_stages = []
+        self.local_iterations = None
+        self.passes = []
+        self.commutation_cache = {}
+        self.profile_dir = None
+
+    @property
+    def shortened(self):
+        """Whether any stage was shortened or skipped to meet the time budget."""
+        return bool(self.shortened_stages or self.skipped_stages)
+
+    def pass_times(self):
+        """Returns the total wall time of each pass in seconds, keyed by pass
+        name, slowest first."""
+        times = {}
+        for record in self.passes:
+            times[record.name] = times.get(record.name, 0.0) + record.time
+        return dict(sorted(times.items(), key=lambda item: -item[1]))
+
+    def __repr__(self):
+        return (
+            f"CompileReport(elapsed={self.elapsed!r}, time_budget={self.time_budget!r}, "
+            f"tier={self.tier!r}, shortened_stages={self.shortened_stages!r}, "
+            f"skipped_stages={self.skipped_stages!r}, cache_hit={self.cache_hit!r})"
+        )
+
+
+class PassReport:
+    """Describes one run of a pass, see :attr:`CompileReport.passes`.
+
+    Attributes:
+        name (str): Name of the pass.
+        time (float): Wall time of the pass in seconds.
+        memory (int): Net memory allocated by the pass in bytes, as traced by
+            :mod:`tracemalloc`. Negative if the pass freed more than it
+            allocated.
+        peak_memory (int): Peak of the traced memory while the pass ran, in
+            bytes above the traced memory when it started.
+        size (int): Number of operations in the circuit after the pass.
+        two_qubit_gates (int): Number of 2-qubit operations after the pass.
+        depth (int): Depth of the circuit after the pass.
+    """
+
+    def __init__(self, name, time, memory, peak_memory, size, two_qubit_gates, depth):
+        self.name = name
+        self.time = time
+        self.memory = memory
+        self.peak_memory = peak_memory
+        self.size = size
+        self.two_qubit_gates = two_qubit_gates
+        self.depth = depth
+
+    def __repr__(self):
+        return (
+            f"PassReport(name={self.name!r}, time={self.time!r}, memory={self.memory!r}, "
+            f"size={self.size!r}, two_qubit_gates={self.two_qubit_gates!r}, depth={self.depth!r})"
+        )
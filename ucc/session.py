@@ -0,0 +1,196 @@
+"""Incremental compilation of circuits that grow by appended gates."""
+
+import dataclasses
+import threading
+
+from qiskit.transpiler import CouplingMap, Layout, PassManager
+
+from .compile import _compile, _default_transpiler, _to_qiskit, get_backend_connectivity
+from .transpilers.pipeline import _symmetric_coupling_map
+
+
+class CompilationSession:
+    """Compiles a circuit built by appending gates, recompiling only what was
+    appended.
+
+    The first call to :meth:`compile` compiles the whole circuit with
+    :func:`ucc.compile`. After that, gates appended with :meth:`append`, or by
+    calling :meth:`compile` again with a circuit that extends the previous
+    one, are compiled together with the last `boundary_size` instructions of
+    the compiled circuit only, so that gates on both sides of the boundary can
+    still cancel or merge. With a target device, the appended gates start
+    from the final layout of the compiled circuit and are routed with Sabre.
+    The layout is not searched again, so the result can need more swaps than
+    compiling the whole circuit from scratch; call :meth:`reset` to do so.
+
+    The compile time of an edit depends on the number of appended gates and
+    on `boundary_size`, not on the size of the circuit.
+
+    Args:
+        target_device: Same as in :func:`ucc.compile`.
+        optimization_level (int): Same as in :func:`ucc.compile`.
+        boundary_size (int): Number of trailing instructions of the compiled
+            circuit compiled again with each edit.
+    """
+
+    def __init__(self, target_device=None, optimization_level=1, boundary_size=100):
+        if boundary_size < 0:
+            raise ValueError("boundary_size must not be negative.")
+        self.coupling_list = get_backend_connectivity(target_device)
+        self.optimization_level = optimization_level
+        self.boundary_size = boundary_size
+        self._transpiler = _default_transpiler(optimization_level)
+        self._suffix_passes = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forgets the compiled circuit, the next call to :meth:`compile`
+        compiles from scratch."""
+        self._source = None
+        self._compiled = None
+        # Physical qubit of each virtual qubit at the start of the compiled
+        # circuit, and position at the end of the circuit of each physical qubit
+        self._initial_positions = None
+        self._permutation = None
+
+    @property
+    def compiled_circuit(self):
+        """The compiled circuit, or None before the first call to
+        :meth:`compile`."""
+        return self._compiled
+
+    @property
+    def final_layout(self):
+        """The physical qubit holding each virtual qubit of the input circuit at
+        the end of the compiled circuit, as a list indexed by virtual qubit."""
+        if self._compiled is None:
+            return None
+        return [self._permutation[position] for position in self._initial_positions]
+
+    def compile(self, circuit):
+        """Compiles `circuit`, only compiling the appended instructions if it
+        extends the circuit of the previous call.
+
+        Checking whether `circuit` extends the previous circuit compares their
+        instructions, use :meth:`append` to skip that check.
+
+        Args:
+            circuit (object): The quantum circuit to be compiled, in any format
+                supported by :func:`ucc.compile`.
+
+        Returns:
+            QuantumCircuit: The compiled circuit. It is updated in place by
+            later calls, copy it to keep it.
+        """
+        circuit = _to_qiskit(circuit)
+        with self._lock:
+            if self._extends_source(circuit):
+                suffix = circuit.copy_empty_like()
+                suffix.global_phase = circuit.global_phase - self._source.global_phase
+                for instruction in circuit.data[len(self._source.data) :]:
+                    suffix._append(instruction)
+                    self._source._append(instruction)
+                self._source.global_phase = circuit.global_phase
+                return self._append(suffix)
+
+            self._source = circuit.copy()
+            self._compiled, _ = _compile(
+                circuit,
+                "qiskit",
+                self.coupling_list,
+                optimization_level=self.optimization_level,
+            )
+            layout = self._compiled.layout
+            if layout is None:
+                self._initial_positions = list(range(circuit.num_qubits))
+                self._permutation = list(range(self._compiled.num_qubits))
+            else:
+                self._initial_positions = layout.initial_index_layout(filter_ancillas=True)
+                self._permutation = _final_permutation(layout, self._compiled.qubits)
+            return self._compiled
+
+    def append(self, gates):
+        """Appends `gates` to the circuit and compiles them.
+
+        Args:
+            gates (QuantumCircuit): The gates to append, on as many qubits and
+                classical bits as the circuit.
+
+        Returns:
+            QuantumCircuit: The compiled circuit. It is updated in place by
+            later calls, copy it to keep it.
+        """
+        with self._lock:
+            if self._compiled is None:
+                raise ValueError("Nothing compiled yet, call compile() first.")
+            if gates.num_qubits != self._source.num_qubits or gates.num_clbits != self._source.num_clbits:
+                raise ValueError("The appended gates must act on the qubits of the circuit.")
+            self._source.compose(gates, inplace=True)
+            return self._append(gates)
+
+    def _extends_source(self, circuit):
+        source = self._source
+        return (
+            source is not None
+            and circuit.qubits == source.qubits
+            and circuit.clbits == source.clbits
+            and len(circuit.data) >= len(source.data)
+            and circuit.data[: len(source.data)] == list(source.data)
+        )
+
+    def _append(self, gates):
+        """Compiles `gates` with the boundary of the compiled circuit, and
+        replaces the boundary with the result."""
+        if self._suffix_passes is None:
+            self._suffix_passes = PassManager()
+            routing_map = None
+            if self.coupling_list is not None:
+                routing_map = _symmetric_coupling_map(CouplingMap(couplinglist=self.coupling_list))
+            self._transpiler.append_suffix_passes(self._suffix_passes, routing_map)
+
+        compiled = self._compiled
+        boundary_size = min(self.boundary_size, len(compiled.data))
+        window = compiled.copy_empty_like()
+        window.global_phase = gates.global_phase
+        for instruction in compiled.data[len(compiled.data) - boundary_size :]:
+            window._append(instruction)
+        # The gates act on the physical qubits holding their virtual qubits now
+        positions = self.final_layout
+        for instruction in gates.data:
+            window._append(
+                instruction.replace(
+                    qubits=tuple(
+                        window.qubits[positions[gates.find_bit(qubit).index]]
+                        for qubit in instruction.qubits
+                    ),
+                    clbits=tuple(
+                        window.clbits[gates.find_bit(clbit).index] for clbit in instruction.clbits
+                    ),
+                )
+            )
+
+        compiled_window = self._suffix_passes.run(window)
+        del compiled.data[len(compiled.data) - boundary_size :]
+        for instruction in compiled_window.data:
+            compiled._append(instruction)
+        compiled.global_phase += compiled_window.global_phase
+
+        window_layout = self._suffix_passes.property_set["final_layout"]
+        if window_layout is not None:
+            self._permutation = [
+                window_layout[compiled.qubits[position]] for position in self._permutation
+            ]
+            compiled._layout = dataclasses.replace(
+                compiled.layout,
+                final_layout=Layout(dict(zip(compiled.qubits, self._permutation))),
+            )
+        return compiled
+
+
+def _final_permutation(layout, qubits):
+    """Returns the position at the end of the circuit of each of its physical
+    `qubits`, from the :class:`~qiskit.transpiler.TranspileLayout` `layout`."""
+    if layout.final_layout is None:
+        return list(range(len(qubits)))
+    return [layout.final_layout[qubit] for qubit in qubits]
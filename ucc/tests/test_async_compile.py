@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import Statevector
+
+from ucc import AsyncCompiler, compile_async
+from ucc import async_compile
+
+
+def test_compile_async_does_not_block_event_loop():
+    circuit = QuantumCircuit(3)
+    circuit.h(0)
+    circuit.cx(0, 1)
+    circuit.cx(1, 2)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        result = await compile_async(circuit)
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(main())
+    assert isinstance(result, QuantumCircuit)
+    assert Statevector(result).equiv(Statevector(circuit))
+    assert ticks > 0
+
+
+def test_in_flight_compilations_are_bounded(monkeypatch):
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def fake_compile(circuit, return_format, target_device, cache, callback=None, **options):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return circuit, None
+
+    monkeypatch.setattr(async_compile, "_compile", fake_compile)
+
+    async def main():
+        compiler = AsyncCompiler(max_in_flight=2)
+        try:
+            return await asyncio.gather(*(compiler.compile(i) for i in range(6)))
+        finally:
+            compiler.shutdown()
+
+    assert asyncio.run(main()) == list(range(6))
+    assert max_running == 2
+
+
+def test_timeout_stops_compilation_between_passes(monkeypatch):
+    passes_run = []
+    stopped = threading.Event()
+
+    def fake_compile(circuit, return_format, target_device, cache, callback=None, **options):
+        try:
+            for index in range(100):
+                time.sleep(0.01)
+                passes_run.append(index)
+                callback(pass_=None, dag=None, time=0.0, property_set={}, count=index)
+        finally:
+            stopped.set()
+
+    monkeypatch.setattr(async_compile, "_compile", fake_compile)
+
+    async def main():
+        compiler = AsyncCompiler(max_in_flight=1)
+        try:
+            await compiler.compile(None, timeout=0.1)
+        finally:
+            compiler.shutdown()
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(main())
+    assert stopped.is_set()
+    assert len(passes_run) < 100
+
+
+def test_abandoned_compilation_holds_its_slot(monkeypatch):
+    intervals = []
+
+    def fake_compile(circuit, return_format, target_device, cache, callback=None, **options):
+        # Ignores the callback, like a compilation in a worker process
+        start = time.perf_counter()
+        time.sleep(0.3)
+        intervals.append((start, time.perf_counter()))
+        return circuit, None
+
+    monkeypatch.setattr(async_compile, "_compile", fake_compile)
+
+    async def main():
+        # More threads than slots, so only the slot can keep the jobs apart
+        compiler = AsyncCompiler(executor=executor, max_in_flight=1)
+        with pytest.raises(TimeoutError):
+            await compiler.compile(0, timeout=0.05)
+        return await compiler.compile(1)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert asyncio.run(main()) == 1
+    (_, first_end), (second_start, _) = sorted(intervals)
+    assert second_start >= first_end
@@ -0,0 +1,149 @@
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from qiskit import ClassicalRegister, QuantumCircuit, QuantumRegister, qasm2
+from qiskit.transpiler.passes import Optimize1qGatesDecomposition
+
+from benchmarks.scripts import qcnn_circuit
+import ucc
+from ucc import CompilationCache, compile
+from ucc import cache as cache_module
+from ucc.transpilers.ucc_defaults import UCCDefault1
+
+REPO_ROOT = os.path.dirname(os.path.dirname(ucc.__file__))
+
+
+def test_cache_hit_returns_equal_copy():
+    cache = CompilationCache()
+    circuit = qcnn_circuit(6, 1)
+    first = compile(circuit, cache=cache)
+    second = compile(circuit, cache=cache)
+    assert cache.hits == 1 and cache.misses == 1
+    assert first == second
+    assert first is not second
+
+
+def test_cache_key_depends_on_circuit_and_device():
+    cache = CompilationCache()
+    circuit = QuantumCircuit(3)
+    circuit.h(0)
+    circuit.cx(0, 2)
+    other = circuit.copy()
+    other.cx(1, 2)
+    compile(circuit, cache=cache)
+    compile(circuit, cache=cache, target_device=[(0, 1), (1, 2)])
+    compile(other, cache=cache)
+    assert cache.hits == 0 and cache.misses == 3
+
+
+def test_disk_tier_survives_memory_eviction(tmp_path):
+    qasm = qasm2.dumps(qcnn_circuit(6, 326))
+    cache = CompilationCache(max_entries=0, directory=tmp_path)
+    first = compile(qasm, cache=cache)
+    assert len(cache) == 0
+    assert compile(qasm, cache=cache) == first
+    assert cache.disk_hits == 1
+
+    cache = CompilationCache(directory=tmp_path, max_disk_bytes=0)
+    compile(qasm + "\n", cache=cache)
+    assert cache.stats()["disk_bytes"] == 0
+
+
+def _if_circuit(register_name="c"):
+    qubits = QuantumRegister(2, "q")
+    clbits = ClassicalRegister(1, register_name)
+    circuit = QuantumCircuit(qubits, clbits)
+    circuit.h(0)
+    circuit.measure(0, 0)
+    with circuit.if_test((clbits, 1)):
+        circuit.x(1)
+    return circuit
+
+
+def test_cache_key_of_control_flow_and_registers():
+    cache = CompilationCache()
+    transpiler = UCCDefault1()
+    key = cache.key(_if_circuit(), "qiskit", None, transpiler)
+    assert cache.key(_if_circuit(), "qiskit", None, transpiler) == key
+    assert cache.key(_if_circuit("d"), "qiskit", None, transpiler) != key
+
+
+def test_cache_key_depends_on_pass_settings_and_is_stable():
+    cache = CompilationCache()
+    circuit = qcnn_circuit(6, 1)
+    transpiler = UCCDefault1()
+    key = cache.key(circuit, "qiskit", None, transpiler)
+    transpiler.run(circuit)
+    assert cache.key(circuit, "qiskit", None, transpiler) == key
+    other = UCCDefault1()
+    other.pass_manager.append(Optimize1qGatesDecomposition(basis=["rz", "sx"]))
+    changed = UCCDefault1()
+    changed.pass_manager.append(Optimize1qGatesDecomposition(basis=["rz", "rx"]))
+    assert cache.key(circuit, "qiskit", None, other) != cache.key(
+        circuit, "qiskit", None, changed
+    )
+
+
+def test_cache_key_depends_on_tier_settings():
+    cache = CompilationCache()
+    circuit = qcnn_circuit(4, 1)
+    line = [(0, 1), (1, 2), (2, 3)]
+    options = {"window_size": None, "time_budget": 1.0}
+    transpiler = UCCDefault1()
+    key = cache.key(circuit, "qiskit", line, transpiler, options)
+    assert cache.key(circuit, "qiskit", line, UCCDefault1(), options) == key
+    for name, value in [
+        ("sabre_trials", 3),
+        ("routed_local_iterations", 3),
+        ("tier_seconds_per_2q_gate", {"full": 1e-9}),
+    ]:
+        changed = UCCDefault1()
+        setattr(changed, name, value)
+        assert cache.key(circuit, "qiskit", line, changed, options) != key
+
+
+def test_results_with_skipped_stages_are_not_cached():
+    cache = CompilationCache()
+    circuit = qcnn_circuit(4, 1)
+    line = [(0, 1), (1, 2), (2, 3)]
+    _, report = compile(
+        circuit, target_device=line, time_budget=0, cache=cache, return_report=True
+    )
+    assert report.skipped_stages
+    assert len(cache) == 0
+    compile(circuit, target_device=line, cache=cache)
+    assert len(cache) == 1
+
+
+def test_cache_key_is_the_same_in_every_process():
+    script = (
+        "from benchmarks.scripts import qcnn_circuit\n"
+        "from ucc import CompilationCache\n"
+        "from ucc.transpilers.ucc_defaults import UCCDefault1\n"
+        "print(CompilationCache().key(qcnn_circuit(4, 1), 'qiskit', [(0, 1)], UCCDefault1()))\n"
+    )
+    keys = set()
+    for seed in ("1", "2"):
+        env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=REPO_ROOT)
+        result = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, env=env, check=True
+        )
+        keys.add(result.stdout.strip())
+    assert len(keys) == 1
+
+
+def test_default_cache_is_built_once_across_threads(monkeypatch):
+    class SlowCache(CompilationCache):
+        def __init__(self):
+            # Widens the window in which other threads find no cache yet
+            time.sleep(0.05)
+            super().__init__()
+
+    monkeypatch.setattr(cache_module, "_default_cache", None)
+    monkeypatch.setattr(cache_module, "CompilationCache", SlowCache)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        caches = list(executor.map(lambda _: cache_module.default_cache(), range(8)))
+    assert len({id(cache) for cache in caches}) == 1
@@ -0,0 +1,329 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from qiskit import QuantumCircuit
+from qiskit.circuit import Parameter
+from qiskit.circuit.library import (
+    CCXGate,
+    CRXGate,
+    CRYGate,
+    CRZGate,
+    CXGate,
+    CZGate,
+    HGate,
+    RGate,
+    RXGate,
+    RYGate,
+    RZGate,
+    RZXGate,
+    RZZGate,
+    SwapGate,
+    UGate,
+    XXMinusYYGate,
+)
+from qiskit.converters import circuit_to_dag
+from qiskit.quantum_info import Operator
+
+from ucc.transpiler_passes import CommutationAnalysis, CommutationChecker, commutation_checker
+from ucc.transpiler_passes.commutation_analysis import shared_commutation_checkers
+from ucc.transpiler_passes.commutation_library import load_commutation_library
+from ucc.transpiler_passes.pauli_commutation import pauli_commutation
+from ucc.transpilers.ucc_defaults import UCCDefault1
+
+
+def test_commutation_sets_group_commuting_gates_per_qubit():
+    circuit = QuantumCircuit(3)
+    circuit.z(0)
+    circuit.cx(0, 1)
+    circuit.s(0)
+    circuit.h(0)
+    circuit.x(1)
+    circuit.ccx(2, 1, 0)
+    dag = circuit_to_dag(circuit)
+
+    analysis = CommutationAnalysis()
+    analysis.run(dag)
+    commutation_sets = analysis.property_set["commutation_set"]
+
+    def names(wire):
+        return [[dag.node(node_id).name for node_id in com_set] for com_set in commutation_sets.sets(wire)]
+
+    q0, q1, q2 = dag.qubits
+    assert names(q0) == [["z", "cx", "s"], ["h"], ["ccx"]]
+    assert names(q1) == [["cx", "x"], ["ccx"]]
+    assert names(q2) == [["ccx"]]
+
+    cx, ccx = dag.named_nodes("cx", "ccx")
+    assert commutation_sets.set_index(cx, q0) == 0
+    assert commutation_sets.set_index(cx, q1) == 0
+    assert commutation_sets.set_index(ccx, q0) == 2
+    assert commutation_sets.set_index(ccx, q1) == 1
+    assert commutation_sets.set_index(ccx, q2) == 0
+
+
+def test_commutation_cache_evicts_least_recently_used_entry():
+    checker = CommutationChecker(cache_max_entries=2)
+    qubits = QuantumCircuit(2).qubits
+
+    def commute(angle):
+        return checker.commute(UGate(0, 0, angle), [qubits[0]], [], CXGate(), qubits, [])
+
+    assert commute(0.1) and commute(0.2)
+    assert commute(0.1)
+    assert commute(0.3)
+    assert checker.num_cached_entries() == 2
+    assert checker.cache_stats() == {
+        "library_hits": 0,
+        "analytic_hits": 0,
+        "cache_hits": 1,
+        "misses": 3,
+        "evictions": 1,
+    }
+    # 0.2 was evicted, the recently used 0.1 was kept
+    assert commute(0.1)
+    assert checker.cache_stats()["cache_hits"] == 2
+    assert commute(0.2)
+    assert checker.cache_stats()["misses"] == 4
+    assert checker.cache_stats()["evictions"] == 2
+
+
+def test_commutation_library_answers_standard_gates(monkeypatch):
+    def matmul(*args):
+        raise AssertionError("matrix check of standard gates")
+
+    monkeypatch.setattr(commutation_checker, "_commute_matmul", matmul)
+    checker = CommutationChecker(commutation_library=load_commutation_library())
+    circuit = QuantumCircuit(3)
+    circuit.rz(0.3, 0)
+    circuit.rzz(0.2, 0, 1)
+    circuit.cz(1, 2)
+    circuit.h(2)
+    circuit.ccx(0, 1, 2)
+    dag = circuit_to_dag(circuit)
+
+    nodes = list(dag.op_nodes())
+    results = {
+        (first.name, second.name): checker.commute_nodes(first, second)
+        for first in nodes
+        for second in nodes
+    }
+
+    assert results["rz", "rzz"] and results["rzz", "ccx"]
+    assert not results["cz", "h"] and not results["h", "ccx"]
+    assert checker.cache_stats()["misses"] == 0
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        (RGate(0.3, 0.7), RGate(1.1, 0.7)),
+        (UGate(0.3, 0.4, 0.5), UGate(0.3, 0.4, 0.5)),
+        (XXMinusYYGate(0.3, 0.7), XXMinusYYGate(1.2, 0.7)),
+    ],
+)
+def test_commutation_library_leaves_parameter_relations_to_matrix_check(first, second):
+    qubits = QuantumCircuit(2).qubits[: first.num_qubits]
+    assert commutation_checker._commute_matmul(first, qubits, second, qubits)
+    checker = CommutationChecker(commutation_library=load_commutation_library())
+    assert checker.commute(first, qubits, [], second, qubits, [])
+
+
+def test_commutation_analyses_share_checker_per_configuration():
+    special_commutations = {("rz", "rz"): True}
+    first = CommutationAnalysis(standard_gates=["rz", "cx"], special_commutations=special_commutations)
+    second = CommutationAnalysis(standard_gates=["cx", "rz"], special_commutations=dict(special_commutations))
+    other = CommutationAnalysis(standard_gates=["rz", "cx"], check_matrix=True)
+    assert first.comm_checker is second.comm_checker
+    assert other.comm_checker is not first.comm_checker
+
+    # Threads fill and read the cache of the shared checker concurrently
+    checker = other.comm_checker
+    checker.clear_cached_commutations()
+    qubits = QuantumCircuit(2).qubits
+    angles = [0.1 * index for index in range(1, 50)]
+
+    def commute(angle):
+        return checker.commute(UGate(angle, 0, 0), [qubits[1]], [], RZGate(angle), [qubits[1]], [])
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(commute, angles * 4))
+
+    assert not any(results)
+    assert checker.num_cached_entries() == len(angles)
+    stats = checker.cache_stats()
+    assert stats["cache_hits"] + stats["misses"] == 4 * len(angles)
+
+
+@pytest.mark.parametrize(
+    "first, first_qubits, second, second_qubits",
+    [
+        (RZGate(0.3), [1], RZZGate(0.2), [0, 1]),
+        (RYGate(0.3), [1], CRYGate(0.2), [0, 1]),
+        (RXGate(0.3), [1], CXGate(), [0, 1]),
+        (RXGate(np.pi), [0], RYGate(np.pi / 2), [0]),
+        (RXGate(2 * np.pi), [0], RYGate(0.4), [0]),
+        (RZXGate(0.5), [0, 1], CRXGate(0.7), [0, 1]),
+        (SwapGate(), [0, 1], RZZGate(0.1), [1, 0]),
+        (CCXGate(), [0, 1, 2], CRZGate(0.2), [0, 1]),
+    ],
+)
+def test_pauli_commutation_matches_matrices(first, first_qubits, second, second_qubits):
+    qubits = QuantumCircuit(3).qubits
+    first_qargs = [qubits[index] for index in first_qubits]
+    second_qargs = [qubits[index] for index in second_qubits]
+    expected = commutation_checker._commute_matmul(first, first_qargs, second, second_qargs)
+    assert pauli_commutation(first, first_qargs, second, second_qargs) == expected
+
+
+def test_pauli_commutation_holds_for_unbound_parameters():
+    qubits = QuantumCircuit(2).qubits
+    theta, phi = Parameter("θ"), Parameter("φ")
+    assert pauli_commutation(RZZGate(theta), qubits, RZGate(phi), [qubits[0]])
+    assert pauli_commutation(RXGate(theta), [qubits[0]], RZGate(phi), [qubits[0]]) is False
+    assert pauli_commutation(HGate(), [qubits[0]], RZGate(phi), [qubits[0]]) is None
+    # Depends on more than the Pauli terms of cz
+    assert pauli_commutation(RYGate(theta), [qubits[1]], CZGate(), qubits) is None
+
+
+def test_commute_batch_matches_commute():
+    qubits = QuantumCircuit(4).qubits
+    rng = np.random.default_rng(1234)
+    pairs = []
+    for angle in rng.uniform(0, 2 * np.pi, size=20):
+        pairs.append((UGate(angle, 0, 0), [qubits[1]], [], CXGate(), qubits[:2], []))
+        pairs.append((UGate(0, 0, angle), [qubits[0]], [], CCXGate(), qubits[:3], []))
+        pairs.append((UGate(angle, 0, 0), [qubits[2]], [], CRZGate(angle), [qubits[2], qubits[3]], []))
+        pairs.append((HGate(), [qubits[0]], [], UGate(angle, 0, np.pi), [qubits[0]], []))
+    pairs.append(pairs[0])
+
+    checker = CommutationChecker()
+    results = checker.commute_batch(pairs)
+
+    assert results == [CommutationChecker().commute(*pair) for pair in pairs]
+    assert any(results) and not all(results)
+    assert checker.num_cached_entries() == len(pairs) - 1
+    assert checker.commute_batch(pairs) == results
+    assert checker.cache_stats()["cache_hits"] == len(pairs)
+
+
+def pairwise_commutation_sets(dag, checker):
+    sets = {}
+    for wire in dag.qubits:
+        wire_sets = sets[wire] = []
+        for node in dag.nodes_on_wire(wire, only_ops=True):
+            if wire_sets and all(checker.commute_nodes(node, other) for other in wire_sets[-1]):
+                wire_sets[-1].append(node)
+            else:
+                wire_sets.append([node])
+    return sets
+
+
+def test_commutation_set_signatures_match_pairwise_checks():
+    rng = np.random.default_rng(1234)
+    circuit = QuantumCircuit(4)
+    for _ in range(400):
+        name = rng.choice(["rz", "rx", "rzz", "rxx", "cx", "cz", "h", "crz", "swap", "ccx"])
+        qubits = [int(qubit) for qubit in rng.permutation(4)]
+        angle = float(rng.choice([0.3, np.pi, 1.1]))
+        if name in ("rz", "rx"):
+            getattr(circuit, name)(angle, qubits[0])
+        elif name in ("rzz", "rxx", "crz"):
+            getattr(circuit, name)(angle, *qubits[:2])
+        elif name == "ccx":
+            circuit.ccx(*qubits[:3])
+        elif name == "h":
+            circuit.h(qubits[0])
+        else:
+            getattr(circuit, name)(*qubits[:2])
+    dag = circuit_to_dag(circuit)
+
+    analysis = CommutationAnalysis()
+    analysis.run(dag)
+    commutation_sets = analysis.property_set["commutation_set"]
+
+    expected = pairwise_commutation_sets(dag, analysis.comm_checker)
+    for wire in dag.qubits:
+        sets = [list(com_set) for com_set in commutation_sets.sets(wire)]
+        assert sets == [[node._node_id for node in com_set] for com_set in expected[wire]]
+    assert max(len(com_set) for com_set in expected[dag.qubits[0]]) > 2
+
+
+def test_matrix_checked_commutation_sets_match_pairwise_checks():
+    rng = np.random.default_rng(1234)
+    circuit = QuantumCircuit(4)
+    for _ in range(300):
+        name = rng.choice(["rx", "ry", "rz", "h", "cx"])
+        qubits = [int(qubit) for qubit in rng.permutation(4)]
+        angle = float(rng.choice([np.pi / 2, np.pi, 2 * np.pi, 0.3]))
+        if name == "h":
+            circuit.h(qubits[0])
+        elif name == "cx":
+            circuit.cx(*qubits[:2])
+        else:
+            getattr(circuit, name)(angle, qubits[0])
+    dag = circuit_to_dag(circuit)
+
+    analysis = CommutationAnalysis(check_matrix=True)
+    analysis.comm_checker.clear_cached_commutations()
+    analysis.run(dag)
+    commutation_sets = analysis.property_set["commutation_set"]
+
+    assert analysis.comm_checker.num_cached_entries() > 0
+    expected = pairwise_commutation_sets(dag, analysis.comm_checker)
+    for wire in dag.qubits:
+        sets = [list(com_set) for com_set in commutation_sets.sets(wire)]
+        assert sets == [[node._node_id for node in com_set] for com_set in expected[wire]]
+
+
+def test_matrix_checked_pairs_are_looked_up_once():
+    rng = np.random.default_rng(1234)
+    circuit = QuantumCircuit(3)
+    for _ in range(40):
+        for qubit in range(3):
+            circuit.u(*rng.uniform(0, 2 * np.pi, size=3), qubit)
+    analysis = CommutationAnalysis(check_matrix=True)
+    analysis.comm_checker.clear_cached_commutations()
+
+    analysis.run(circuit_to_dag(circuit))
+
+    # Every gate is checked against the previous one, which it does not commute with
+    stats = analysis.comm_checker.cache_stats()
+    assert stats["misses"] == analysis.comm_checker.num_cached_entries() == circuit.size() - 3
+    assert stats["cache_hits"] == 0
+
+
+class _MatrixCheckingUCC(UCCDefault1):
+    commutation_check_matrix = True
+
+
+def test_compile_checks_missing_commutations_in_batches(monkeypatch):
+    calls = {"single": 0, "batched_pairs": 0}
+    commute_matmul = commutation_checker._commute_matmul
+    commute_matmul_batch = commutation_checker._commute_matmul_batch
+
+    def count_single(*args):
+        calls["single"] += 1
+        return commute_matmul(*args)
+
+    def count_batch(first_ops, *args):
+        calls["batched_pairs"] += len(first_ops)
+        return commute_matmul_batch(first_ops, *args)
+
+    monkeypatch.setattr(commutation_checker, "_commute_matmul", count_single)
+    monkeypatch.setattr(commutation_checker, "_commute_matmul_batch", count_batch)
+    rng = np.random.default_rng(1)
+    circuit = QuantumCircuit(6)
+    for layer in range(10):
+        for qubit in range(6):
+            circuit.rx(rng.uniform(0, 2 * np.pi), qubit)
+            circuit.ry(rng.uniform(0, 2 * np.pi), qubit)
+        for qubit in range(layer % 2, 5, 2):
+            circuit.cx(qubit, qubit + 1)
+    for checker in shared_commutation_checkers():
+        checker.clear_cached_commutations()
+
+    result = _MatrixCheckingUCC().run(circuit)
+
+    assert calls["batched_pairs"] > 0 and calls["single"] == 0
+    assert Operator(result).equiv(Operator(circuit))
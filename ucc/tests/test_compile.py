@@ -1,16 +1,44 @@
+import functools
+import importlib
+import os
+import pickle
+import pstats
+import subprocess
+import sys
+import tracemalloc
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
 import pytest
 from cirq import CNOT
 from cirq import Circuit as CirqCircuit
 from cirq import H, LineQubit
 from pytket import Circuit as TketCircuit
 from qiskit import QuantumCircuit as QiskitCircuit
-from qiskit.converters import circuit_to_dag
-from qiskit.quantum_info import Statevector
+from qiskit import qasm2, qasm3
+from qiskit import transpile as qiskit_transpile
+from qiskit.circuit import Parameter
+from qiskit.circuit.library import QFT
+from qiskit.converters import circuit_to_dag, dag_to_circuit
+from qiskit.dagcircuit import DAGCircuit
+from qiskit.quantum_info import Operator, Statevector
+from qiskit.transpiler import PassManager
 from qiskit.transpiler.passes import GatesInBasis
 
-from benchmarks.scripts import qcnn_circuit, random_clifford_circuit
-from ucc import compile
-from ucc.transpilers.ucc_defaults import UCCDefault1
+from benchmarks.scripts import VQE_ansatz, qcnn_circuit, random_clifford_circuit
+import ucc
+from ucc import compile, compile_dag, compile_many
+from ucc.transpiler_passes import (
+    CommutativeCancellation,
+    FindIndependentComponents,
+    ParallelComponentOptimization,
+)
+from ucc.transpiler_passes.parallel_components import _optimize_group
+from ucc.transpilers.pipeline import dag_fingerprint
+from ucc.transpilers.ucc_defaults import _LOCAL_SETTINGS, UCCDefault1, _build_local_tasks
+
+# The ucc.compile module, shadowed by the function of the same name
+compile_module = importlib.import_module("ucc.compile")
 
 
 def test_qiskit_compile():
@@ -36,6 +64,17 @@ def test_tket_compile():
     assert isinstance(result_circuit, TketCircuit)
 
 
+@pytest.mark.parametrize("dumps, loads", [(qasm2.dumps, qasm2.loads), (qasm3.dumps, qasm3.loads)])
+def test_qasm_compile(dumps, loads):
+    circuit = QiskitCircuit(3)
+    circuit.h(0)
+    circuit.cx(0, 1)
+    circuit.cx(1, 2)
+    result_circuit = compile(dumps(circuit), return_format="original")
+    assert isinstance(result_circuit, str)
+    assert Statevector(loads(result_circuit)).equiv(Statevector(circuit))
+
+
 @pytest.mark.parametrize("circuit_function", [qcnn_circuit, random_clifford_circuit])
 @pytest.mark.parametrize("num_qubits", [6, 7, 8, 9, 10])
 @pytest.mark.parametrize("seed", [1, 326, 5678, 12345])
@@ -59,3 +98,396 @@ def test_compiled_circuits_equivalent(circuit_function, num_qubits, seed):
     sv1 = Statevector(circuit)
     sv2 = Statevector(transpiled)
     assert sv1.equiv(sv2)
+
+
+def test_compile_many_preserves_order_and_reports_errors():
+    circuits = [qcnn_circuit(6, seed) for seed in (1, 326)]
+    circuits.insert(1, "not a circuit")
+    results = compile_many(circuits, return_format="qiskit", max_workers=2)
+    assert len(results) == 3
+    assert isinstance(results[1], Exception)
+    for circuit, compiled in zip(circuits[::2], results[::2]):
+        assert isinstance(compiled, QiskitCircuit)
+        assert Statevector(circuit).equiv(Statevector(compiled))
+
+
+class _KillsWorker:
+    # Unpickling this in a worker process exits it, breaking the pool
+    def __reduce__(self):
+        return (os._exit, (1,))
+
+
+def test_compile_many_replaces_broken_pool():
+    circuits = [qcnn_circuit(6, 1), _KillsWorker()]
+    results = compile_many(circuits, return_format="qiskit", max_workers=2)
+    assert isinstance(results[1], BrokenProcessPool)
+    circuit = qcnn_circuit(6, 326)
+    results = compile_many([circuit, circuit], return_format="qiskit", max_workers=2)
+    for compiled in results:
+        assert isinstance(compiled, QiskitCircuit)
+        assert Statevector(circuit).equiv(Statevector(compiled))
+
+
+def test_compile_many_keeps_pool_across_batch_sizes():
+    circuit = qcnn_circuit(4, 1)
+    compile_many([circuit] * 4, return_format="qiskit", max_workers=4)
+    executor = compile_module._executor
+    for size in (2, 4, 1, 3):
+        results = compile_many([circuit] * size, return_format="qiskit", max_workers=4)
+        assert len(results) == size
+        assert compile_module._executor is executor
+
+
+class _PicklesInParentOnly:
+    # Pickling this in a worker process fails, so results holding it can
+    # not be sent back
+    def __init__(self):
+        self.parent_pid = os.getpid()
+
+    def __reduce__(self):
+        if os.getpid() != self.parent_pid:
+            raise RuntimeError("Can not be sent back from a worker")
+        return object.__new__, (type(self),), vars(self)
+
+
+def test_compile_many_reports_results_that_can_not_be_sent_back():
+    circuit = qcnn_circuit(4, 1)
+    unsendable = qcnn_circuit(4, 2)
+    unsendable.metadata = {"marker": _PicklesInParentOnly()}
+
+    results = compile_many([circuit, unsendable], return_format="qiskit", max_workers=2)
+
+    assert isinstance(results[0], QiskitCircuit)
+    assert isinstance(results[1], RuntimeError)
+
+
+def test_pipeline_is_built_once_per_device():
+    coupling_list = [(i, i + 1) for i in range(7)]
+    transpiler = UCCDefault1()
+    pipeline = transpiler.pipeline(coupling_list)
+    num_passes = len(pipeline.pass_manager.to_flow_controller().tasks)
+    circuit = qcnn_circuit(8, 1)
+    first = transpiler.run(circuit, coupling_list=coupling_list)
+    second = transpiler.run(circuit, coupling_list=coupling_list)
+    assert transpiler.pipeline(coupling_list) is pipeline
+    assert len(pipeline.pass_manager.to_flow_controller().tasks) == num_passes
+    assert first.count_ops() == second.count_ops()
+    assert pipeline.distance_matrix.shape == (8, 8)
+
+
+def test_pipelines_share_routing_map_and_lock():
+    transpiler = UCCDefault1()
+    line = transpiler.pipeline([(i, i + 1) for i in range(4)])
+    ring = transpiler.pipeline([(i, (i + 1) % 5) for i in range(5)])
+    for pipeline in (line, ring):
+        sabre_passes = [
+            task for task in pipeline.passes() if type(task).__name__ in ("SabreLayout", "SabreSwap")
+        ]
+        assert sabre_passes
+        # The Sabre passes read the distance matrix cached on the routing map
+        assert all(task.coupling_map is pipeline.routing_map for task in sabre_passes)
+    # The local passes are shared, so runs of both pipelines are serialized
+    assert line._lock is ring._lock
+
+
+@pytest.mark.parametrize("target_device", [None, [(i, i + 1) for i in range(5)]])
+def test_parameterized_circuit_compiles_to_template(target_device):
+    circuit = VQE_ansatz(6, 4)
+    template = compile(circuit, target_device=target_device)
+    assert template.parameters == circuit.parameters
+    assert template.size() < circuit.size()
+
+    values = np.random.default_rng(1).uniform(-np.pi, np.pi, circuit.num_parameters)
+    bound = template.assign_parameters(values)
+    expected = circuit.assign_parameters(values)
+    assert Operator.from_circuit(bound).equiv(Operator(expected))
+
+
+def test_only_parameterized_rotations_are_merged_across_gates():
+    transpiler = UCCDefault1()
+    cancellation = CommutativeCancellation(
+        standard_gates=transpiler.target_basis,
+        special_commutations=transpiler.special_commutations,
+    )
+    theta, phi = Parameter("θ"), Parameter("φ")
+    for angles, num_rz in [((theta, phi), 1), ((0.3, 0.5), 2)]:
+        circuit = QiskitCircuit(2)
+        circuit.rz(angles[0], 0)
+        circuit.cx(0, 1)
+        circuit.rz(angles[1], 0)
+        result = PassManager(cancellation).run(circuit)
+        assert result.count_ops()["rz"] == num_rz
+
+
+def test_qft_on_a_line_does_not_regress():
+    circuit = qiskit_transpile(
+        QFT(10), basis_gates=["rz", "rx", "ry", "cx"], optimization_level=0
+    )
+    line = [(i, i + 1) for i in range(9)]
+    # Merging rotations with numeric angles across gates raised this to 233
+    assert compile(circuit, target_device=line).num_nonlocal_gates() <= 228
+
+
+def test_import_does_not_load_frontends():
+    code = "import sys, ucc; print(sorted(m for m in ('qbraid', 'cirq', 'pytket') if m in sys.modules))"
+    repo_root = os.path.dirname(os.path.dirname(ucc.__file__))
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=repo_root
+    )
+    assert result.stdout.strip() == "[]"
+    assert "qiskit" in ucc.supported_circuit_formats
+
+
+def trotter_circuit(num_qubits, steps):
+    circuit = QiskitCircuit(num_qubits)
+    for _ in range(steps):
+        for qubit in range(num_qubits - 1):
+            circuit.cx(qubit, qubit + 1)
+            circuit.rz(0.1, qubit + 1)
+            circuit.cx(qubit, qubit + 1)
+        for qubit in range(num_qubits):
+            circuit.rx(0.2, qubit)
+    return circuit
+
+
+def test_compile_dag_matches_compile():
+    circuit = qcnn_circuit(6, seed=12345)
+    line = [(i, i + 1) for i in range(5)]
+
+    result = compile_dag(circuit_to_dag(circuit), target_device=line)
+    assert isinstance(result, DAGCircuit)
+    edges = {frozenset(edge) for edge in line}
+    for node in result.two_qubit_ops():
+        assert frozenset(result.find_bit(qubit).index for qubit in node.qargs) in edges
+
+    result = compile_dag(circuit_to_dag(circuit))
+    assert Operator(dag_to_circuit(result)).equiv(Operator(circuit))
+
+
+def test_windowed_compilation_bounds_slice_size():
+    circuit = trotter_circuit(4, 30)
+    transpiler = UCCDefault1()
+    pipeline = transpiler.pipeline()
+    slice_sizes = []
+    run = pipeline.run
+    pipeline.run = lambda window, **kwargs: slice_sizes.append(len(window.data)) or run(window, **kwargs)
+
+    result = transpiler.run_windowed(circuit, window_size=20, overlap=4)
+
+    assert len(slice_sizes) > 1
+    assert max(slice_sizes) < len(circuit.data) / 2
+    assert Operator(result).equiv(Operator(circuit))
+    analysis_pass = GatesInBasis(basis_gates=transpiler.target_basis)
+    analysis_pass.run(circuit_to_dag(result))
+    assert analysis_pass.property_set["all_gates_in_basis"]
+
+
+def test_windowed_compilation_requires_all_to_all_connectivity():
+    with pytest.raises(ValueError):
+        compile(trotter_circuit(3, 2), target_device=[(0, 1), (1, 2)], window_size=10)
+
+
+def test_expired_deadline_skips_optional_stages():
+    circuit = random_clifford_circuit(4, seed=12345)
+    transpiler = UCCDefault1()
+    pipeline = transpiler.pipeline()
+
+    result = pipeline.run(circuit, deadline=0.0)
+
+    assert "commutative_cancellation" in pipeline.property_set["skipped_stages"]
+    assert Operator(result).equiv(Operator(circuit))
+    analysis_pass = GatesInBasis(basis_gates=transpiler.target_basis)
+    analysis_pass.run(circuit_to_dag(result))
+    assert analysis_pass.property_set["all_gates_in_basis"]
+
+
+def test_time_budget_selects_tier_and_reports_shortened_stages():
+    circuit = qcnn_circuit(8, seed=12345)
+    line = [(i, i + 1) for i in range(7)]
+    transpiler = UCCDefault1()
+    assert transpiler.select_tier(circuit, line, time_budget=1000) == "full"
+    assert transpiler.select_tier(circuit, line, time_budget=0) == "minimal"
+    assert transpiler.select_tier(circuit, None, time_budget=0) == "full"
+    assert transpiler.select_tier(circuit, line, time_budget=1e-3) == "minimal"
+    transpiler.tier_seconds_per_2q_gate = {"full": 1e-9, "reduced": 1e-9}
+    assert transpiler.select_tier(circuit, line, time_budget=1e-3) == "full"
+
+    result, report = compile(circuit, target_device=line, time_budget=0, return_report=True)
+
+    assert isinstance(result, QiskitCircuit)
+    assert report.tier == "minimal"
+    assert "sabre_layout" in report.shortened_stages
+    assert report.knobs["sabre_trials"] == 1
+    assert report.shortened
+
+
+@pytest.mark.parametrize("optimization_level", [0, 1, 2, 3])
+def test_optimization_levels(optimization_level):
+    circuit = qcnn_circuit(6, seed=12345)
+    line = [(i, i + 1) for i in range(5)]
+    transpiler = UCCDefault1()
+
+    result = compile(circuit, optimization_level=optimization_level)
+    routed = compile(circuit, target_device=line, optimization_level=optimization_level)
+
+    assert Operator(result).equiv(Operator(circuit))
+    for compiled_circuit in [result, routed]:
+        analysis = GatesInBasis(basis_gates=transpiler.target_basis)
+        analysis.run(circuit_to_dag(compiled_circuit))
+        assert analysis.property_set["all_gates_in_basis"]
+
+
+def test_unknown_optimization_level():
+    with pytest.raises(ValueError, match="optimization_level"):
+        compile(qcnn_circuit(4, seed=12345), optimization_level=4)
+
+
+def test_unchanged_stages_are_skipped():
+    # Parameterized rotations are not resynthesized, so the local passes
+    # reach a fixed point
+    circuit = VQE_ansatz(6, 2)
+    transpiler = UCCDefault1(local_iterations=3)
+
+    result = transpiler.run(circuit)
+
+    unchanged_stages = transpiler.pipeline().property_set["unchanged_stages"]
+    assert "2q_block_synthesis" in unchanged_stages
+    values = dict(
+        zip(circuit.parameters, np.random.default_rng(12345).uniform(size=circuit.num_parameters))
+    )
+    assert Operator(result.assign_parameters(values)).equiv(
+        Operator(circuit.assign_parameters(values))
+    )
+
+
+def test_dag_fingerprint_detects_changes():
+    circuit = qcnn_circuit(4, seed=12345)
+    dag = circuit_to_dag(circuit)
+    assert dag_fingerprint(dag) == dag_fingerprint(circuit_to_dag(circuit.copy()))
+
+    changed = circuit.copy()
+    changed.rz(0.1, 0)
+    assert dag_fingerprint(dag) != dag_fingerprint(circuit_to_dag(changed))
+
+
+def test_report_describes_each_pass():
+    circuit = qcnn_circuit(6, seed=12345)
+    line = [(i, i + 1) for i in range(5)]
+
+    result, report = compile(circuit, target_device=line, return_report=True)
+
+    names = [record.name for record in report.passes]
+    assert "CommutationAnalysis" in names
+    assert "SabreSwap" in names
+    last = report.passes[-1]
+    assert last.size == result.size()
+    assert last.two_qubit_gates == result.num_nonlocal_gates()
+    assert last.depth == result.depth()
+    assert all(record.time >= 0 and record.peak_memory >= 0 for record in report.passes)
+    assert set(report.pass_times()) == set(names)
+
+    stats = report.commutation_cache
+    assert stats["library_hits"] + stats["cache_hits"] + stats["misses"] > 0
+    assert 0 <= stats["hit_rate"] <= 1
+
+
+@pytest.mark.parametrize("max_local_iterations", [1, 5])
+def test_converging_local_passes(max_local_iterations):
+    circuit = qcnn_circuit(6, seed=12345)
+    transpiler = UCCDefault1(local_iterations="converge", max_local_iterations=max_local_iterations)
+
+    result = transpiler.run(circuit)
+
+    iterations = transpiler.pipeline().property_set["local_iterations"]
+    assert 1 <= iterations <= max_local_iterations
+    assert Operator(result).equiv(Operator(circuit))
+
+
+def test_converging_local_passes_stop_at_a_fixed_point():
+    # Parameterized rotations are not resynthesized, so the second iteration
+    # skips the stages as unchanged and must still run the convergence check
+    circuit = VQE_ansatz(6, 2)
+    transpiler = UCCDefault1(local_iterations="converge", max_local_iterations=5)
+
+    transpiler.run(circuit)
+
+    property_set = transpiler.pipeline().property_set
+    assert property_set["local_converged"]
+    assert property_set["local_iterations"] < 5
+
+
+def _build_local_tasks_of(transpiler):
+    settings = {name: getattr(transpiler, name) for name in _LOCAL_SETTINGS}
+    return functools.partial(_build_local_tasks, type(transpiler), settings, 1, 10)
+
+
+def test_independent_components_are_optimized_in_parallel():
+    block = qcnn_circuit(3, seed=12345)
+    circuit = QiskitCircuit(6, 6)
+    circuit.compose(block, qubits=[0, 1, 2], inplace=True)
+    circuit.compose(block, qubits=[3, 4, 5], inplace=True)
+    circuit.barrier()
+    circuit.compose(block, qubits=[3, 4, 5], inplace=True)
+    dag = circuit_to_dag(circuit)
+
+    find = FindIndependentComponents(min_size=0, max_workers=2)
+    find.run(dag)
+    assert sorted(find.property_set["independent_components"]) == [[0, 1, 2], [3, 4, 5]]
+
+    optimize = ParallelComponentOptimization(
+        _build_local_tasks_of(UCCDefault1()), max_workers=2
+    )
+    optimize.property_set = find.property_set
+    result = dag_to_circuit(optimize.run(dag))
+    assert result.count_ops()["barrier"] == 1
+    assert Operator(result).equiv(Operator(circuit))
+    executor = compile_module._executor
+
+    measured = circuit.copy()
+    measured.measure(range(6), range(6))
+    result = dag_to_circuit(optimize.run(circuit_to_dag(measured)))
+    assert result.count_ops()["measure"] == 6
+    assert [result.find_bit(instruction.clbits[0]).index for instruction in result.data[-6:]] == [
+        result.find_bit(instruction.qubits[0]).index for instruction in result.data[-6:]
+    ]
+    # The worker pool is shared between runs
+    assert compile_module._executor is executor
+
+
+def test_component_workers_get_the_time_left():
+    build_tasks_bin = pickle.dumps(_build_local_tasks_of(UCCDefault1()))
+    circuit = qcnn_circuit(3, seed=12345)
+    _, run_state = _optimize_group(circuit, build_tasks_bin, None)
+    assert run_state["skipped_stages"] == []
+    _, run_state = _optimize_group(circuit, build_tasks_bin, -1.0)
+    assert "optimize_1q" in run_state["skipped_stages"]
+
+
+@pytest.mark.parametrize(
+    "profile, suffix, load",
+    [("cprofile", ".pstats", pstats.Stats), ("tracemalloc", ".tracemalloc", tracemalloc.Snapshot.load)],
+)
+def test_profile_writes_one_file_per_pass(tmp_path, profile, suffix, load):
+    circuit = qcnn_circuit(4, seed=12345)
+    line = [(i, i + 1) for i in range(3)]
+
+    _, report = compile(
+        circuit, target_device=line, profile=profile, profile_dir=tmp_path, return_report=True
+    )
+
+    files = sorted(os.listdir(report.profile_dir))
+    assert os.path.dirname(report.profile_dir) == str(tmp_path)
+    assert [name.split("_", 1)[1] for name in files] == [
+        record.name + suffix for record in report.passes
+    ]
+    load(os.path.join(report.profile_dir, files[0]))
+
+
+def test_profile_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("UCC_PROFILE", "cprofile")
+    monkeypatch.setenv("UCC_PROFILE_DIR", str(tmp_path))
+    _, report = compile(qcnn_circuit(4, seed=12345), return_report=True)
+    assert os.listdir(report.profile_dir)
+
+    with pytest.raises(ValueError, match="Unknown profile"):
+        compile(qcnn_circuit(4, seed=12345), profile="perf")
@@ -0,0 +1,143 @@
+import asyncio
+import importlib
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from qiskit import QuantumCircuit, qasm2
+from qiskit.quantum_info import Statevector
+
+import ucc
+from ucc import __main__ as ucc_main
+from ucc.__main__ import main
+
+REPO_ROOT = os.path.dirname(os.path.dirname(ucc.__file__))
+
+
+def ghz_qasm(num_qubits):
+    circuit = QuantumCircuit(num_qubits)
+    circuit.h(0)
+    for qubit in range(1, num_qubits):
+        circuit.cx(0, qubit)
+    return qasm2.dumps(circuit)
+
+
+def test_compile_command(tmp_path):
+    input_file = tmp_path / "in.qasm"
+    output_file = tmp_path / "out.qasm"
+    device_file = tmp_path / "coupling.json"
+    input_file.write_text(ghz_qasm(4))
+    device_file.write_text(json.dumps([[0, 1], [1, 2], [2, 3]]))
+
+    assert main(["compile", str(input_file), "-o", str(output_file), "--device", str(device_file)]) == 0
+    compiled_circuit = QuantumCircuit.from_qasm_str(output_file.read_text())
+    for instruction in compiled_circuit.data:
+        if instruction.operation.num_qubits == 2:
+            qubits = sorted(compiled_circuit.find_bit(q).index for q in instruction.qubits)
+            assert qubits[1] - qubits[0] == 1
+
+
+def test_serve_answers_newline_delimited_json():
+    requests = [
+        {"id": 1, "qasm": ghz_qasm(3)},
+        {"id": 2, "qasm": ghz_qasm(3), "device": [[0, 1], [1, 2]]},
+        {"id": 3, "qasm": ghz_qasm(3), "device": "unknown"},
+    ]
+    result = subprocess.run(
+        [sys.executable, "-m", "ucc", "serve"],
+        input="\n".join(json.dumps(request) for request in requests) + "\n",
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=REPO_ROOT,
+    )
+    responses = {response["id"]: response for response in map(json.loads, result.stdout.splitlines())}
+
+    assert set(responses) == {1, 2, 3}
+    expected = Statevector(QuantumCircuit.from_qasm_str(ghz_qasm(3)))
+    assert Statevector(QuantumCircuit.from_qasm_str(responses[1]["qasm"])).equiv(expected)
+    assert "qasm" in responses[2]
+    assert "Unknown device" in responses[3]["error"]
+
+
+def test_serve_keeps_answering_after_failed_batch(monkeypatch):
+    calls = []
+
+    def compile_many(circuits, **kwargs):
+        calls.append(len(circuits))
+        if len(calls) == 1:
+            raise RuntimeError("worker pool broke")
+        return ucc.compile_many(circuits, **kwargs)
+
+    monkeypatch.setattr(ucc_main, "compile_many", compile_many)
+    server = ucc_main._CompileServer({}, workers=1, max_batch=8, batch_window=0.001)
+    output = []
+
+    class Writer:
+        def write(self, data):
+            output.append(json.loads(data))
+
+        async def drain(self):
+            pass
+
+        def close(self):
+            pass
+
+    async def lines():
+        for request_id in (1, 2):
+            yield json.dumps({"id": request_id, "qasm": ghz_qasm(3)}).encode()
+            # Each request in its own batch
+            await asyncio.sleep(0.2)
+
+    async def serve():
+        server._queue = asyncio.Queue()
+        batcher = asyncio.create_task(server._batch_requests())
+        try:
+            await asyncio.wait_for(server._handle_stream(lines(), Writer()), timeout=60)
+            await asyncio.wait_for(server._queue.join(), timeout=60)
+        finally:
+            batcher.cancel()
+            server._compile_thread.shutdown(wait=False)
+
+    asyncio.run(serve())
+
+    responses = {response["id"]: response for response in output}
+    assert "worker pool broke" in responses[1]["error"]
+    assert "qasm" in responses[2]
+
+
+def test_serve_keeps_warm_pool_across_batch_sizes(monkeypatch):
+    compile_module = importlib.import_module("ucc.compile")
+    submitted = []
+    submit_to_executor = compile_module._submit_to_executor
+
+    def count_submissions(max_workers, function, arguments, **kwargs):
+        submitted.append(max_workers)
+        return submit_to_executor(max_workers, function, arguments, **kwargs)
+
+    monkeypatch.setattr(compile_module, "_submit_to_executor", count_submissions)
+    server = ucc_main._CompileServer(
+        {"line": [(0, 1), (1, 2)]}, workers=2, max_batch=8, batch_window=0.001
+    )
+    try:
+        server._compile_thread.submit(server._warm_up).result()
+        executor = compile_module._executor
+        for size in (1, 3, 2):
+            outputs = server._compile_thread.submit(
+                server._compile_batch, [ghz_qasm(3)] * size, "qasm2", [(0, 1), (1, 2)]
+            ).result()
+            assert len(outputs) == size and all(isinstance(output, str) for output in outputs)
+            assert compile_module._executor is executor
+        # Every batch, including single requests, runs on the warm pool
+        assert submitted == [2] * 5
+    finally:
+        server._compile_thread.shutdown(wait=False)
+
+
+def test_compile_command_rejects_object_formats(tmp_path):
+    input_file = tmp_path / "in.qasm"
+    input_file.write_text(ghz_qasm(2))
+    with pytest.raises(SystemExit):
+        main(["compile", str(input_file), "--return-format", "qiskit"])
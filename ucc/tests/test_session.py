@@ -0,0 +1,70 @@
+import pytest
+from qiskit import QuantumCircuit
+from qiskit.quantum_info import Operator
+
+from benchmarks.scripts import qcnn_circuit
+from ucc import CompilationSession
+
+
+def layer(num_qubits, angle):
+    circuit = QuantumCircuit(num_qubits)
+    for qubit in range(num_qubits - 1):
+        circuit.cx(qubit, qubit + 1)
+        circuit.rz(angle, qubit + 1)
+    circuit.h(0)
+    return circuit
+
+
+def test_appended_gates_are_compiled_with_the_boundary():
+    circuit = qcnn_circuit(6, seed=12345)
+    session = CompilationSession(boundary_size=10)
+    session.compile(circuit)
+    compiled_prefix = len(session.compiled_circuit.data)
+
+    for angle in (0.1, 0.2, 0.3):
+        gates = layer(6, angle)
+        circuit.compose(gates, inplace=True)
+        compiled = session.append(gates)
+        assert Operator(compiled).equiv(Operator(circuit))
+    # The compiled prefix before the boundary is kept
+    assert len(compiled.data) > compiled_prefix - 10
+
+
+def test_compile_detects_extended_circuit():
+    circuit = qcnn_circuit(6, seed=1)
+    session = CompilationSession()
+    session.compile(circuit)
+    extended = circuit.compose(layer(6, 0.5))
+    calls = []
+    append = session._append
+    session._append = lambda gates: calls.append(len(gates.data)) or append(gates)
+
+    compiled = session.compile(extended)
+
+    assert calls == [len(extended.data) - len(circuit.data)]
+    assert Operator(compiled).equiv(Operator(extended))
+    # Any other circuit is compiled from scratch
+    session.compile(qcnn_circuit(6, seed=326))
+    assert len(calls) == 1
+
+
+def test_appended_gates_are_routed_from_final_layout():
+    line = [(i, i + 1) for i in range(5)]
+    session = CompilationSession(target_device=line)
+    session.compile(qcnn_circuit(6, seed=12345))
+    gates = QuantumCircuit(6)
+    gates.cx(0, 5)
+    gates.cx(2, 4)
+
+    compiled = session.append(gates)
+
+    edges = {frozenset(edge) for edge in line}
+    for instruction in compiled.data:
+        if len(instruction.qubits) == 2:
+            assert frozenset(compiled.find_bit(qubit).index for qubit in instruction.qubits) in edges
+    assert sorted(session.final_layout) == list(range(6))
+
+
+def test_append_requires_compiled_circuit():
+    with pytest.raises(ValueError):
+        CompilationSession().append(QuantumCircuit(2))
@@ -8,6 +8,8 @@ from .collect_2q_blocks import Collect2qBlocks
 from .collect_1q_runs import Collect1qRuns
 from .optimize_1q_decomposition import Optimize1qGatesDecomposition
 from .spectral_mapping import SpectralMapping
+from .check_local_convergence import CheckLocalConvergence
+from .parallel_components import FindIndependentComponents, ParallelComponentOptimization
 from .sabre_layout import SabreLayout
 # from .layout.mapomatic_layout import MapomaticLayout
 from .layout.vf2_post_layout import VF2PostLayout
\ No newline at end of file
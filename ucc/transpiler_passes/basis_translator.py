@@ -257,7 +257,8 @@ class BasisTranslator(TransformationPass):
                     if isinstance(node.op, ControlFlowOp):
                         flow_blocks = []
                         for block in node.op.blocks:
-                            dag_block = circuit_to_dag(block)
+                            # Translation replaces nodes, the operations are not modified
+                            dag_block = circuit_to_dag(block, copy_operations=False)
                             dag_updated = apply_translation(
                                 dag_block,
                                 {
@@ -266,7 +267,7 @@ class BasisTranslator(TransformationPass):
                                 },
                             )
                             if dag_updated:
-                                flow_circ_block = dag_to_circuit(dag_block)
+                                flow_circ_block = dag_to_circuit(dag_block, copy_operations=False)
                             else:
                                 flow_circ_block = block
                             flow_blocks.append(flow_circ_block)
@@ -420,7 +421,7 @@ class BasisTranslator(TransformationPass):
                 source_basis.add((node.name, node.op.num_qubits))
             if isinstance(node.op, ControlFlowOp):
                 for block in node.op.blocks:
-                    block_dag = circuit_to_dag(block)
+                    block_dag = circuit_to_dag(block, copy_operations=False)
                     source_basis, qargs_local_source_basis = self._extract_basis_target(
                         block_dag,
                         {
@@ -666,13 +667,13 @@ def _compose_transforms(basis_transforms, source_basis, source_dag):
 
 
 def _get_example_gates(source_dag):
-    def recurse(dag, example_gates=None):
-        example_gates = example_gates or {}
-        for node in dag.op_nodes():
-            example_gates[(node.op.name, node.op.num_qubits)] = node.op
-            if isinstance(node.op, ControlFlowOp):
-                for block in node.op.blocks:
-                    example_gates = recurse(circuit_to_dag(block), example_gates)
+    # Control flow blocks are read as circuits, without converting them to DAGs
+    def recurse(operations, example_gates):
+        for operation in operations:
+            example_gates[(operation.name, operation.num_qubits)] = operation
+            if isinstance(operation, ControlFlowOp):
+                for block in operation.blocks:
+                    recurse((instruction.operation for instruction in block.data), example_gates)
         return example_gates
 
-    return recurse(source_dag)
+    return recurse((node.op for node in source_dag.op_nodes()), {})
@@ -0,0 +1,59 @@
+"""Check whether repeating the local optimization passes still pays off."""
+
+from qiskit.transpiler.basepasses import AnalysisPass
+
+
+class CheckLocalConvergence(AnalysisPass):
+    """Track the two-qubit gate count and depth of a circuit across iterations
+    of the local optimization passes.
+
+    An instance with ``start=True`` runs before the loop and resets the
+    state of the previous loop, if any. An instance at the end of the loop body
+    then sets ``property_set["local_converged"]`` to True once an iteration
+    decreased neither of them compared to the previous iteration, or
+    ``max_iterations`` iterations have run. The first iteration is not compared
+    to the input circuit, which is usually in a different basis. The total number of iterations run is counted in
+    ``property_set["local_iterations"]``.
+
+    Both measures are read from the DAG directly, so checking is cheap compared
+    to the optimization passes themselves. The check runs in every iteration,
+    even one in which no pass changed the circuit, as
+    :class:`~qiskit.passmanager.DoWhileController` runs all the tasks of its
+    body again in each iteration.
+    """
+
+    def __init__(self, max_iterations=10, start=False):
+        """
+        Args:
+            max_iterations (int): Maximum number of iterations of the loop.
+            start (bool): Whether this instance runs before the loop.
+        """
+        super().__init__()
+        self.max_iterations = max_iterations
+        self.start = start
+
+    def run(self, dag):
+        """Run the CheckLocalConvergence pass on `dag`.
+
+        Args:
+            dag (DAGCircuit): input dag
+        """
+        if self.start:
+            self.property_set["local_cost"] = None
+            self.property_set["local_loop_iterations"] = 0
+            self.property_set["local_converged"] = False
+            return
+
+        cost = (len(dag.two_qubit_ops()), dag.depth())
+        previous_cost = self.property_set["local_cost"]
+        loop_iterations = self.property_set["local_loop_iterations"] + 1
+        improved = previous_cost is None or any(
+            new < old for new, old in zip(cost, previous_cost)
+        )
+        self.property_set["local_cost"] = cost
+        self.property_set["local_loop_iterations"] = loop_iterations
+        self.property_set["local_iterations"] = (self.property_set["local_iterations"] or 0) + 1
+        self.property_set["local_converged"] = (
+            not improved or loop_iterations >= self.max_iterations
+        )
+
@@ -1,3 +1,5 @@
+# This file has been modified from the original version in Qiskit. 
+
 # This code is part of Qiskit.
 #
 # (C) Copyright IBM 2017, 2019.
@@ -12,8 +14,6 @@
 
 """Collect sequences of uninterrupted gates acting on 2 qubits."""
 
-from collections import defaultdict
-
 from qiskit.transpiler.basepasses import AnalysisPass
 
 
@@ -29,7 +29,8 @@ class Collect2qBlocks(AnalysisPass):
         After the execution, ``property_set['block_list']`` is set to a list of
         tuples of "op" node.
         """
-        self.property_set["commutation_set"] = defaultdict(list)
+        # Releases the commutation sets of the previous analysis
+        self.property_set["commutation_set"] = None
         self.property_set["block_list"] = dag.collect_2q_runs()
 
         return dag
@@ -14,13 +14,16 @@
 
 """Analysis pass to find commutation relations between DAG nodes."""
 
-from collections import defaultdict
+import os
+import threading
+from array import array
 
 # from qiskit.circuit.commutation_library import SessionCommutationChecker as scc
-from qiskit.dagcircuit import DAGOpNode
 from qiskit.transpiler.basepasses import AnalysisPass
 
 from .commutation_checker import CommutationChecker
+from .commutation_library import load_commutation_library
+from .pauli_commutation import _PAULI_TERMS
 
 from qiskit.circuit._standard_gates_commutations import standard_gates_commutations
 
@@ -28,34 +31,25 @@ from qiskit.circuit._standard_gates_commutations import standard_gates_commutati
 class CommutationAnalysis(AnalysisPass):
     """Analysis pass to find commutation relations between DAG nodes.
 
-    ``property_set['commutation_set']`` is a dictionary that describes
-    the commutation relations on a given wire, all the gates on a wire
-    are grouped into a set of gates that commute.
-    
+    ``property_set['commutation_set']`` is a :class:`CommutationSets` that
+    describes the commutation relations on a given wire, all the gates on a
+    wire are grouped into a set of gates that commute.
+
     """
 
-    def __init__(self, standard_gates=None, special_commutations=None):
+    def __init__(self, standard_gates=None, special_commutations=None, check_matrix=False):
         """
         standard_gates (list[str]): If provided, only the commutation relations between the gates in this list will be considered.
         special_commutations (dict): If provided, the commutation relations in this dictionary will be added to the commutation checker.
+        check_matrix (bool): If True, pairs of gates missing from the commutation libraries are checked via matrix multiplication.
+
+        All passes built with the same arguments share one checker, see :func:`shared_commutation_checker`.
         """
 
         super().__init__()
-        if standard_gates is None:
-            new_standard_gates_commutations = standard_gates_commutations
-        else:
-            #Iterate over the standard_gates_commutations dictionary, if both standard_gates are in standard_gates, add to new dictionary
-            new_standard_gates_commutations = {}
-            for key, value in standard_gates_commutations.items():
-                if key[0] in standard_gates and key[1] in standard_gates:
-                    new_standard_gates_commutations[key] = value            
-
-        if special_commutations is not None:
-            #Append the special commutations dictionary elements to the commutation checker dictionary
-            for key, value in special_commutations.items():
-                new_standard_gates_commutations[key] = value
-
-        self.comm_checker = CommutationChecker(new_standard_gates_commutations, check_matrix=False)
+        self.comm_checker = shared_commutation_checker(
+            standard_gates, special_commutations, check_matrix
+        )
 
     def run(self, dag):
         """Run the CommutationAnalysis pass on `dag`.
@@ -63,50 +57,234 @@ class CommutationAnalysis(AnalysisPass):
         Run the pass on the DAG, and write the discovered commutation relations
         into the ``property_set``.
         """
-        # Initiate the commutation set
-        self.property_set["commutation_set"] = defaultdict(list)
-
-        # Build a dictionary to keep track of the gates on each qubit
-        # The key with format (wire) will store the lists of commutation sets
-        # The key with format (node, wire) will store the index of the commutation set
-        # on the specified wire, thus, for example:
-        # self.property_set['commutation_set'][wire][(node, wire)] will give the
-        # commutation set that contains node.
-
-        for wire in dag.qubits:
-            self.property_set["commutation_set"][wire] = []
-
-        # Add edges to the dictionary for each qubit
-        for node in dag.topological_op_nodes():
-            for _, _, edge_wire in dag.edges(node):
-                self.property_set["commutation_set"][(node, edge_wire)] = -1
-
-        # Construct the commutation set
-        for wire in dag.qubits:
-
-            for current_gate in dag.nodes_on_wire(wire):
-
-                current_comm_set = self.property_set["commutation_set"][wire]
-                if not current_comm_set:
-                    current_comm_set.append([current_gate])
-
-                if current_gate not in current_comm_set[-1]:
-                    does_commute = True
-
-                    # Check if the current gate commutes with all the gates in the current block
-                    for prev_gate in current_comm_set[-1]:
-                        does_commute = (
-                            isinstance(current_gate, DAGOpNode)
-                            and isinstance(prev_gate, DAGOpNode)
-                            and self.comm_checker.commute_nodes(current_gate, prev_gate)
-                        )
-                        if not does_commute:
-                            break
-
-                    if does_commute:
-                        current_comm_set[-1].append(current_gate)
-                    else:
-                        current_comm_set.append([current_gate])
-
-                temp_len = len(current_comm_set)
-                self.property_set["commutation_set"][(current_gate, wire)] = temp_len - 1
\ No newline at end of file
+        commutation_sets = CommutationSets(dag)
+        # The wires are swept in lockstep: each round checks, for every wire, the
+        # next gate that has to be checked against the current set of the wire,
+        # so that the pairs left to the matrix check are checked together
+        checks = {}
+        for wire_index, wire in enumerate(dag.qubits):
+            sweep = self._sweep_wire(dag, wire_index, wire, commutation_sets)
+            _advance(checks, sweep, None)
+        while checks:
+            sweeps = list(checks)
+            results = self.comm_checker.commute_nodes_with_all(
+                [checks.pop(sweep) for sweep in sweeps]
+            )
+            for sweep, does_commute in zip(sweeps, results):
+                _advance(checks, sweep, does_commute)
+
+        self.property_set["commutation_set"] = commutation_sets
+
+    def _sweep_wire(self, dag, wire_index, wire, commutation_sets):
+        """Groups the gates on `wire` into commutation sets, yielding each gate
+        with the current set when it has to be checked whether they commute, and
+        receiving the result."""
+        gate_names = self.comm_checker._gate_names
+        # Only the nodes of the last set are needed to extend it
+        current_set = []
+        signature = {}
+        for current_gate in dag.nodes_on_wire(wire, only_ops=True):
+            terms = _pauli_terms(current_gate, gate_names)
+            does_commute = bool(current_set)
+            if does_commute and not _fits_signature(signature, terms, current_gate.qargs):
+                # Check if the current gate commutes with all the gates in the current block
+                does_commute = yield current_gate, current_set
+
+            if does_commute:
+                current_set.append(current_gate)
+            else:
+                current_set = [current_gate]
+                signature = {}
+                commutation_sets._start_set(wire_index)
+            signature = _extend_signature(signature, terms, current_gate.qargs)
+            commutation_sets._add(wire_index, current_gate)
+
+
+def _advance(checks, sweep, does_commute):
+    """Sends `does_commute` to the generator `sweep` of
+    :meth:`CommutationAnalysis._sweep_wire`, and stores its next check in
+    `checks` unless it is done."""
+    try:
+        checks[sweep] = sweep.send(does_commute)
+    except StopIteration:
+        pass
+
+
+# The signature of a commutation set maps each qubit to the Pauli letter of the
+# terms of the gates of the set on that qubit, or to _MIXED if they use several
+# letters. A gate whose terms only use the letter of the signature on each qubit
+# commutes with every gate of the set, see pauli_commutation. The signature is
+# None if a gate of the set has no Pauli terms.
+_MIXED = "*"
+
+
+def _pauli_terms(node, gate_names):
+    """Returns the Pauli terms of the generator of `node`, or None if it has none
+    or the commutation checker would skip it."""
+    terms = _PAULI_TERMS.get(node.name)
+    if (
+        terms is None
+        or node.cargs
+        or getattr(node.op, "_condition", None)
+        or (gate_names is not None and node.name not in gate_names)
+    ):
+        return None
+    return terms
+
+
+def _fits_signature(signature, terms, qargs):
+    if signature is None or terms is None:
+        return False
+    for term in terms:
+        for qubit, letter in zip(qargs, term):
+            if letter != "I" and signature.get(qubit, letter) != letter:
+                return False
+    return True
+
+
+def _extend_signature(signature, terms, qargs):
+    if signature is None or terms is None:
+        return None
+    for term in terms:
+        for qubit, letter in zip(qargs, term):
+            if letter != "I" and signature.setdefault(qubit, letter) != letter:
+                signature[qubit] = _MIXED
+    return signature
+
+
+# Maximum number of entries of the cache of each shared checker
+COMMUTATION_CACHE_MAX_ENTRIES = int(os.environ.get("UCC_COMMUTATION_CACHE_ENTRIES", 10**6))
+
+_shared_checkers = {}
+_shared_checkers_lock = threading.Lock()
+
+
+def shared_commutation_checker(standard_gates=None, special_commutations=None, check_matrix=False):
+    """Returns the process-wide :class:`CommutationChecker` of this
+    configuration, built on first use.
+
+    Sharing the checker lets every commutation analysis of a pipeline, every
+    local iteration and every compilation reuse its cached commutations. Its
+    cache holds at most :data:`COMMUTATION_CACHE_MAX_ENTRIES` entries, set by
+    the ``UCC_COMMUTATION_CACHE_ENTRIES`` environment variable.
+
+    Args:
+        standard_gates (list[str]): If provided, only the commutation relations between the gates in this list will be considered.
+        special_commutations (dict): If provided, the commutation relations in this dictionary will be added to the commutation checker.
+        check_matrix (bool): If True, pairs of gates missing from the commutation libraries are checked via matrix multiplication.
+    """
+    key = (
+        None if standard_gates is None else frozenset(standard_gates),
+        _freeze(special_commutations),
+        check_matrix,
+    )
+    checker = _shared_checkers.get(key)
+    if checker is None:
+        with _shared_checkers_lock:
+            checker = _shared_checkers.get(key)
+            if checker is None:
+                checker = _shared_checkers[key] = _build_checker(
+                    standard_gates, special_commutations, check_matrix
+                )
+    return checker
+
+
+def shared_commutation_checkers():
+    """Returns the shared checkers built so far, see
+    :func:`shared_commutation_checker`."""
+    return list(_shared_checkers.values())
+
+
+def _freeze(commutations):
+    if isinstance(commutations, dict):
+        return frozenset((key, _freeze(value)) for key, value in commutations.items())
+    return commutations
+
+
+def _build_checker(standard_gates, special_commutations, check_matrix):
+    commutation_library = load_commutation_library()
+    if standard_gates is None:
+        new_standard_gates_commutations = dict(standard_gates_commutations)
+    else:
+        #Iterate over the standard_gates_commutations dictionary, if both standard_gates are in standard_gates, add to new dictionary
+        new_standard_gates_commutations = {}
+        for key, value in standard_gates_commutations.items():
+            if key[0] in standard_gates and key[1] in standard_gates:
+                new_standard_gates_commutations[key] = value
+        if commutation_library is not None:
+            commutation_library = commutation_library.restricted(standard_gates)
+
+    if special_commutations is not None:
+        #Append the special commutations dictionary elements to the commutation checker dictionary
+        for key, value in special_commutations.items():
+            new_standard_gates_commutations[key] = value
+
+    return CommutationChecker(
+        new_standard_gates_commutations,
+        cache_max_entries=COMMUTATION_CACHE_MAX_ENTRIES,
+        check_matrix=check_matrix,
+        commutation_library=commutation_library,
+    )
+
+
+class CommutationSets:
+    """The commutation sets of the gates on each qubit of a DAG.
+
+    The gates on each qubit are split into consecutive sets of gates that
+    commute with each other. Instead of lists of nodes and a dictionary keyed
+    by ``(node, wire)``, the sets are stored as arrays of node ids: for each
+    qubit, the ids of its gates in order and the start of each set. The index
+    of the set of a gate on each of its qubits is stored in arrays indexed by
+    node id, one per position in the qubits of the gate.
+
+    Args:
+        dag (DAGCircuit): The DAG whose gates are grouped. Node ids are only
+            valid until the DAG is modified.
+    """
+
+    def __init__(self, dag):
+        self._wire_indices = {wire: index for index, wire in enumerate(dag.qubits)}
+        self._node_ids = [array("q") for _ in dag.qubits]
+        self._set_starts = [array("q") for _ in dag.qubits]
+        # Positions beyond the second qubit of a gate are rare, and kept in a dict
+        self._set_indices = (array("i", [-1]) * dag.node_counter, array("i", [-1]) * dag.node_counter)
+        self._more_set_indices = {}
+
+    def _start_set(self, wire_index):
+        self._set_starts[wire_index].append(len(self._node_ids[wire_index]))
+
+    def _add(self, wire_index, node):
+        node_id = node._node_id
+        set_index = len(self._set_starts[wire_index]) - 1
+        self._node_ids[wire_index].append(node_id)
+        for position, qubit in enumerate(node.qargs):
+            if self._wire_indices[qubit] == wire_index:
+                if position < 2:
+                    set_indices = self._set_indices[position]
+                    if node_id >= len(set_indices):
+                        # Removed nodes leave holes in the node ids, so they
+                        # can exceed the number of nodes
+                        size = max(node_id + 1, 2 * len(set_indices))
+                        set_indices.extend(array("i", [-1]) * (size - len(set_indices)))
+                    set_indices[node_id] = set_index
+                else:
+                    self._more_set_indices[node_id, position] = set_index
+                return
+
+    def sets(self, wire):
+        """Yields the commutation sets on the qubit `wire` in order, each as an
+        array of node ids, see :meth:`~qiskit.dagcircuit.DAGCircuit.node`."""
+        wire_index = self._wire_indices[wire]
+        node_ids = self._node_ids[wire_index]
+        starts = self._set_starts[wire_index]
+        for set_index, start in enumerate(starts):
+            end = starts[set_index + 1] if set_index + 1 < len(starts) else len(node_ids)
+            yield node_ids[start:end]
+
+    def set_index(self, node, wire):
+        """Returns the index of the commutation set of the op node `node` on
+        the qubit `wire`, counted from the start of the qubit."""
+        position = node.qargs.index(wire)
+        if position < 2:
+            return self._set_indices[position][node._node_id]
+        return self._more_set_indices[node._node_id, position]
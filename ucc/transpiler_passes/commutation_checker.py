@@ -14,6 +14,8 @@
 
 """Code from commutative_analysis pass that checks commutation relations between DAG nodes."""
 
+import threading
+from collections import OrderedDict
 from functools import lru_cache
 from typing import List, Union, Set, Optional
 import numpy as np
@@ -24,6 +26,8 @@ from qiskit.circuit.operation import Operation
 from qiskit.circuit.controlflow import CONTROL_FLOW_OP_NAMES
 from qiskit.quantum_info.operators import Operator
 
+from .pauli_commutation import pauli_commutation
+
 _skipped_op_names = {"measure", "reset", "delay", "initialize"}
 _no_cache_op_names = {"annotated"}
 
@@ -61,8 +65,10 @@ class CommutationChecker:
     """This code is essentially copy-pasted from commutative_analysis.py.
     This code cleverly hashes commutativity and non-commutativity results between DAG nodes and seems
     quite efficient for large Clifford circuits.
-    They may be other possible efficiency improvements: using rule-based commutativity analysis,
-    evicting from the cache less useful entries, etc.
+    Pairs missing from the libraries are decided from the Pauli terms of the gates when possible,
+    see :func:`~ucc.transpiler_passes.pauli_commutation.pauli_commutation`.
+    Once the session cache holds `cache_max_entries` results, the least recently used
+    ones are evicted one by one. A checker can be shared between threads.
     """
 
     def __init__(
@@ -72,9 +78,12 @@ class CommutationChecker:
         *,
         gates: Optional[Set[str]] = None,
         check_matrix: bool = True,
+        commutation_library=None,
     ):
         """
         check_matrix (bool): If False, the commutation checker will not check the commutation of gates via matrix multiplication.
+        commutation_library (CommutationLibrary): Precomputed commutations looked up after `standard_gate_commutations`,
+            see :func:`~ucc.transpiler_passes.commutation_library.load_commutation_library`.
         """
 
         super().__init__()
@@ -87,11 +96,27 @@ class CommutationChecker:
         # self._cached_commutation has the same structure as standard_gate_commutations, i.e. a
         # dict[pair of gate names][relative placement][tuple of gate parameters] := True/False
         self._cached_commutations = {}
-        self._current_cache_entries = 0
+        # Keys of the cached entries, least recently used first
+        self._cache_order = OrderedDict()
         self._cache_miss = 0
         self._cache_hit = 0
+        self._library_hit = 0
+        self._analytic_hit = 0
+        self._cache_evictions = 0
         self._gate_names = gates
         self._check_matrix = check_matrix
+        self._commutation_library = commutation_library
+        # Guards the cache and the statistics of checkers shared between threads
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
 
     def commute_nodes(
         self,
@@ -110,6 +135,29 @@ class CommutationChecker:
             op2 = op2.op
         return self.commute(op1, qargs1, cargs1, op2, qargs2, cargs2, max_num_qubits)
 
+    @property
+    def check_matrix(self):
+        """Whether pairs missing from the libraries are checked via matrix multiplication."""
+        return self._check_matrix
+
+    def commute_nodes_batch(self, node_pairs, max_num_qubits: int = 3) -> List[bool]:
+        """Checks if each pair of DAGOpNodes in `node_pairs` commutes, see
+        :meth:`commute_batch`."""
+        return self.commute_batch(
+            [
+                (
+                    op1 if op1.is_standard_gate() else op1.op,
+                    op1.qargs,
+                    op1.cargs,
+                    op2 if op2.is_standard_gate() else op2.op,
+                    op2.qargs,
+                    op2.cargs,
+                )
+                for op1, op2 in node_pairs
+            ],
+            max_num_qubits,
+        )
+
     def commute(
         self,
         op1: Operation,
@@ -176,37 +224,207 @@ class CommutationChecker:
         is_commuting = _commute_matmul(first_op, first_qargs, second_op, second_qargs)
 
         # Store result in this session's commutation_library
-        # TODO implement LRU cache or similar
-        # Rebuild cache if current cache exceeded max size
-        if self._current_cache_entries >= self._cache_max_entries:
-            self.clear_cached_commutations()
-
-        first_params = getattr(first_op, "params", [])
-        second_params = getattr(second_op, "params", [])
-        if len(first_params) > 0 or len(second_params) > 0:
-            self._cached_commutations.setdefault((first_op.name, second_op.name), {}).setdefault(
-                _get_relative_placement(first_qargs, second_qargs), {}
-            )[
-                (_hashable_parameters(first_params), _hashable_parameters(second_params))
-            ] = is_commuting
-        else:
-            self._cached_commutations.setdefault((first_op.name, second_op.name), {})[
-                _get_relative_placement(first_qargs, second_qargs)
-            ] = is_commuting
-        self._current_cache_entries += 1
-
+        self._store_commutations(
+            {_cache_key(first_op, first_qargs, second_op, second_qargs): is_commuting}
+        )
         return is_commuting
 
+    def commute_batch(self, pairs, max_num_qubits: int = 3) -> List[bool]:
+        """Checks if each pair of Operations in `pairs` commutes, see :meth:`commute`.
+
+        The pairs missing from the libraries and the cache are checked via matrix
+        multiplication together: pairs on the same relative placement of their qubits are
+        stacked and multiplied in both orders at once, and all results are written to the
+        cache at once.
+
+        Args:
+            pairs: tuples ``(op1, qargs1, cargs1, op2, qargs2, cargs2)`` of arguments of
+                :meth:`commute`.
+            max_num_qubits: same as in :meth:`commute`.
+
+        Returns:
+            list[bool]: whether the operations of each pair commute.
+        """
+        results = [False] * len(pairs)
+        # Pairs left to the matrix check by cache key, with the indices of the pairs
+        pending = {}
+        for index, pair in enumerate(pairs):
+            commutation = self._lookup(*pair, max_num_qubits)
+            if not isinstance(commutation, tuple):
+                results[index] = bool(commutation)
+            else:
+                key, first_op, first_qargs, second_op, second_qargs = commutation
+                entry = pending.get(key)
+                if entry is None:
+                    entry = pending[key] = (first_op, first_qargs, second_op, second_qargs, [])
+                entry[4].append(index)
+
+        for key, is_commuting in self._commute_pending(pending).items():
+            for index in pending[key][4]:
+                results[index] = is_commuting
+        return results
+
+    def commute_nodes_with_all(self, checks, max_num_qubits: int = 3) -> List[bool]:
+        """Checks, for each ``(node, other_nodes)`` in `checks`, whether the DAGOpNode
+        `node` commutes with every DAGOpNode of `other_nodes`.
+
+        The pairs of a check are looked up in the libraries and the cache in order, up to
+        the first one that does not commute. The pairs left to the matrix check by all the
+        checks are then checked together, as in :meth:`commute_batch`.
+
+        Args:
+            checks: tuples ``(node, other_nodes)``.
+            max_num_qubits: same as in :meth:`commute`.
+
+        Returns:
+            list[bool]: whether the node of each check commutes with all the other nodes.
+        """
+        results = [True] * len(checks)
+        # Pairs left to the matrix check by cache key, with the indices of the checks
+        pending = {}
+        for index, (node, other_nodes) in enumerate(checks):
+            op1 = node if node.is_standard_gate() else node.op
+            check_pending = []
+            for other_node in other_nodes:
+                op2 = other_node if other_node.is_standard_gate() else other_node.op
+                commutation = self._lookup(
+                    op1,
+                    node.qargs,
+                    node.cargs,
+                    op2,
+                    other_node.qargs,
+                    other_node.cargs,
+                    max_num_qubits,
+                )
+                if isinstance(commutation, tuple):
+                    check_pending.append(commutation)
+                elif not commutation:
+                    results[index] = False
+                    break
+            else:
+                for key, first_op, first_qargs, second_op, second_qargs in check_pending:
+                    entry = pending.get(key)
+                    if entry is None:
+                        entry = pending[key] = (first_op, first_qargs, second_op, second_qargs, [])
+                    entry[4].append(index)
+
+        for key, is_commuting in self._commute_pending(pending).items():
+            if not is_commuting:
+                for index in pending[key][4]:
+                    results[index] = False
+        return results
+
+    def _lookup(self, op1, qargs1, cargs1, op2, qargs2, cargs2, max_num_qubits):
+        """Returns whether two Operations commute if it is known without a matrix
+        check, None if they are taken not to commute without one, as when
+        `check_matrix` is False, or else the arguments of the matrix check: their
+        cache key and the operations in canonical order with their qubits."""
+        if self._gate_names is not None:
+            if op1.name not in self._gate_names or op2.name not in self._gate_names:
+                return False
+        structural_commutation = _commutation_precheck(
+            op1, qargs1, cargs1, op2, qargs2, cargs2, max_num_qubits
+        )
+        if structural_commutation is not None:
+            return structural_commutation
+
+        first_op_tuple, second_op_tuple = _order_operations(
+            op1, qargs1, cargs1, op2, qargs2, cargs2
+        )
+        first_op, first_qargs, _ = first_op_tuple
+        second_op, second_qargs, _ = second_op_tuple
+        if first_op.name in _no_cache_op_names or second_op.name in _no_cache_op_names:
+            return _commute_matmul(first_op, first_qargs, second_op, second_qargs)
+
+        commutation_lookup = self.check_commutation_entries(
+            first_op, first_qargs, second_op, second_qargs
+        )
+        if commutation_lookup is not None:
+            return commutation_lookup
+        if not self._check_matrix:
+            return None
+        key = _cache_key(first_op, first_qargs, second_op, second_qargs)
+        return key, first_op, first_qargs, second_op, second_qargs
+
+    def _commute_pending(self, pending):
+        """Checks the pairs of operations in `pending`, a dictionary from cache key
+        to ``(first_op, first_qargs, second_op, second_qargs, ...)``, via matrix
+        multiplication in one batch per relative placement, stores the results in
+        the cache and returns them by cache key."""
+        groups = {}
+        for key, (_, first_qargs, _, second_qargs, *_) in pending.items():
+            groups.setdefault(_matmul_placement(first_qargs, second_qargs), []).append(key)
+        computed = {}
+        for placement, keys in groups.items():
+            commuting = _commute_matmul_batch(
+                [pending[key][0] for key in keys], [pending[key][2] for key in keys], *placement
+            )
+            computed.update(zip(keys, commuting))
+        self._store_commutations(computed)
+        return computed
+
+    def _store_commutations(self, commutations):
+        """Stores the commutation of each cache key in `commutations` in the cache."""
+        if self._cache_max_entries <= 0:
+            return
+        with self._lock:
+            for key, is_commuting in commutations.items():
+                if key in self._cache_order:
+                    # Stored by another thread in the meantime
+                    continue
+                while len(self._cache_order) >= self._cache_max_entries:
+                    self._evict_least_recently_used()
+                pair, placement, params = key
+                if params is None:
+                    self._cached_commutations.setdefault(pair, {})[placement] = is_commuting
+                else:
+                    self._cached_commutations.setdefault(pair, {}).setdefault(placement, {})[
+                        params
+                    ] = is_commuting
+                self._cache_order[key] = None
+
     def num_cached_entries(self):
         """Returns number of cached entries"""
-        return self._current_cache_entries
+        return len(self._cache_order)
 
     def clear_cached_commutations(self):
         """Clears the dictionary holding cached commutations"""
-        self._current_cache_entries = 0
-        self._cache_miss = 0
-        self._cache_hit = 0
-        self._cached_commutations = {}
+        with self._lock:
+            self._cache_miss = 0
+            self._cache_hit = 0
+            self._library_hit = 0
+            self._analytic_hit = 0
+            self._cache_evictions = 0
+            self._cached_commutations = {}
+            self._cache_order = OrderedDict()
+
+    def cache_stats(self):
+        """Returns the number of lookups answered by the standard commutations
+        or the precomputed commutation library (``"library_hits"``), from the
+        Pauli terms of the gates (``"analytic_hits"``) and by the session cache
+        (``"cache_hits"``), of lookups answered by none of them (``"misses"``),
+        and of entries evicted from the session cache to stay within
+        `cache_max_entries` (``"evictions"``)."""
+        with self._lock:
+            return {
+                "library_hits": self._library_hit,
+                "analytic_hits": self._analytic_hit,
+                "cache_hits": self._cache_hit,
+                "misses": self._cache_miss,
+                "evictions": self._cache_evictions,
+            }
+
+    def _evict_least_recently_used(self):
+        (pair, placement, params), _ = self._cache_order.popitem(last=False)
+        self._cache_evictions += 1
+        placements = self._cached_commutations[pair]
+        if params is not None:
+            del placements[placement][params]
+            if placements[placement]:
+                return
+        del placements[placement]
+        if not placements:
+            del self._cached_commutations[pair]
 
     def check_commutation_entries(
         self,
@@ -227,7 +445,6 @@ class CommutationChecker:
             bool: True if the gates commute and false if it is not the case.
         """
 
-        # We don't precompute commutations for parameterized gates, yet
         commutation = _query_commutation(
             first_op,
             first_qargs,
@@ -236,23 +453,52 @@ class CommutationChecker:
             self._standard_commutations,
         )
 
+        if commutation is None and self._commutation_library is not None:
+            commutation = self._commutation_library.query(
+                first_op, first_qargs, second_op, second_qargs
+            )
+
         if commutation is not None:
+            with self._lock:
+                self._library_hit += 1
             return commutation
 
-        commutation = _query_commutation(
-            first_op,
-            first_qargs,
-            second_op,
-            second_qargs,
-            self._cached_commutations,
-        )
-        if commutation is None:
-            self._cache_miss += 1
-        else:
-            self._cache_hit += 1
+        commutation = pauli_commutation(first_op, first_qargs, second_op, second_qargs)
+        if commutation is not None:
+            with self._lock:
+                self._analytic_hit += 1
+            return commutation
+
+        key = _cache_key(first_op, first_qargs, second_op, second_qargs)
+        pair, placement, params = key
+        with self._lock:
+            commutation = self._cached_commutations.get(pair, {}).get(placement)
+            if params is not None:
+                commutation = commutation.get(params) if isinstance(commutation, dict) else None
+            elif isinstance(commutation, dict):
+                commutation = None
+            if commutation is None:
+                self._cache_miss += 1
+            else:
+                self._cache_hit += 1
+                self._cache_order.move_to_end(key)
         return commutation
 
 
+def _cache_key(first_op, first_qargs, second_op, second_qargs):
+    """Returns the key of the cached commutation of two ordered operations: the
+    pair of gate names, their relative placement and their parameters, or None
+    if neither has parameters."""
+    placement = _get_relative_placement(first_qargs, second_qargs)
+    first_params = getattr(first_op, "params", [])
+    second_params = getattr(second_op, "params", [])
+    if len(first_params) > 0 or len(second_params) > 0:
+        params = (_hashable_parameters(first_params), _hashable_parameters(second_params))
+    else:
+        params = None
+    return (first_op.name, second_op.name), placement, params
+
+
 def _hashable_parameters(params):
     """Convert the parameters of a gate into a hashable format for lookup in a dictionary.
 
@@ -319,7 +565,7 @@ def _commutation_precheck(
     max_num_qubits,
 ):
     # Bug in CommutativeCancellation, e.g. see gh-8553
-    if getattr(op1, "condition", False) or getattr(op2, "condition", False):
+    if getattr(op1, "_condition", None) or getattr(op2, "_condition", None):
         return False
 
     if set(qargs1).isdisjoint(qargs2) and set(cargs1).isdisjoint(cargs2):
@@ -446,9 +692,9 @@ def _query_commutation(
         raise ValueError("Expected commutation to be None, bool or a dict")
 
 
-def _commute_matmul(
-    first_ops: Operation, first_qargs: List, second_op: Operation, second_qargs: List
-):
+def _matmul_placement(first_qargs: List, second_qargs: List):
+    """Returns the qubit indices of two operations in the operator acting on both, and its
+    number of qubits. The first operation acts on the lowest indices."""
     qarg = {q: i for i, q in enumerate(first_qargs)}
     num_qubits = len(qarg)
     for q in second_qargs:
@@ -458,6 +704,13 @@ def _commute_matmul(
 
     first_qarg = tuple(qarg[q] for q in first_qargs)
     second_qarg = tuple(qarg[q] for q in second_qargs)
+    return first_qarg, second_qarg, num_qubits
+
+
+def _commute_matmul(
+    first_ops: Operation, first_qargs: List, second_op: Operation, second_qargs: List
+):
+    first_qarg, second_qarg, num_qubits = _matmul_placement(first_qargs, second_qargs)
 
     from qiskit.dagcircuit.dagnode import DAGOpNode
 
@@ -495,3 +748,72 @@ def _commute_matmul(
         op21 = operator_1.compose(operator_2, qargs=second_qarg, front=True)
     ret = op12 == op21
     return ret
+
+
+def _operation_matrix(op, num_qubits):
+    """Returns the matrix of `op`, or None if it has none."""
+    from qiskit.dagcircuit.dagnode import DAGOpNode
+
+    if isinstance(op, DAGOpNode):
+        op = op.matrix
+    try:
+        return Operator(op, input_dims=(2,) * num_qubits, output_dims=(2,) * num_qubits).data
+    except QiskitError:
+        return None
+
+
+def _expand_matrices(matrices, qarg, num_qubits):
+    """Returns the stacked `matrices`, acting on the qubits `qarg`, as matrices on
+    `num_qubits` qubits."""
+    count, width = len(matrices), len(qarg)
+    dim = 2**num_qubits
+    if width < num_qubits:
+        # Identity on the extra qubits, which come after the qubits of the matrices
+        matrices = np.einsum(
+            "ab,kij->kaibj", np.eye(2 ** (num_qubits - width)), matrices
+        ).reshape(count, dim, dim)
+    if qarg == tuple(range(width)):
+        return matrices
+    # Move the qubit at index j to its index in the order below
+    order = list(qarg) + [index for index in range(num_qubits) if index not in qarg]
+    source = [0] * num_qubits
+    for index, target in enumerate(order):
+        source[target] = index
+    # Axis 1 + num_qubits - 1 - j holds the row bit of qubit j, most significant first
+    row_axes = [num_qubits - source[target] for target in reversed(range(num_qubits))]
+    axes = [0] + row_axes + [axis + num_qubits for axis in row_axes]
+    tensor = matrices.reshape((count,) + (2,) * (2 * num_qubits))
+    return tensor.transpose(axes).reshape(count, dim, dim)
+
+
+def _commute_matmul_batch(first_ops, second_ops, first_qarg, second_qarg, num_qubits):
+    """Checks the commutation of each pair of `first_ops` and `second_ops`, all on the
+    same relative placement, with stacked matrix multiplications."""
+    results = [False] * len(first_ops)
+    valid = []
+    first_matrices = []
+    second_matrices = []
+    for index, (first_op, second_op) in enumerate(zip(first_ops, second_ops)):
+        first_matrix = _operation_matrix(first_op, len(first_qarg))
+        second_matrix = _operation_matrix(second_op, len(second_qarg))
+        if first_matrix is None or second_matrix is None:
+            continue
+        valid.append(index)
+        first_matrices.append(first_matrix)
+        second_matrices.append(second_matrix)
+    if not valid:
+        return results
+
+    first = _expand_matrices(np.asarray(first_matrices, dtype=complex), first_qarg, num_qubits)
+    second = _expand_matrices(np.asarray(second_matrices, dtype=complex), second_qarg, num_qubits)
+    product = np.matmul(first, second)
+    reverse_product = np.matmul(second, first)
+    # Same tolerances as Operator.__eq__
+    tolerance = np.abs(reverse_product)
+    tolerance *= Operator.rtol
+    tolerance += Operator.atol
+    np.subtract(product, reverse_product, out=product)
+    commuting = np.all(np.abs(product) <= tolerance, axis=(1, 2))
+    for index, is_commuting in zip(valid, commuting):
+        results[index] = bool(is_commuting)
+    return results
@@ -0,0 +1,210 @@
+"""Precomputed commutation relations of the standard gates, stored in a binary
+file shipped with ucc and memory-mapped on first use.
+
+The file holds a dense table of one byte per ordered pair of gates and
+relative placement, in the canonical order of
+:class:`~ucc.transpiler_passes.CommutationChecker`. Pairs of parameterized
+gates that commute for some values of their parameters only, e.g. two ``r``
+gates with the same axis, are not answered and are left to the matrix
+check. It is built by running this module::
+
+    python -m ucc.transpiler_passes.commutation_library
+"""
+
+import itertools
+import json
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+from qiskit.circuit import Gate, Qubit
+from qiskit.circuit.library.standard_gates import get_standard_gate_name_mapping
+
+from .commutation_checker import _commute_matmul, _get_relative_placement, _order_operations
+
+LIBRARY_PATH = os.path.join(os.path.dirname(__file__), "commutation_library.bin")
+
+_MAGIC = b"UCCCOMM1"
+_MAX_QUBITS = 3
+# 4**_MAX_QUBITS placements: each qubit of the first gate is either not shared
+# (digit 0) or is qubit i of the second gate (digit i + 1)
+_NUM_PLACEMENTS = 4**_MAX_QUBITS
+
+_UNKNOWN = 0
+_NEVER = 1
+_ALWAYS = 2
+# The gates commute for some values of their parameters only
+_SPECIAL_PARAMETERS = 3
+
+
+class CommutationLibrary:
+    """Read-only view of a commutation table file, see
+    :func:`load_commutation_library`.
+
+    Args:
+        buffer: Bytes of the file, e.g. a :class:`mmap.mmap`.
+    """
+
+    def __init__(self, buffer):
+        if buffer[: len(_MAGIC)] != _MAGIC:
+            raise ValueError("Not a commutation library file.")
+        header_size = struct.unpack_from("<I", buffer, len(_MAGIC))[0]
+        header_start = len(_MAGIC) + 4
+        names = json.loads(bytes(buffer[header_start : header_start + header_size]))
+        self._buffer = buffer
+        self._offset = header_start + header_size
+        self._num_gates = len(names)
+        self._gate_index = {name: index for index, name in enumerate(names)}
+
+    def restricted(self, gates):
+        """Returns a view of the same table answering only pairs of `gates`."""
+        view = object.__new__(CommutationLibrary)
+        view.__dict__.update(self.__dict__)
+        view._gate_index = {
+            name: index for name, index in self._gate_index.items() if name in gates
+        }
+        return view
+
+    def __reduce__(self):
+        # The memory map can not be pickled, worker processes map the file of
+        # their own installation
+        return (_restore_library, (tuple(self._gate_index),))
+
+    def query(self, first_op, first_qargs, second_op, second_qargs):
+        """Returns whether two operations in canonical order commute, or None if
+        the table can not tell, as for gates that commute for some values of
+        their parameters only."""
+        first_index = self._gate_index.get(first_op.name)
+        second_index = self._gate_index.get(second_op.name)
+        if first_index is None or second_index is None:
+            return None
+        placement = _placement_code(_get_relative_placement(first_qargs, second_qargs))
+        value = self._buffer[
+            self._offset
+            + (first_index * self._num_gates + second_index) * _NUM_PLACEMENTS
+            + placement
+        ]
+        if value == _ALWAYS:
+            return True
+        if value == _NEVER:
+            return False
+        # Whether _SPECIAL_PARAMETERS commute depends on the values of the
+        # parameters and on how they relate, e.g. equal phases of two r gates
+        return None
+
+
+def _placement_code(placement):
+    code = 0
+    for position in placement:
+        code = code * 4 + (0 if position is None else position + 1)
+    return code
+
+
+_library = None
+_library_lock = threading.Lock()
+
+
+def load_commutation_library():
+    """Returns the :class:`CommutationLibrary` shipped with ucc, memory-mapping
+    the file on the first call. Returns None if the file is missing."""
+    global _library
+    if _library is None:
+        with _library_lock:
+            if _library is None and os.path.exists(LIBRARY_PATH):
+                with open(LIBRARY_PATH, "rb") as file:
+                    _library = CommutationLibrary(
+                        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                    )
+    return _library
+
+
+def _restore_library(gates):
+    return load_commutation_library().restricted(gates)
+
+
+def _library_gates():
+    return {
+        name: gate
+        for name, gate in get_standard_gate_name_mapping().items()
+        if isinstance(gate, Gate) and 1 <= gate.num_qubits <= _MAX_QUBITS
+    }
+
+
+def _placements(first_num_qubits, second_num_qubits):
+    """Yields the relative placements of two gates sharing at least one qubit."""
+    choices = [None] + list(range(second_num_qubits))
+    for placement in itertools.product(choices, repeat=first_num_qubits):
+        shared = [position for position in placement if position is not None]
+        if shared and len(set(shared)) == len(shared):
+            yield placement
+
+
+def _with_params(gate, values):
+    if not gate.params:
+        return gate
+    gate = gate.copy()
+    gate.params = list(values[: len(gate.params)])
+    return gate
+
+
+def build_commutation_library(path=LIBRARY_PATH, trials=2, seed=1234):
+    """Computes the commutation relations of all pairs of standard gates on up
+    to three qubits in all relative placements, and writes them to `path`.
+
+    Parameterized gates are checked with `trials` sets of random angles. If
+    they commute for all of them, they commute for any angles, as the
+    commutator is analytic in the angles; otherwise they commute for some
+    values of the angles only, which are left to the matrix check.
+    """
+    gates = _library_gates()
+    names = sorted(gates)
+    index = {name: position for position, name in enumerate(names)}
+    table = bytearray(len(names) ** 2 * _NUM_PLACEMENTS)
+    rng = np.random.default_rng(seed)
+    angles = [rng.uniform(0, 2 * np.pi, size=8) for _ in range(trials)]
+    qubits = [Qubit() for _ in range(2 * _MAX_QUBITS)]
+
+    for name1, name2 in itertools.combinations_with_replacement(names, 2):
+        gate1, gate2 = gates[name1], gates[name2]
+        first_tuple, second_tuple = _order_operations(
+            gate1, qubits[: gate1.num_qubits], [], gate2, qubits[: gate2.num_qubits], []
+        )
+        first, second = first_tuple[0], second_tuple[0]
+        first_qargs = qubits[: first.num_qubits]
+        for placement in _placements(first.num_qubits, second.num_qubits):
+            free = iter(qubits[first.num_qubits :])
+            second_qargs = [None] * second.num_qubits
+            for qubit, position in zip(first_qargs, placement):
+                if position is not None:
+                    second_qargs[position] = qubit
+            second_qargs = [qubit if qubit is not None else next(free) for qubit in second_qargs]
+            commutes = all(
+                _commute_matmul(
+                    _with_params(first, values[:4]),
+                    first_qargs,
+                    _with_params(second, values[4:]),
+                    second_qargs,
+                )
+                for values in angles
+            )
+            if commutes:
+                value = _ALWAYS
+            elif first.params or second.params:
+                value = _SPECIAL_PARAMETERS
+            else:
+                value = _NEVER
+            pair = index[first.name] * len(names) + index[second.name]
+            table[pair * _NUM_PLACEMENTS + _placement_code(placement)] = value
+
+    header = json.dumps(names).encode()
+    with open(path, "wb") as file:
+        file.write(_MAGIC)
+        file.write(struct.pack("<I", len(header)))
+        file.write(header)
+        file.write(table)
+
+
+if __name__ == "__main__":
+    build_commutation_library()
@@ -22,12 +22,12 @@ from qiskit.transpiler.exceptions import TranspilerError
 from qiskit.transpiler.basepasses import TransformationPass
 from qiskit.transpiler.passmanager import PassManager
 from .commutation_analysis import CommutationAnalysis
-from qiskit.dagcircuit import DAGCircuit, DAGInNode, DAGOutNode
+from qiskit.dagcircuit import DAGCircuit
 from qiskit.circuit.library.standard_gates.u1 import U1Gate
 from qiskit.circuit.library.standard_gates.rx import RXGate
 from qiskit.circuit.library.standard_gates.p import PhaseGate
 from qiskit.circuit.library.standard_gates.rz import RZGate
-from qiskit.circuit import ControlFlowOp
+from qiskit.circuit import ControlFlowOp, ParameterExpression
 
 
 _CUTOFF_PRECISION = 1e-5
@@ -42,7 +42,7 @@ class CommutativeCancellation(TransformationPass):
         H, X, Y, Z, CX, CY, CZ
     """
 
-    def __init__(self, basis_gates=None, target=None, standard_gates=None, special_commutations=None):
+    def __init__(self, basis_gates=None, target=None, standard_gates=None, special_commutations=None, check_matrix=False):
         """
         CommutativeCancellation initializer.
 
@@ -56,6 +56,8 @@ class CommutativeCancellation(TransformationPass):
                 precedence and ``basis_gates`` will be ignored.
             standard_gates (list[str]): If provided, only the commutation relations between the gates in this list will be considered.
             special_commutations (dict): Dictionary of special commutation relations.
+            check_matrix (bool): If True, pairs of gates missing from the commutation libraries
+                are checked via matrix multiplication.
         """
         super().__init__()
         if basis_gates:
@@ -66,7 +68,7 @@ class CommutativeCancellation(TransformationPass):
             self.basis = set(target.operation_names)
 
         self._var_z_map = {"rz": RZGate, "p": PhaseGate, "u1": U1Gate}
-        self.requires.append(CommutationAnalysis(standard_gates=standard_gates, special_commutations=special_commutations))
+        self.requires.append(CommutationAnalysis(standard_gates=standard_gates, special_commutations=special_commutations, check_matrix=check_matrix))
 
     def run(self, dag):
         """Run the CommutativeCancellation pass on `dag`.
@@ -93,7 +95,7 @@ class CommutativeCancellation(TransformationPass):
         # Now the gates supported are hard-coded
         q_gate_list = ["cx", "cy", "cz", "h", "y"]
 
-        # Gate sets to be cancelled
+        # Gate sets to be cancelled, as node ids
         cancellation_sets = defaultdict(lambda: [])
 
         # Traverse each qubit to generate the cancel dictionaries
@@ -103,20 +105,24 @@ class CommutativeCancellation(TransformationPass):
         #  - For 2qbit gates the key: (gate_type, first_qbit, sec_qbit, first commutation_set_id,
         #    sec_commutation_set_id), the value is the list gates that share the same gate type,
         #    qubits and commutation sets.
+        commutation_sets = self.property_set["commutation_set"]
         for wire in dag.qubits:
-            wire_commutation_set = self.property_set["commutation_set"][wire]
-
-            for com_set_idx, com_set in enumerate(wire_commutation_set):
-                if isinstance(com_set[0], (DAGInNode, DAGOutNode)):
-                    continue
-                for node in com_set:
+            for com_set_idx, com_set in enumerate(commutation_sets.sets(wire)):
+                for node in map(dag.node, com_set):
                     num_qargs = len(node.qargs)
                     if num_qargs == 1 and node.name in q_gate_list:
-                        cancellation_sets[(node.name, wire, com_set_idx)].append(node)
+                        cancellation_sets[(node.name, wire, com_set_idx)].append(node._node_id)
+                    if num_qargs == 1 and _has_numeric_angle(node):
+                        # Only parameterized rotations are merged here. Merged
+                        # numeric rotations move to the first gate of their
+                        # set, which costs two-qubit gates once routed, e.g.
+                        # for QFT on a line. Optimize1qGatesDecomposition
+                        # merges them where they are adjacent instead.
+                        continue
                     if num_qargs == 1 and node.name in ["p", "z", "u1", "rz", "t", "s"]:
-                        cancellation_sets[("z_rotation", wire, com_set_idx)].append(node)
+                        cancellation_sets[("z_rotation", wire, com_set_idx)].append(node._node_id)
                     if num_qargs == 1 and node.name in ["rx", "x"]:
-                        cancellation_sets[("x_rotation", wire, com_set_idx)].append(node)
+                        cancellation_sets[("x_rotation", wire, com_set_idx)].append(node._node_id)
                     # Don't deal with Y rotation, because Y rotation doesn't commute with CNOT, so
                     # it should be dealt with by optimized1qgate pass
                     elif num_qargs == 2 and node.qargs[0] == wire:
@@ -126,9 +132,9 @@ class CommutativeCancellation(TransformationPass):
                             wire,
                             second_qarg,
                             com_set_idx,
-                            self.property_set["commutation_set"][(node, second_qarg)],
+                            commutation_sets.set_index(node, second_qarg),
                         )
-                        cancellation_sets[q2_key].append(node)
+                        cancellation_sets[q2_key].append(node._node_id)
 
         for cancel_set_key in cancellation_sets:
             if cancel_set_key[0] == "z_rotation" and var_z_gate is None:
@@ -136,24 +142,24 @@ class CommutativeCancellation(TransformationPass):
             set_len = len(cancellation_sets[cancel_set_key])
             if set_len > 1 and cancel_set_key[0] in q_gate_list:
                 gates_to_cancel = cancellation_sets[cancel_set_key]
-                for c_node in gates_to_cancel[: (set_len // 2) * 2]:
-                    dag.remove_op_node(c_node)
+                for node_id in gates_to_cancel[: (set_len // 2) * 2]:
+                    dag.remove_op_node(dag.node(node_id))
 
             elif set_len > 1 and cancel_set_key[0] in ["z_rotation", "x_rotation"]:
-                run = cancellation_sets[cancel_set_key]
+                run = [dag.node(node_id) for node_id in cancellation_sets[cancel_set_key]]
                 run_qarg = run[0].qargs[0]
                 total_angle = 0.0  # lambda
                 total_phase = 0.0
                 for current_node in run:
                     if (
-                        getattr(current_node.op, "condition", None) is not None
+                        getattr(current_node.op, "_condition", None) is not None
                         or len(current_node.qargs) != 1
                         or current_node.qargs[0] != run_qarg
                     ):
                         raise TranspilerError("internal error")
 
                     if current_node.name in ["p", "u1", "rz", "rx"]:
-                        current_angle = float(current_node.op.params[0])
+                        current_angle = current_node.op.params[0]
                     elif current_node.name in ["z", "x"]:
                         current_angle = np.pi
                     elif current_node.name == "t":
@@ -172,8 +178,16 @@ class CommutativeCancellation(TransformationPass):
                 elif cancel_set_key[0] == "x_rotation":
                     new_op = RXGate(total_angle)
 
+                # Angles of parameterized gates are kept as exact expressions,
+                # they can only be dropped once they evaluate to a number
+                numeric_angle = _numeric_angle(total_angle)
+                is_identity = (
+                    numeric_angle is not None
+                    and np.mod(numeric_angle, (2 * np.pi)) < _CUTOFF_PRECISION
+                )
+
                 new_op_phase = 0
-                if np.mod(total_angle, (2 * np.pi)) > _CUTOFF_PRECISION:
+                if not is_identity:
                     new_qarg = QuantumRegister(1, "q")
                     new_dag = DAGCircuit()
                     new_dag.add_qreg(new_qarg)
@@ -182,13 +196,13 @@ class CommutativeCancellation(TransformationPass):
                     if new_op.definition:
                         new_op_phase = new_op.definition.global_phase
 
-                dag.global_phase = total_phase - new_op_phase
+                dag.global_phase += total_phase - new_op_phase
 
                 # Delete the other nodes in the run
                 for current_node in run[1:]:
                     dag.remove_op_node(current_node)
 
-                if np.mod(total_angle, (2 * np.pi)) < _CUTOFF_PRECISION:
+                if is_identity:
                     dag.remove_op_node(run[0])
 
         dag = self._handle_control_flow_ops(dag)
@@ -209,3 +223,18 @@ class CommutativeCancellation(TransformationPass):
                 mapped_blocks.append(new_circ)
             node.op = node.op.replace_blocks(mapped_blocks)
         return dag
+
+
+def _has_numeric_angle(node):
+    """Returns whether `node` is a rotation whose angle is a number."""
+    return node.name in ["p", "u1", "rz", "rx"] and _numeric_angle(node.op.params[0]) is not None
+
+
+def _numeric_angle(angle):
+    """Returns `angle` as a float, or None if it depends on unbound parameters."""
+    if isinstance(angle, ParameterExpression):
+        try:
+            return float(angle)
+        except TypeError:
+            return None
+    return float(angle)
@@ -0,0 +1,261 @@
+"""Optimize the independent parts of a circuit in parallel worker processes."""
+
+import pickle
+import time
+
+from concurrent.futures.process import BrokenProcessPool
+
+from qiskit.converters import dag_to_circuit
+from qiskit.transpiler import PassManager
+from qiskit.transpiler.basepasses import AnalysisPass, TransformationPass
+from qiskit.utils.parallel import CPU_COUNT, should_run_in_parallel
+
+from .layout.disjoint_utils import combine_barriers, split_barriers
+
+
+class FindIndependentComponents(AnalysisPass):
+    """Find groups of qubits that no operation connects, to optimize them in
+    parallel with :class:`ParallelComponentOptimization`.
+
+    Qubits are connected by multi-qubit operations and by writing to the same
+    classical bits. Barriers do not connect qubits. The groups are binned into
+    at most `max_workers` groups of similar size and stored as lists of qubit
+    indices in ``property_set["independent_components"]``. A single group is
+    stored if the circuit is smaller than `min_size` operations, has control
+    flow or conditions, or parallel execution is disabled, since then splitting
+    does not pay off.
+    """
+
+    def __init__(self, min_size=2000, max_workers=None):
+        """
+        Args:
+            min_size (int): Minimum number of operations of a circuit to split it.
+            max_workers (int): Maximum number of groups. Defaults to the number
+                of CPUs.
+        """
+        super().__init__()
+        self.min_size = min_size
+        self.max_workers = max_workers
+
+    def run(self, dag):
+        """Run the FindIndependentComponents pass on `dag`.
+
+        Args:
+            dag (DAGCircuit): input dag
+        """
+        max_workers = CPU_COUNT if self.max_workers is None else self.max_workers
+        all_qubits = list(range(dag.num_qubits()))
+        self.property_set["independent_components"] = [all_qubits]
+        # The size of a DAG with control flow is ambiguous
+        if (
+            max_workers < 2
+            or not should_run_in_parallel(max_workers)
+            or dag.control_flow_op_nodes()
+            or dag.size() < self.min_size
+        ):
+            return
+
+        # Union-find over the qubits, followed by the classical bits
+        num_qubits = dag.num_qubits()
+        parents = list(range(num_qubits + dag.num_clbits()))
+
+        def find(index):
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+
+        for node in dag.op_nodes(include_directives=False):
+            if not node.qargs or getattr(node.op, "_condition", None) is not None:
+                return
+            bits = [dag.find_bit(qubit).index for qubit in node.qargs]
+            bits += [num_qubits + dag.find_bit(clbit).index for clbit in node.cargs]
+            root = find(bits[0])
+            for bit in bits[1:]:
+                parents[find(bit)] = root
+
+        components = {}
+        for qubit in all_qubits:
+            components.setdefault(find(qubit), []).append(qubit)
+        if len(components) < 2:
+            return
+
+        # Largest components first, each into the group with the fewest operations
+        sizes = {root: 0 for root in components}
+        for node in dag.op_nodes(include_directives=False):
+            sizes[find(dag.find_bit(node.qargs[0]).index)] += 1
+        groups = [[] for _ in range(min(max_workers, len(components)))]
+        group_sizes = [0] * len(groups)
+        for root in sorted(components, key=lambda root: -sizes[root]):
+            group = group_sizes.index(min(group_sizes))
+            groups[group].extend(components[root])
+            group_sizes[group] += sizes[root]
+        self.property_set["independent_components"] = [
+            sorted(group) for group in groups if group
+        ]
+
+
+class ParallelComponentOptimization(TransformationPass):
+    """Run the tasks returned by `build_tasks` on each group of independent
+    qubits found by :class:`FindIndependentComponents` in a separate worker
+    process, and merge the results back into a single circuit.
+
+    The groups run on the worker pool shared with :func:`ucc.compile_many`,
+    which is started on first use and kept alive between runs. Rather than
+    the passes, the workers receive `build_tasks` and build the passes
+    themselves, once per worker. The tasks must not add or remove qubits, as
+    the local optimization passes. Their deadline, skipped stages and local
+    iterations are carried between this pass manager and the workers, see
+    :func:`~ucc.transpilers.pipeline.optional_stage`. The passes run in the
+    workers are not reported to the callback of the pass manager.
+    """
+
+    def __init__(self, build_tasks, max_workers=None):
+        """
+        Args:
+            build_tasks (callable): Returns the passes or flow controllers run
+                on each group. It must be picklable, as a module-level function
+                or a :func:`functools.partial` of one.
+            max_workers (int): Maximum number of worker processes. Defaults to
+                the number of CPUs.
+        """
+        super().__init__()
+        self.build_tasks = build_tasks
+        self.max_workers = max_workers
+        # Serialized once, and used by the workers to find the tasks they built
+        self._build_tasks_bin = pickle.dumps(build_tasks)
+
+    def run(self, dag):
+        """Run the ParallelComponentOptimization pass on `dag`.
+
+        Args:
+            dag (DAGCircuit): input dag
+
+        Returns:
+            DAGCircuit: the optimized dag.
+        """
+        groups = self.property_set["independent_components"]
+        if not groups or len(groups) < 2:
+            groups = [list(range(dag.num_qubits()))]
+
+        split_barriers(dag)
+        group_dags, group_clbits = _split_groups(dag, groups)
+        combine_barriers(dag, retain_uuid=False)
+        circuits = [
+            dag_to_circuit(group_dag, copy_operations=False) for group_dag in group_dags
+        ]
+        group_bits = [
+            ([dag.qubits[index] for index in group], clbits)
+            for group, clbits in zip(groups, group_clbits)
+        ]
+
+        # Imported here, as ucc.compile imports the passes
+        from ..compile import _discard_executor, _submit_to_executor
+
+        max_workers = CPU_COUNT if self.max_workers is None else self.max_workers
+        # perf_counter has no defined reference point, so the workers get the
+        # time left rather than the deadline
+        deadline = self.property_set["deadline"]
+        time_left = None if deadline is None else deadline - time.perf_counter()
+        executor, futures = _submit_to_executor(
+            min(max_workers, len(circuits)),
+            _optimize_group,
+            [(circuit, self._build_tasks_bin, time_left) for circuit in circuits],
+            reuse_larger=True,
+        )
+        try:
+            results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            _discard_executor(executor)
+            raise
+
+        merged = dag.copy_empty_like()
+        local_iterations = None
+        for (circuit, run_state), (qubits, clbits) in zip(results, group_bits):
+            # Cheaper than DAGCircuit.compose, which copies every operation
+            merged.global_phase += circuit.global_phase
+            qubit_map = dict(zip(circuit.qubits, qubits))
+            clbit_map = dict(zip(circuit.clbits, clbits))
+            for instruction in circuit.data:
+                merged.apply_operation_back(
+                    instruction.operation,
+                    tuple(qubit_map[qubit] for qubit in instruction.qubits),
+                    tuple(clbit_map[clbit] for clbit in instruction.clbits),
+                    check=False,
+                )
+            for key in ("skipped_stages", "unchanged_stages"):
+                if self.property_set[key] is not None:
+                    self.property_set[key].extend(run_state[key])
+            if run_state["local_iterations"] is not None:
+                local_iterations = max(local_iterations or 0, run_state["local_iterations"])
+        combine_barriers(merged, retain_uuid=False)
+        if local_iterations is not None:
+            self.property_set["local_iterations"] = (
+                self.property_set["local_iterations"] or 0
+            ) + local_iterations
+        return merged
+
+
+def _split_groups(dag, groups):
+    """Returns the parts of `dag` on each group of qubit indices in `groups`,
+    and the classical bits used by each part."""
+    group_of_qubit = {}
+    group_dags = []
+    for index, group in enumerate(groups):
+        qubits = {dag.qubits[qubit] for qubit in group}
+        for qubit in qubits:
+            group_of_qubit[qubit] = index
+        group_dag = dag.copy_empty_like()
+        group_dag.global_phase = 0
+        group_dag.remove_qubits(*(qubit for qubit in dag.qubits if qubit not in qubits))
+        group_dags.append(group_dag)
+
+    used_clbits = [set() for _ in groups]
+    for node in dag.topological_op_nodes():
+        index = group_of_qubit[node.qargs[0]]
+        group_dags[index].apply_operation_back(node.op, node.qargs, node.cargs, check=False)
+        used_clbits[index].update(node.cargs)
+
+    group_clbits = []
+    for group_dag, clbits in zip(group_dags, used_clbits):
+        group_dag.remove_clbits(*(clbit for clbit in dag.clbits if clbit not in clbits))
+        combine_barriers(group_dag)
+        group_clbits.append([clbit for clbit in dag.clbits if clbit in clbits])
+    return group_dags, group_clbits
+
+
+# Tasks built in this worker process, by serialized build_tasks
+_worker_tasks = {}
+
+
+def _optimize_group(circuit, build_tasks_bin, time_left):
+    """Runs the tasks built by the serialized `build_tasks` on `circuit` in a
+    worker process, within `time_left` seconds if not None, returning the
+    optimized circuit and the state of the run."""
+    deadline = None if time_left is None else time.perf_counter() + time_left
+    tasks = _worker_tasks.get(build_tasks_bin)
+    if tasks is None:
+        tasks = _worker_tasks[build_tasks_bin] = list(pickle.loads(build_tasks_bin)())
+    pass_manager = PassManager([_StartGroupRun(deadline)] + tasks)
+    optimized_circuit = pass_manager.run(circuit)
+    property_set = pass_manager.property_set
+    run_state = {
+        "skipped_stages": property_set["skipped_stages"],
+        "unchanged_stages": property_set["unchanged_stages"],
+        "local_iterations": property_set["local_iterations"],
+    }
+    return optimized_circuit, run_state
+
+
+class _StartGroupRun(AnalysisPass):
+    """Initializes the state of a run of the pipeline in a worker."""
+
+    def __init__(self, deadline):
+        super().__init__()
+        self.deadline = deadline
+
+    def run(self, dag):
+        self.property_set["deadline"] = self.deadline
+        self.property_set["skipped_stages"] = []
+        self.property_set["unchanged_stages"] = []
+        self.property_set["stage_fingerprints"] = {}
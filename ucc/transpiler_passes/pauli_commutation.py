@@ -0,0 +1,124 @@
+"""Commutation of Pauli rotations and controlled-Pauli gates from the Pauli
+terms of their generators, without matrices.
+
+Each gate listed here is, up to a global phase, ``exp(-i H)`` where ``H`` is
+a linear combination of mutually commuting Pauli strings, its terms. For
+example ``rzz`` has the single term ``ZZ``, and ``cx`` the terms ``ZI``,
+``IX`` and ``ZX``, as ``cx = exp(i pi/4 (I - Z) (I - X))``. Two gates whose
+terms all commute pairwise commute for any values of their parameters. Two
+rotations about single anticommuting Pauli strings commute only if one of
+them is a multiple of a full turn.
+"""
+
+import math
+
+# Pauli terms of the generator of each gate, one letter per qubit of the gate
+_PAULI_TERMS = {
+    "id": (),
+    "x": ("X",),
+    "sx": ("X",),
+    "sxdg": ("X",),
+    "rx": ("X",),
+    "y": ("Y",),
+    "ry": ("Y",),
+    "z": ("Z",),
+    "s": ("Z",),
+    "sdg": ("Z",),
+    "t": ("Z",),
+    "tdg": ("Z",),
+    "rz": ("Z",),
+    "p": ("Z",),
+    "u1": ("Z",),
+    "rxx": ("XX",),
+    "ryy": ("YY",),
+    "rzz": ("ZZ",),
+    # exp(-i theta/2 Z_0 X_1)
+    "rzx": ("ZX",),
+    "cx": ("ZI", "IX", "ZX"),
+    "cy": ("ZI", "IY", "ZY"),
+    "cz": ("ZI", "IZ", "ZZ"),
+    "cp": ("ZI", "IZ", "ZZ"),
+    "cu1": ("ZI", "IZ", "ZZ"),
+    "cs": ("ZI", "IZ", "ZZ"),
+    "csdg": ("ZI", "IZ", "ZZ"),
+    "crx": ("IX", "ZX"),
+    "cry": ("IY", "ZY"),
+    "crz": ("IZ", "ZZ"),
+    "swap": ("XX", "YY", "ZZ"),
+    "iswap": ("XX", "YY"),
+    "ccx": ("ZII", "IZI", "IIX", "ZZI", "ZIX", "IZX", "ZZX"),
+    "ccz": ("ZII", "IZI", "IIZ", "ZZI", "ZIZ", "IZZ", "ZZZ"),
+}
+
+# Rotation angle of the gates with a single term and no parameter
+_FIXED_ANGLES = {
+    "x": math.pi,
+    "y": math.pi,
+    "z": math.pi,
+    "sx": math.pi / 2,
+    "sxdg": -math.pi / 2,
+    "s": math.pi / 2,
+    "sdg": -math.pi / 2,
+    "t": math.pi / 4,
+    "tdg": -math.pi / 4,
+}
+
+
+def pauli_commutation(first_op, first_qargs, second_op, second_qargs):
+    """Returns whether two operations commute, decided from the Pauli terms
+    of their generators, or None if that does not decide it.
+
+    Args:
+        first_op: first operation.
+        first_qargs: first operation's qubits.
+        second_op: second operation.
+        second_qargs: second operation's qubits.
+
+    Return:
+        True if the operations commute for any values of their parameters,
+        False if they do not commute for the given values, or None if either
+        operation is not supported or the result depends on more than the
+        Pauli terms. Unbound parameters are taken not to be a full turn.
+    """
+    first_terms = _PAULI_TERMS.get(first_op.name)
+    second_terms = _PAULI_TERMS.get(second_op.name)
+    if first_terms is None or second_terms is None:
+        return None
+
+    second_letters = [
+        {qubit: letter for qubit, letter in zip(second_qargs, term) if letter != "I"}
+        for term in second_terms
+    ]
+    anticommuting = False
+    for term in first_terms:
+        for letters in second_letters:
+            differences = 0
+            for qubit, letter in zip(first_qargs, term):
+                other = letters.get(qubit)
+                if other is not None and letter != "I" and other != letter:
+                    differences += 1
+            if differences % 2:
+                anticommuting = True
+                break
+        if anticommuting:
+            break
+    if not anticommuting:
+        return True
+
+    # exp(-i a P) and exp(-i b Q) with anticommuting P and Q commute if and
+    # only if sin(a) sin(b) = 0
+    if len(first_terms) == 1 and len(second_terms) == 1:
+        return _is_full_turn(first_op) or _is_full_turn(second_op)
+    return None
+
+
+def _is_full_turn(op):
+    angle = _FIXED_ANGLES.get(op.name)
+    if angle is None:
+        try:
+            angle = float(op.params[0])
+        except TypeError:
+            # Unbound parameter
+            return False
+    turns = angle / (2 * math.pi)
+    return abs(turns - round(turns)) < 1e-12
@@ -226,7 +226,8 @@ class SabreLayout(TransformationPass):
             self.routing_pass.fake_run = True
 
             # Do forward-backward iterations.
-            circ = dag_to_circuit(dag)
+            # Only read, the pass manager copies it into a DAG on every run
+            circ = dag_to_circuit(dag, copy_operations=False)
             rev_circ = circ.reverse_ops()
             for _ in range(self.max_iterations):
                 for _ in ("forward", "backward"):
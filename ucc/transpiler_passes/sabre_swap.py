@@ -289,7 +289,8 @@ def _build_sabre_dag(dag, num_physical_qubits, qubit_indices):
         if block_id in circuit_to_dag_dict:
             block_dag = circuit_to_dag_dict[block_id]
         else:
-            block_dag = circuit_to_dag(block)
+            # Only read, so the operations are not copied
+            block_dag = circuit_to_dag(block, copy_operations=False)
             circuit_to_dag_dict[block_id] = block_dag
         return process_dag(block_dag, block_qubit_indices)
 
@@ -432,7 +433,7 @@ def _apply_sabre_result(
             for mapped_block_dag in mapped_block_dags:
                 # Remove wires that are idle in all blocks.
                 mapped_block_dag.remove_qubits(*idle_qubits)
-                mapped_blocks.append(dag_to_circuit(mapped_block_dag))
+                mapped_blocks.append(dag_to_circuit(mapped_block_dag, copy_operations=False))
 
             # Apply the control flow gate to the dag.
             mapped_node = node.op.replace_blocks(mapped_blocks)
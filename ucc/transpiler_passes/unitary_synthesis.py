@@ -516,7 +516,7 @@ class UnitarySynthesis(TransformationPass):
                 [
                     dag_to_circuit(
                         self._run_main_loop(
-                            circuit_to_dag(block),
+                            circuit_to_dag(block, copy_operations=False),
                             {
                                 inner: qubit_indices[outer]
                                 for inner, outer in zip(block.qubits, node.qargs)
@@ -0,0 +1,256 @@
+"""Compilation pipelines that are built once per target device and reused."""
+
+import copy
+import time
+
+from qiskit.dagcircuit import DAGCircuit
+from qiskit.transpiler import CouplingMap, PassManager
+from qiskit.transpiler.basepasses import AnalysisPass
+from qiskit.passmanager import BaseController, ConditionalController, FlowControllerLinear
+
+
+class CompilationPipeline:
+    """A frozen pass sequence compiling circuits for a single target device.
+
+    The pipeline is built from the local passes of a transpiler such as
+    :class:`~ucc.transpilers.ucc_defaults.UCCDefault1`, followed by its mapping
+    passes for the device and a final basis translation. Everything that only
+    depends on the device is computed once when the pipeline is built: the
+    :class:`~qiskit.transpiler.CouplingMap` and the distance matrix of its
+    bidirectional version, which the Sabre passes read from the map they share.
+    Running the pipeline does not modify it, so the same pipeline can compile
+    any number of circuits.
+
+    Pipelines should be obtained with ``UCCDefault1.pipeline(coupling_list)``,
+    which caches one pipeline per device.
+
+    Args:
+        transpiler: The transpiler whose passes make up the pipeline. The
+            task list of its ``pass_manager`` is copied when the pipeline is
+            built, so passes appended to it later do not affect this pipeline.
+            The pass instances are shared with the other pipelines of the
+            transpiler, so runs of all of them are serialized on the lock of
+            the transpiler.
+        coupling_list (list): Connections between the qubits of the target
+            device. If None, all-to-all connectivity is assumed and no mapping
+            passes are added.
+        tier (str): Effort tier of the mapping passes, see
+            :meth:`~ucc.transpilers.ucc_defaults.UCCDefault1.tier_knobs`.
+    """
+
+    def __init__(self, transpiler, coupling_list=None, tier="full"):
+        self.coupling_list = coupling_list
+        self.tier = tier
+        self.coupling_map = None
+        self.routing_map = None
+        self.distance_matrix = None
+        self._deadline = None
+        self._lock = transpiler._run_lock
+
+        self.pass_manager = _DAGPassManager()
+        self.pass_manager.append(_SetDeadline(self))
+        for task in transpiler.pass_manager.to_flow_controller().tasks:
+            self.pass_manager.append(task)
+
+        if coupling_list is not None:
+            self.coupling_map = CouplingMap(couplinglist=coupling_list)
+            self.routing_map = _symmetric_coupling_map(self.coupling_map)
+            # Computed once here and cached on the map shared by the Sabre passes
+            self.distance_matrix = self.routing_map.distance_matrix
+            transpiler.append_map_passes(
+                self.pass_manager, self.coupling_map, self.routing_map, tier=tier
+            )
+
+        transpiler.append_final_passes(self.pass_manager)
+
+    @property
+    def property_set(self):
+        """The property set of the most recent run."""
+        return self.pass_manager.property_set
+
+    def passes(self):
+        """Yields every pass of the pipeline, including the passes nested in
+        flow controllers and the passes required by other passes."""
+        yield from _iterate_passes(self.pass_manager.to_flow_controller().tasks)
+
+    def run(self, circuits, callback=None, deadline=None):
+        """Compiles `circuits` with the pipeline.
+
+        A :class:`~qiskit.dagcircuit.DAGCircuit` is compiled without being
+        converted to and from a circuit, and the compiled DAG is returned. The
+        passes modify it in place, so it should not be used afterwards. Its
+        layout is in :attr:`property_set`.
+
+        Args:
+            circuits (QuantumCircuit or DAGCircuit or list): Circuits to compile.
+            callback (callable): Called after each pass, see
+                :meth:`qiskit.transpiler.PassManager.run`.
+            deadline (float): Value of :func:`time.perf_counter` after which
+                optional stages are skipped. Passes needed for a valid result
+                always run. The names of the skipped stages are stored in
+                ``property_set["skipped_stages"]``.
+
+        Returns:
+            QuantumCircuit or DAGCircuit or list: The compiled circuits, of the
+            same types as `circuits`.
+        """
+        # Passes keep per-run state on themselves and are shared with the
+        # other pipelines of the transpiler, so runs are serialized
+        with self._lock:
+            self._deadline = deadline
+            try:
+                return self.pass_manager.run(circuits, callback=callback)
+            finally:
+                self._deadline = None
+
+
+class _DAGPassManager(PassManager):
+    """Pass manager that also runs on DAGs, skipping the conversion of the
+    input circuit to a DAG and of the output DAG back to a circuit."""
+
+    def _passmanager_frontend(self, input_program, **kwargs):
+        if isinstance(input_program, DAGCircuit):
+            return input_program
+        return super()._passmanager_frontend(input_program, **kwargs)
+
+    def _passmanager_backend(self, passmanager_ir, in_program, **kwargs):
+        if isinstance(in_program, DAGCircuit):
+            self._finalize_layouts(passmanager_ir)
+            return passmanager_ir
+        return super()._passmanager_backend(passmanager_ir, in_program, **kwargs)
+
+
+def optional_stage(stage, tasks):
+    """Returns a flow controller running `tasks` only while the deadline of
+    the pipeline run, if any, has not passed.
+
+    The tasks must leave the circuit valid for the rest of the pipeline
+    whether or not they run.
+
+    Args:
+        stage (str): Name of the stage, reported when it is skipped.
+        tasks (list): Passes or flow controllers of the stage.
+    """
+
+    def before_deadline(property_set):
+        deadline = property_set["deadline"]
+        if deadline is None or time.perf_counter() < deadline:
+            return True
+        property_set["skipped_stages"].append(stage)
+        return False
+
+    return ConditionalController(tasks, condition=before_deadline)
+
+
+def tracked_stage(stage, tasks):
+    """Returns a flow controller running `tasks` unless the circuit is
+    unchanged since they last ran in the pipeline run.
+
+    The circuit is identified by a fingerprint of its operations, computed
+    after each stage that ran and, if other passes changed the circuit since,
+    before the next stage. Qiskit skips an analysis pass that already ran
+    until a transformation pass runs, so the fingerprint is not computed
+    again while only skipped stages and analysis passes run.
+
+    Skipping assumes that running the tasks again on their own output would
+    not change it. Stages with the same name share their fingerprint, so
+    the name must identify the tasks.
+
+    Args:
+        stage (str): Name of the stage, reported in
+            ``property_set["unchanged_stages"]`` when it is skipped.
+        tasks (list): Passes or flow controllers of the stage.
+    """
+    return FlowControllerLinear(
+        [_Fingerprint(), _TrackedStage(stage, list(tasks) + [_Fingerprint()])]
+    )
+
+
+def dag_fingerprint(dag):
+    """Returns a hash of the operations of `dag` in topological order.
+
+    Two DAGs with the same operations on the same bits in the same order have
+    the same fingerprint.
+    """
+    return hash(
+        tuple(
+            (node.name, node.qargs, node.cargs, tuple(_hashable(param) for param in node.params))
+            for node in dag.topological_op_nodes()
+        )
+    )
+
+
+def _hashable(param):
+    try:
+        hash(param)
+        return param
+    except TypeError:
+        # Matrices of unitary gates and other array parameters
+        return getattr(param, "tobytes", param.__repr__)()
+
+
+class _SetDeadline(AnalysisPass):
+    """Stores the deadline of the current run of `pipeline` in the property set
+    and resets the records of skipped stages."""
+
+    def __init__(self, pipeline):
+        super().__init__()
+        self.pipeline = pipeline
+
+    def run(self, dag):
+        self.property_set["deadline"] = self.pipeline._deadline
+        self.property_set["skipped_stages"] = []
+        self.property_set["unchanged_stages"] = []
+        self.property_set["stage_fingerprints"] = {}
+
+
+class _Fingerprint(AnalysisPass):
+    """Stores the fingerprint of the circuit in ``property_set["dag_fingerprint"]``."""
+
+    def run(self, dag):
+        self.property_set["dag_fingerprint"] = dag_fingerprint(dag)
+
+
+class _TrackedStage(BaseController):
+    """Flow controller running `tasks` if the fingerprint of the circuit
+    differs from the one recorded for `stage`, and recording the fingerprint
+    after they ran. The last task must compute the fingerprint."""
+
+    def __init__(self, stage, tasks):
+        super().__init__()
+        self.stage = stage
+        self.tasks = tuple(tasks)
+
+    def iter_tasks(self, state):
+        property_set = state.property_set
+        # Not set if the tasks run outside of a pipeline
+        if property_set["stage_fingerprints"] is None:
+            property_set["stage_fingerprints"] = {}
+            property_set["unchanged_stages"] = []
+        if property_set["stage_fingerprints"].get(self.stage) == property_set["dag_fingerprint"]:
+            property_set["unchanged_stages"].append(self.stage)
+            return
+        for task in self.tasks:
+            state = yield task
+        # Recorded here rather than by a pass, which qiskit would skip when no
+        # pass of the stage changed the circuit
+        state.property_set["stage_fingerprints"][self.stage] = state.property_set["dag_fingerprint"]
+
+
+def _iterate_passes(tasks):
+    for task in tasks:
+        if hasattr(task, "tasks"):
+            yield from _iterate_passes(task.tasks)
+        else:
+            yield from _iterate_passes(getattr(task, "requires", []))
+            yield task
+
+
+def _symmetric_coupling_map(coupling_map):
+    """Returns `coupling_map` made bidirectional, as required by Sabre, without
+    modifying the input."""
+    if coupling_map.is_symmetric:
+        return coupling_map
+    routing_map = copy.deepcopy(coupling_map)
+    routing_map.make_symmetric()
+    return routing_map
@@ -1,6 +1,10 @@
 #Construct a custom compiler
+import functools
 import os
+import threading
 from qiskit.utils.parallel import CPU_COUNT
+from qiskit.passmanager import ConditionalController, DoWhileController
+from qiskit.dagcircuit import DAGCircuit
 from qiskit.transpiler import PassManager
 from qiskit.circuit.equivalence_library import SessionEquivalenceLibrary as sel
 from qiskit.utils.parallel import CPU_COUNT
@@ -21,17 +25,70 @@ from qiskit.transpiler.passes.synthesis.unitary_synthesis import DefaultUnitaryS
 # from ucc.transpiler_passes.sabre_swap import SabreSwap
 
 
-from ..transpiler_passes import CommutativeCancellation, Collect2qBlocks, UnitarySynthesis, Optimize1qGatesDecomposition, SpectralMapping, VF2PostLayout
+from ..transpiler_passes import CommutativeCancellation, Collect2qBlocks, UnitarySynthesis, Optimize1qGatesDecomposition, SpectralMapping, VF2PostLayout, CheckLocalConvergence
+from ..transpiler_passes import FindIndependentComponents, ParallelComponentOptimization
 from qiskit.transpiler.passes import Optimize1qGatesSimpleCommutation, ElidePermutations
+from .pipeline import CompilationPipeline, _symmetric_coupling_map, optional_stage, tracked_stage
+from .windowed import run_windowed
 
 
 CONFIG = user_config.get_config()
 
+# Effort tiers of the mapping passes, from the most to the least thorough
+TIERS = ("full", "reduced", "minimal")
+
+# Stages of the mapping passes and the settings of tier_knobs they use
+_KNOB_STAGES = {
+    "sabre_layout": ("sabre_max_iterations", "sabre_trials"),
+    "sabre_swap": ("sabre_trials",),
+    "vf2_post_layout": ("vf2_post_call_limit", "vf2_post_time_limit"),
+    "routed_local_passes": ("routed_local_iterations",),
+}
+
+
+# Attributes of UCCDefault1 the local passes are built from
+_LOCAL_SETTINGS = (
+    "_1q_basis",
+    "_2q_basis",
+    "target_basis",
+    "special_commutations",
+    "commutation_check_matrix",
+)
+
+
+# Minimum number of operations of a circuit to optimize its independent groups
+# of qubits in parallel, below it starting the workers does not pay off
+_PARALLEL_MIN_SIZE = 2000
+
 
 # from ucc_passes.entanglement_net_to_layout import Decompose2qNetworkWithMap
 
 class UCCDefault1:
-    def __init__(self, local_iterations=1):
+    """The default compiler of ``ucc``.
+
+    Args:
+        local_iterations (int or str): Number of times the local optimization
+            passes run before mapping. With ``"converge"``, they are repeated
+            until an iteration decreases neither the two-qubit gate count nor
+            the depth of the circuit, see :meth:`add_converging_local_passes`.
+        max_local_iterations (int): Maximum number of iterations with
+            ``local_iterations="converge"``.
+        parallel_workers (int): Number of worker processes running the local
+            passes on independent groups of qubits, such as the experiments of
+            a batch on disjoint qubits, of circuits with at least 2000
+            operations. Defaults to 1, with which every circuit is optimized
+            as a whole in this process. With None, the number of CPUs.
+    """
+
+    # Whether CommutativeCancellation checks the pairs of gates that the
+    # commutation libraries do not decide, such as rotations that commute for
+    # some angles only, via matrix multiplication instead of taking them not to
+    # commute. Set it in a subclass, as the local passes are built in __init__.
+    commutation_check_matrix = False
+
+    def __init__(self, local_iterations=1, max_local_iterations=10, parallel_workers=1):
+        self.max_local_iterations = max_local_iterations
+        self.parallel_workers = parallel_workers
         self.pass_manager = PassManager()
         self._1q_basis = ['rz', 'rx', 'ry', 'h']
         self._2q_basis = ['cx']
@@ -45,69 +102,407 @@ class UCCDefault1:
                 (0,): True,
                 (1,): False,
             },
+            # Rotations about the same axis commute for any angles, this lets
+            # CommutativeCancellation merge parameterized rotations
+            ("rx", "rx"): True,
+            ("rz", "rz"): True,
         }
-        self.add_local_passes(local_iterations)
+        # Effort of the mapping passes in the "full" tier, scaled down by the
+        # other tiers
+        self.sabre_max_iterations = 4
+        self.sabre_trials = 20
+        self.vf2_post_call_limit = None
+        self.vf2_post_time_limit = None
+        # Expected compile time per two-qubit gate of a circuit mapped to a
+        # device in each tier but "minimal", used to pick a tier that fits a
+        # time budget. These are rough guesses, not calibrated measurements;
+        # set them for the machine and circuits at hand.
+        self.tier_seconds_per_2q_gate = {"full": 1e-2, "reduced": 4e-3}
+        # Iterations of the local passes after routing, or "converge"
+        self.routed_local_iterations = 1
+        if local_iterations == "converge":
+            self.add_converging_local_passes(max_local_iterations)
+        else:
+            self.add_local_passes(local_iterations)
+        self._pipelines = {}
+        self._pipelines_lock = threading.Lock()
+        # Held while any pipeline of this transpiler runs, as they share passes
+        self._run_lock = threading.Lock()
 
     @property
     def default_passes(self):
         return 
         
-    def add_local_passes(self, local_iterations):
-        for _ in range(local_iterations):            
-            self.pass_manager.append(BasisTranslator(sel, target_basis=self.target_basis))            
-            self.pass_manager.append(Optimize1qGatesDecomposition())
-            self.pass_manager.append(CommutativeCancellation(standard_gates=self.target_basis, special_commutations=self.special_commutations))
-            self.pass_manager.append(Collect2qBlocks())
-            self.pass_manager.append(ConsolidateBlocks(force_consolidate=True))
-            self.pass_manager.append(UnitarySynthesis(basis_gates=self.target_basis))
-            # self.pass_manager.append(Optimize1qGatesDecomposition(basis=self._1q_basis))
-            self.pass_manager.append(CollectCliffords())
-            self.pass_manager.append(HighLevelSynthesis(hls_config=HLSConfig(clifford=["greedy"])))
+    def add_local_passes(self, local_iterations, pass_manager=None):
+        if pass_manager is None:
+            pass_manager = self.pass_manager
+        if local_iterations:
+            self._append_local_tasks(pass_manager, local_iterations)
+
+    def add_converging_local_passes(self, max_iterations=10, pass_manager=None):
+        """Appends the local passes in a loop that repeats them until an
+        iteration decreases neither the two-qubit gate count nor the depth of the
+        circuit, at most `max_iterations` times.
+
+        The number of iterations run is stored in
+        ``property_set["local_iterations"]``, see :class:`CheckLocalConvergence`.
+        """
+        if pass_manager is None:
+            pass_manager = self.pass_manager
+        self._append_local_tasks(pass_manager, "converge", max_iterations)
+
+    def _local_tasks(self, local_iterations, max_iterations=10):
+        """Returns the local passes repeated `local_iterations` times, or with
+        ``"converge"``, in a loop of at most `max_iterations` iterations."""
+        if local_iterations == "converge":
+            return [
+                CheckLocalConvergence(max_iterations, start=True),
+                DoWhileController(
+                    self._local_pass_block() + [CheckLocalConvergence(max_iterations)],
+                    do_while=_not_converged,
+                ),
+            ]
+        return [task for _ in range(local_iterations) for task in self._local_pass_block()]
 
+    def _append_local_tasks(self, pass_manager, local_iterations, max_iterations=10):
+        """Appends the local passes of :meth:`_local_tasks` to `pass_manager`,
+        run on independent groups of qubits in parallel unless
+        ``parallel_workers`` is 1, see :class:`ParallelComponentOptimization`."""
+        if self.parallel_workers == 1:
+            pass_manager.append(self._local_tasks(local_iterations, max_iterations))
+            return
+        # The workers build the passes from the settings of this transpiler
+        settings = {name: getattr(self, name) for name in _LOCAL_SETTINGS}
+        build_tasks = functools.partial(
+            _build_local_tasks, type(self), settings, local_iterations, max_iterations
+        )
+        pass_manager.append(
+            FindIndependentComponents(_PARALLEL_MIN_SIZE, max_workers=self.parallel_workers)
+        )
+        pass_manager.append(
+            ConditionalController(
+                ParallelComponentOptimization(build_tasks, max_workers=self.parallel_workers),
+                condition=_has_independent_components,
+            )
+        )
+        pass_manager.append(
+            ConditionalController(
+                self._local_tasks(local_iterations, max_iterations),
+                condition=_has_no_independent_components,
+            )
+        )
+
+    def _local_pass_block(self):
+        """Returns the passes of one iteration of the local optimizations."""
+        return [
+            tracked_stage("basis_translation", [BasisTranslator(sel, target_basis=self.target_basis)]),
+            self._optimization_stage("optimize_1q", [Optimize1qGatesDecomposition()]),
+            self._optimization_stage("commutative_cancellation", [CommutativeCancellation(standard_gates=self.target_basis, special_commutations=self.special_commutations, check_matrix=self.commutation_check_matrix)]),
+            self._optimization_stage(
+                "2q_block_synthesis",
+                [
+                    Collect2qBlocks(),
+                    ConsolidateBlocks(force_consolidate=True),
+                    UnitarySynthesis(basis_gates=self.target_basis),
+                ],
+            ),
+            # Optimize1qGatesDecomposition(basis=self._1q_basis),
+            self._optimization_stage(
+                "clifford_synthesis",
+                [CollectCliffords(), HighLevelSynthesis(hls_config=HLSConfig(clifford=["greedy"]))],
+            ),
             #Add following passes if merging single qubit rotations that are interrupted by a commuting 2 qubit gate is desired
-            # self.pass_manager.append(Optimize1qGatesSimpleCommutation(basis=self._1q_basis))
-            # self.pass_manager.append(BasisTranslator(sel, target_basis=self.target_basis)) 
-            
-    def add_map_passes(self, coupling_list = None):
+            # Optimize1qGatesSimpleCommutation(basis=self._1q_basis),
+            # BasisTranslator(sel, target_basis=self.target_basis),
+        ]
+
+    def _optimization_stage(self, stage, tasks):
+        """Returns a stage of the local passes that is skipped once the
+        deadline of a run has passed, or if the circuit did not change since
+        it last ran, see :func:`~ucc.transpilers.pipeline.tracked_stage`."""
+        return optional_stage(stage, [tracked_stage(stage, tasks)])
+
+    def add_map_passes(self, coupling_list = None, pass_manager=None):
         if coupling_list is not None:              
             coupling_map = CouplingMap(couplinglist=coupling_list)
-            # self.pass_manager.append(ElidePermutations())
-            # self.pass_manager.append(SpectralMapping(coupling_list))
-            # self.pass_manager.append(SetLayout(pass_manager_config.initial_layout))
-            self.pass_manager.append(
-                SabreLayout(
-                    coupling_map,
-                    seed=1,
-                    max_iterations=4,
-                    swap_trials=_get_trial_count(20),
-                    layout_trials=_get_trial_count(20),
-                )
+            self.append_map_passes(
+                self.pass_manager if pass_manager is None else pass_manager,
+                coupling_map,
+                _symmetric_coupling_map(coupling_map),
+            )
+
+    def append_map_passes(self, pass_manager, coupling_map, routing_map, tier="full"):
+        """Appends the layout and routing passes for `coupling_map` to `pass_manager`.
+
+        `routing_map` is the bidirectional version of `coupling_map` used by Sabre.
+        The effort of the passes is set by `tier`, see :meth:`tier_knobs`.
+        """
+        knobs = self.tier_knobs(tier)
+        # pass_manager.append(ElidePermutations())
+        # pass_manager.append(SpectralMapping(coupling_list))
+        # pass_manager.append(SetLayout(pass_manager_config.initial_layout))
+        pass_manager.append(
+            SabreLayout(
+                routing_map,
+                seed=1,
+                max_iterations=knobs["sabre_max_iterations"],
+                swap_trials=_get_trial_count(knobs["sabre_trials"]),
+                layout_trials=_get_trial_count(knobs["sabre_trials"]),
+            )
+        )
+
+        # The layout found by VF2Layout is needed by ApplyLayout, so it always
+        # runs in full
+        pass_manager.append(VF2Layout(coupling_map=coupling_map))
+        pass_manager.append(ApplyLayout())
+        pass_manager.append(
+            SabreSwap(
+                routing_map,
+                heuristic="decay",
+                seed=1,
+                trials=_get_trial_count(knobs["sabre_trials"]),
             )
+        )
+        # pass_manager.append(MapomaticLayout(coupling_map))
+        self._append_post_layout(pass_manager, coupling_map, knobs)
+        if knobs["routed_local_iterations"] == "converge":
+            self.add_converging_local_passes(self.max_local_iterations, pass_manager)
+            self._append_post_layout(pass_manager, coupling_map, knobs)
+        elif knobs["routed_local_iterations"]:
+            self.add_local_passes(knobs["routed_local_iterations"], pass_manager)
+            self._append_post_layout(pass_manager, coupling_map, knobs)
 
-            self.pass_manager.append(VF2Layout(coupling_map=coupling_map))
-            self.pass_manager.append(ApplyLayout())
-            self.pass_manager.append(
+    def append_suffix_passes(self, pass_manager, routing_map=None):
+        """Appends the passes compiling gates appended to an already compiled
+        circuit to `pass_manager`, see :class:`~ucc.CompilationSession`.
+
+        The gates are expected on the physical qubits that hold their virtual
+        qubits at the end of the compiled circuit. One iteration of the local
+        passes runs, then the gates are routed with Sabre on `routing_map`, if
+        given, from that placement. The layout is not searched again.
+        """
+        self.add_local_passes(1, pass_manager)
+        if routing_map is not None:
+            pass_manager.append(
                 SabreSwap(
-                    coupling_map,
+                    routing_map,
                     heuristic="decay",
                     seed=1,
-                    trials=_get_trial_count(20),
+                    trials=_get_trial_count(self.sabre_trials),
                 )
             )
-            # self.pass_manager.append(MapomaticLayout(coupling_map))
-            self.pass_manager.append(VF2PostLayout(coupling_map=coupling_map))
-            self.pass_manager.append(ApplyLayout())
-            self.add_local_passes(1)
-            self.pass_manager.append(VF2PostLayout(coupling_map=coupling_map))
-            self.pass_manager.append(ApplyLayout())
+        self.append_final_passes(pass_manager)
+
+    def _append_post_layout(self, pass_manager, coupling_map, knobs):
+        pass_manager.append(
+            optional_stage(
+                "vf2_post_layout",
+                [
+                    VF2PostLayout(
+                        coupling_map=coupling_map,
+                        call_limit=knobs["vf2_post_call_limit"],
+                        time_limit=knobs["vf2_post_time_limit"],
+                    ),
+                    ApplyLayout(),
+                ],
+            )
+        )
+
+    def tier_knobs(self, tier="full"):
+        """Returns the settings of the mapping passes in the effort `tier`.
+
+        The "full" tier uses the attributes ``sabre_max_iterations``,
+        ``sabre_trials``, ``vf2_post_call_limit``, ``vf2_post_time_limit`` and
+        ``routed_local_iterations`` as they are.
+        The "reduced" and "minimal" tiers scale them down, and "minimal" also
+        skips the local passes that otherwise run again after routing.
+
+        Args:
+            tier (str): One of ``TIERS``.
+
+        Returns:
+            dict: The settings, keyed by attribute name, and
+            ``routed_local_iterations``.
+        """
+        knobs = {
+            "sabre_max_iterations": self.sabre_max_iterations,
+            "sabre_trials": self.sabre_trials,
+            "vf2_post_call_limit": self.vf2_post_call_limit,
+            "vf2_post_time_limit": self.vf2_post_time_limit,
+            "routed_local_iterations": self.routed_local_iterations,
+        }
+        if tier == "reduced":
+            knobs["sabre_max_iterations"] = max(1, self.sabre_max_iterations // 2)
+            knobs["sabre_trials"] = max(1, self.sabre_trials // 4)
+            knobs["vf2_post_call_limit"] = _min_limit(self.vf2_post_call_limit, 10**5)
+            knobs["vf2_post_time_limit"] = _min_limit(self.vf2_post_time_limit, 1.0)
+        elif tier == "minimal":
+            knobs["sabre_max_iterations"] = 1
+            knobs["sabre_trials"] = 1
+            knobs["vf2_post_call_limit"] = _min_limit(self.vf2_post_call_limit, 10**4)
+            knobs["vf2_post_time_limit"] = _min_limit(self.vf2_post_time_limit, 0.1)
+            knobs["routed_local_iterations"] = 0
+        elif tier != "full":
+            raise ValueError(f"Unknown tier {tier!r}, expected one of {TIERS}.")
+        return knobs
+
+    def shortened_stages(self, tier):
+        """Returns the names of the stages that run with less effort in `tier`
+        than in the "full" tier."""
+        full = self.tier_knobs("full")
+        knobs = self.tier_knobs(tier)
+        stages = []
+        for stage, names in _KNOB_STAGES.items():
+            if any(knobs[name] != full[name] for name in names):
+                stages.append(stage)
+        return stages
+
+    def select_tier(self, circuit, coupling_list, time_budget):
+        """Returns the most thorough tier expected to compile `circuit`, a
+        circuit or DAG, for the device with `coupling_list` within
+        `time_budget` seconds, as estimated from ``tier_seconds_per_2q_gate``."""
+        if coupling_list is None:
+            # The tiers only differ in their mapping passes
+            return "full"
+        if isinstance(circuit, DAGCircuit):
+            num_nonlocal_gates = len(circuit.two_qubit_ops()) + len(circuit.multi_qubit_ops())
+        else:
+            num_nonlocal_gates = circuit.num_nonlocal_gates()
+        for tier, seconds_per_gate in self.tier_seconds_per_2q_gate.items():
+            if num_nonlocal_gates * seconds_per_gate <= time_budget:
+                return tier
+        return "minimal"
+
+    def append_final_passes(self, pass_manager):
+        """Appends the passes that run last in every pipeline to `pass_manager`."""
+        pass_manager.append(BasisTranslator(sel, target_basis=self.target_basis)) 
+
+    def pipeline(self, coupling_list=None, tier="full"):
+        """Returns the :class:`~ucc.transpilers.pipeline.CompilationPipeline` for the
+        device with `coupling_list`.
+
+        The pipeline is built on first use and cached, so the cost of building
+        passes and device data structures is paid once per device. It snapshots
+        ``self.pass_manager`` when built, customize the pass manager before the
+        first call to :meth:`run`. One pipeline is kept per effort `tier` of
+        the mapping passes.
+        """
+        if coupling_list is None:
+            key = None
+            # Without mapping passes all tiers are the same
+            tier = "full"
+        else:
+            key = tuple(tuple(edge) for edge in coupling_list)
+        with self._pipelines_lock:
+            pipeline = self._pipelines.get((key, tier))
+            if pipeline is None:
+                pipeline = CompilationPipeline(self, coupling_list, tier=tier)
+                self._pipelines[(key, tier)] = pipeline
+        return pipeline
+
+    def run(self, circuits, coupling_list=None, callback=None, tier="full", deadline=None):
+        return self.pipeline(coupling_list, tier).run(
+            circuits, callback=callback, deadline=deadline
+        )
+
+    def run_windowed(self, circuit, window_size, overlap=None, callback=None):
+        """Compiles `circuit` in overlapping slices of `window_size` layers with
+        the local passes, see :func:`~ucc.transpilers.windowed.run_windowed`.
+        No mapping passes are run."""
+        return run_windowed(self.pipeline(), circuit, window_size, overlap, callback=callback)
+
+
+class UCCDefault0(UCCDefault1):
+    """Translation and routing only, for interactive use where compile time
+    matters more than gate count.
+
+    The circuit is translated to the target basis and, for a target device,
+    laid out and routed with 5 Sabre trials of 2 layout iterations. No local
+    optimization passes run, before or after routing.
+
+    Args:
+        local_iterations (int or str): Same as in :class:`UCCDefault1`.
+        max_local_iterations (int): Same as in :class:`UCCDefault1`.
+        parallel_workers (int): Same as in :class:`UCCDefault1`.
+    """
+
+    def __init__(self, local_iterations=1, max_local_iterations=10, parallel_workers=1):
+        super().__init__(local_iterations, max_local_iterations, parallel_workers)
+        self.sabre_max_iterations = 2
+        self.sabre_trials = 5
+        self.vf2_post_call_limit = 10**5
+        self.routed_local_iterations = 0
+
+    def _local_pass_block(self):
+        return [BasisTranslator(sel, target_basis=self.target_basis)]
+
+
+class UCCDefault2(UCCDefault1):
+    """More thorough than :class:`UCCDefault1`, at a few times its compile
+    time.
+
+    The local passes are repeated until they stop improving the circuit, and
+    layout and routing use 50 Sabre trials instead of 20.
+
+    Args:
+        local_iterations (int or str): Same as in :class:`UCCDefault1`.
+        max_local_iterations (int): Same as in :class:`UCCDefault1`.
+        parallel_workers (int): Same as in :class:`UCCDefault1`.
+    """
+
+    def __init__(self, local_iterations="converge", max_local_iterations=10, parallel_workers=1):
+        super().__init__(local_iterations, max_local_iterations, parallel_workers)
+        self.sabre_trials = 50
+
+
+class UCCDefault3(UCCDefault1):
+    """The most thorough preset, for circuits compiled once and run many
+    times.
+
+    As :class:`UCCDefault2`, and additionally the local passes after routing
+    are also repeated until they stop improving the circuit, and Sabre runs
+    100 trials of 8 layout iterations.
+
+    Args:
+        local_iterations (int or str): Same as in :class:`UCCDefault1`.
+        max_local_iterations (int): Same as in :class:`UCCDefault1`.
+        parallel_workers (int): Same as in :class:`UCCDefault1`.
+    """
+
+    def __init__(self, local_iterations="converge", max_local_iterations=20, parallel_workers=1):
+        super().__init__(local_iterations, max_local_iterations, parallel_workers)
+        self.sabre_max_iterations = 8
+        self.sabre_trials = 100
+        self.routed_local_iterations = "converge"
+
+
+# Presets by optimization level, see ucc.compile
+OPTIMIZATION_LEVELS = (UCCDefault0, UCCDefault1, UCCDefault2, UCCDefault3)
+
+
+def _build_local_tasks(transpiler_class, settings, local_iterations, max_iterations):
+    """Returns the local passes of a `transpiler_class` instance with the
+    attributes in `settings`, see :meth:`UCCDefault1._local_tasks`."""
+    transpiler = transpiler_class(local_iterations=0)
+    vars(transpiler).update(settings)
+    return transpiler._local_tasks(local_iterations, max_iterations)
+
+
+def _has_independent_components(property_set):
+    return len(property_set["independent_components"]) > 1
+
+
+def _has_no_independent_components(property_set):
+    return not _has_independent_components(property_set)
+
 
+def _not_converged(property_set):
+    return not property_set["local_converged"]
 
-    def run(self, circuits, coupling_list=None):
-        self.add_map_passes(coupling_list)
-        self.pass_manager.append(BasisTranslator(sel, target_basis=self.target_basis)) 
-        out_circuits = self.pass_manager.run(circuits)
-        return out_circuits
 
+def _min_limit(limit, cap):
+    """Returns the smaller of two limits, where None means no limit."""
+    return cap if limit is None else min(limit, cap)
 
 
 def _get_trial_count(default_trials=5):
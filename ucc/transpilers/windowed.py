@@ -0,0 +1,85 @@
+"""Windowed compilation of deep circuits in overlapping time slices."""
+
+
+def run_windowed(pipeline, circuit, window_size, overlap=None, callback=None):
+    """Compiles `circuit` slice by slice with `pipeline`.
+
+    The circuit is split into slices of `window_size` layers, following the
+    order of its instructions, so that no slice depends on a later one. Each
+    slice is compiled on its own, which bounds the size of the DAG and of the
+    analyses built by the passes by the window instead of the circuit depth.
+
+    Consecutive slices overlap: the last `overlap` layers of each compiled
+    slice are not emitted yet but carried into the next slice, where they are
+    compiled again together with its first layers. This boundary clean-up lets
+    gates on both sides of a seam cancel or merge.
+
+    Args:
+        pipeline (CompilationPipeline): Pipeline without mapping passes used
+            to compile each slice.
+        circuit (QuantumCircuit): The circuit to compile.
+        window_size (int): Number of layers of the input circuit in each slice.
+        overlap (int): Number of layers of each compiled slice carried into the
+            next one. Defaults to a quarter of `window_size`.
+        callback (callable): Called after each pass on each slice, see
+            :meth:`~ucc.transpilers.pipeline.CompilationPipeline.run`.
+
+    Returns:
+        QuantumCircuit: The compiled circuit.
+    """
+    if window_size < 1:
+        raise ValueError("window_size must be at least 1.")
+    if overlap is None:
+        overlap = max(1, window_size // 4)
+
+    # Only the slice index of each instruction is kept for the whole circuit
+    windows = []
+    for index, layer in enumerate(_layers(circuit.data)):
+        window = layer // window_size
+        while len(windows) <= window:
+            windows.append([])
+        windows[window].append(index)
+
+    output = circuit.copy_empty_like()
+    carry = []
+    for indices in windows:
+        window_circuit = circuit.copy_empty_like()
+        window_circuit.global_phase = 0
+        for instruction in carry:
+            window_circuit._append(instruction)
+        for index in indices:
+            window_circuit._append(circuit.data[index])
+
+        compiled_window = pipeline.run(window_circuit, callback=callback)
+        output.global_phase += compiled_window.global_phase
+        head, carry = _split_tail(compiled_window.data, overlap)
+        for instruction in head:
+            output._append(instruction)
+
+    for instruction in carry:
+        output._append(instruction)
+    return output
+
+
+def _layers(instructions):
+    """Yields the layer of each instruction, i.e. its depth in the circuit when
+    every operation, including barriers and measurements, counts as one."""
+    depths = {}
+    for instruction in instructions:
+        bits = (*instruction.qubits, *instruction.clbits)
+        layer = max((depths.get(bit, 0) for bit in bits), default=0)
+        for bit in bits:
+            depths[bit] = layer + 1
+        yield layer
+
+
+def _split_tail(instructions, overlap):
+    """Splits `instructions` into a head and the instructions in the last
+    `overlap` layers, such that no instruction of the head follows one of the
+    tail."""
+    reverse_layers = list(_layers(reversed(instructions)))[::-1]
+    head = []
+    tail = []
+    for instruction, reverse_layer in zip(instructions, reverse_layers):
+        (tail if reverse_layer < overlap else head).append(instruction)
+    return head, tail